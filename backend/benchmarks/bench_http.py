@@ -0,0 +1,479 @@
+# backend/benchmarks/bench_http.py
+"""
+Uçtan uca HTTP yük ve gecikme benchmark'ı.
+
+main.app süreç içinde (ASGI transport, ağ yok) yerel bir mongod'a veya
+mongomock-motor'a karşı çalıştırılır. Veritabanı istenen ölçekte doldurulur,
+sanal kullanıcılar ağırlıklı bir senaryo karışımını (ürün listeleme, ürün detayı,
+sepet, sipariş, giriş) süre boyunca çalıştırır. Endpoint başına RPS, p50/p95/p99
+ve istek başına veritabanı round-trip sayısı raporlanır; --json ile sonuçlar
+commit'ler arası karşılaştırma için dosyaya yazılır.
+
+Kullanım (backend dizininden):
+    python -m benchmarks.bench_http --backend mongomock --products 10000 --duration 15
+    python -m benchmarks.bench_http --backend mongod --mongo-uri mongodb://localhost:27017 \\
+        --db-name dovl_bench --products 100000 --json bench-results/HEAD.json --compare bench-results/main.json
+
+Notlar:
+- mongod modunda round-trip'ler pymongo CommandListener ile sayılır (getMore dahil).
+  mongomock modunda koleksiyon çağrıları sayılır (cursor başına bir çağrı).
+- mongomock bulk_write'ı desteklemediği için sipariş (checkout) senaryosu sadece mongod ile anlamlıdır.
+- Ürün listesi yanıt önbelleği ve kategori/kampanya önbellekleri açıktır (üretimdeki gibi);
+  kapatmak için ilgili ayarlar ortam değişkenleriyle verilebilir.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from bson import ObjectId
+from pymongo import monitoring
+
+import database
+from config import settings
+from utils.search import build_search_fields
+from utils.security import pwd_context
+
+BENCH_PASSWORD = "bench-secret"
+DEFAULT_MIX = "browse=50,detail=25,cart=15,checkout=5,login=5"
+SIZES = ["XS", "S", "M", "L", "XL"]
+COLORS = [("Siyah", "#000000"), ("Beyaz", "#FFFFFF"), ("Lacivert", "#1F2A44"), ("Kırmızı", "#C0392B"), ("Bej", "#D8C3A5")]
+SORTS = ["createdAt_desc", "price_asc", "price_desc", "popular"]
+
+# O anda çalışan isteğin etiketi; round-trip'ler bu etikete yazılır
+_current_label: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("bench_label", default=None)
+
+
+# --- Round-trip sayımı ---
+
+class RoundTripCounter:
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+
+    def record(self) -> None:
+        label = _current_label.get() or "_arka_plan"
+        self.counts[label] = self.counts.get(label, 0) + 1
+
+    def reset(self) -> None:
+        self.counts = {}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """mongod: sürücünün gönderdiği her komutu (find, getMore, update...) sayar."""
+
+    def __init__(self, counter: RoundTripCounter):
+        self.counter = counter
+
+    def started(self, event):
+        self.counter.record()
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+_COUNTED_METHODS = {
+    "find", "find_one", "aggregate", "count_documents", "estimated_document_count", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_delete", "find_one_and_replace", "bulk_write",
+}
+
+
+class CountingCollection:
+    """mongomock: koleksiyon işlemlerini sayan ince sarmalayıcı."""
+
+    def __init__(self, collection, counter: RoundTripCounter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in _COUNTED_METHODS:
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.record()
+            return attr(*args, **kwargs)
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, db, counter: RoundTripCounter):
+        self._db = db
+        self._counter = counter
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self._counter)
+
+    def get_collection(self, name, **kwargs):
+        return CountingCollection(self._db.get_collection(name, **kwargs), self._counter)
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if name != "command":
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.record()
+            return attr(*args, **kwargs)
+        return counted
+
+
+async def open_database(args, counter: RoundTripCounter):
+    """Uygulamanın kullanacağı veritabanını hazırlar ve database.db_instance'a bağlar."""
+    if args.backend == "mongod":
+        from motor.motor_asyncio import AsyncIOMotorClient
+        if args.db_name == settings.DB_NAME:
+            raise SystemExit(f"Benchmark veritabanı uygulama veritabanıyla aynı olamaz ({settings.DB_NAME}).")
+        client = AsyncIOMotorClient(args.mongo_uri, serverSelectionTimeoutMS=5000, event_listeners=[CommandCounter(counter)])
+        hello = await client.admin.command("hello")
+        raw_db = client[args.db_name]
+        app_db = raw_db
+        database.db_instance.supports_transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("mongomock backend'i için: pip install mongomock-motor")
+        client = AsyncMongoMockClient()
+        raw_db = client[args.db_name]
+        app_db = CountingDatabase(raw_db, counter)
+        database.db_instance.supports_transactions = False
+    database.db_instance.client = client
+    database.db_instance.db = app_db
+    return client, raw_db
+
+
+# --- Veri üretimi ---
+
+def generate_products(count: int, category_ids: List[ObjectId], rng: random.Random):
+    now = datetime.now(timezone.utc)
+    for index in range(count):
+        price = float(rng.randint(10, 50) * 10)
+        variants = [
+            {"size": size, "colorName": color, "colorHex": color_hex, "stock": rng.randint(5, 50), "sku": f"BENCH-{index}-{color_index}-{size}"}
+            for color_index, (color, color_hex) in enumerate(rng.sample(COLORS, rng.randint(1, 2)))
+            for size in SIZES
+        ]
+        name = f"Bench Ürün {index} {rng.choice(['Elbise', 'Bluz', 'Etek', 'Pantolon', 'Ceket'])}"
+        product = {
+            "_id": ObjectId(),
+            "name": name,
+            "slug": f"bench-urun-{index}",
+            "description": f"{name} günlük kullanım için uygundur.",
+            "images": [{"url": f"https://placehold.co/800x1100?text={index}", "alt": name, "isMain": True}],
+            "brand": "DOVL",
+            "price": price,
+            "salePrice": round(price * 0.8, 2) if rng.random() < 0.3 else None,
+            "category": rng.choice(category_ids),
+            "tags": ["bench"],
+            "variants": variants,
+            "totalStock": sum(variant["stock"] for variant in variants),
+            "isFeatured": rng.random() < 0.25,
+            "isNew": rng.random() < 0.33,
+            "isActive": True,
+            "averageRating": round(rng.uniform(3.5, 5.0), 1),
+            "numReviews": rng.randint(0, 50),
+            "salesCount": rng.randint(0, 100),
+            "viewCount": rng.randint(10, 500),
+            "createdAt": now - timedelta(minutes=index),
+            "updatedAt": now,
+        }
+        product.update(build_search_fields(product))
+        yield product
+
+
+async def seed(raw_db, args, rng: random.Random) -> dict:
+    """Veritabanını temizleyip istenen ölçekte doldurur. Senaryoların kullanacağı ID/slug'ları döndürür."""
+    for name in ("products", "categories", "users", "carts", "orders", "campaigns", "counters"):
+        await raw_db[name].delete_many({})
+
+    now = datetime.now(timezone.utc)
+    roots = [{"_id": ObjectId(), "name": f"Kök {i}", "slug": f"kok-{i}", "parentCategory": None, "ancestors": []} for i in range(4)]
+    children = [
+        {"_id": ObjectId(), "name": f"Alt {i}", "slug": f"alt-{i}", "parentCategory": root["_id"], "ancestors": [root["_id"]]}
+        for i, root in enumerate(roots * 3)
+    ]
+    categories = [{**category, "isActive": True, "order": 0, "productCount": 0, "createdAt": now, "updatedAt": now} for category in roots + children]
+    await raw_db["categories"].insert_many(categories)
+    leaf_ids = [category["_id"] for category in children]
+
+    started = time.perf_counter()
+    slugs, variant_skus, batch, counts = [], [], [], {}
+    for product in generate_products(args.products, leaf_ids, rng):
+        batch.append(product)
+        counts[product["category"]] = counts.get(product["category"], 0) + 1
+        if len(slugs) < 5000:
+            slugs.append(product["slug"])
+            variant_skus.append((str(product["_id"]), product["variants"][0]["sku"]))
+        if len(batch) >= args.batch_size:
+            await raw_db["products"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await raw_db["products"].insert_many(batch, ordered=False)
+    for category_id, count in counts.items():
+        await raw_db["categories"].update_one({"_id": category_id}, {"$set": {"productCount": count}})
+
+    # Tüm kullanıcılar aynı şifreyi kullanır: tek hash yeterli (uygulamanın BCRYPT_ROUNDS ayarıyla)
+    hashed_password = pwd_context.hash(BENCH_PASSWORD)
+    users = [
+        {"_id": ObjectId(), "name": "Bench", "surname": f"User{i}", "email": f"bench{i}@example.com", "hashed_password": hashed_password,
+         "role": "user", "isActive": True, "addresses": [], "orderHistory": [], "createdAt": now, "updatedAt": now}
+        for i in range(max(args.users, args.concurrency))
+    ]
+    await raw_db["users"].insert_many(users)
+    print(f"Veri hazır: {args.products} ürün, {len(categories)} kategori, {len(users)} kullanıcı ({time.perf_counter() - started:.1f} sn)")
+    return {"slugs": slugs, "variants": variant_skus, "category_slugs": [category["slug"] for category in categories],
+            "emails": [user["email"] for user in users]}
+
+
+# --- Senaryolar ---
+
+ADDRESS = {"title": "Ev", "fullName": "Bench User", "address": "Örnek Mahallesi No:1", "city": "İstanbul", "phone": "05551112233"}
+
+
+class Metrics:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, label: str, latency: float, ok: bool) -> None:
+        self.latencies.setdefault(label, []).append(latency)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+
+class VirtualUser:
+    """Kendi çerezleri (misafir sepeti) ve token'ı olan sanal kullanıcı."""
+
+    def __init__(self, app, email: str, fixture: dict, metrics: Metrics, rng: random.Random):
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+        self.email = email
+        self.fixture = fixture
+        self.metrics = metrics
+        self.rng = rng
+        self.auth_headers: Dict[str, str] = {}
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        token = _current_label.set(label)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as e:
+            print(f"{label} isteği hata verdi: {e}")
+        finally:
+            _current_label.reset(token)
+        self.metrics.record(label, time.perf_counter() - start, response is not None and response.status_code < 400)
+        return response
+
+    async def login(self, label: str = "POST /auth/login") -> None:
+        response = await self.request(label, "POST", "/auth/login", data={"username": self.email, "password": BENCH_PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.auth_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def _random_variant(self) -> dict:
+        product_id, sku = self.rng.choice(self.fixture["variants"])
+        return {"productId": product_id, "variantSku": sku, "quantity": 1}
+
+    async def browse(self) -> None:
+        params = {"page": self.rng.randint(1, 5), "limit": 12, "sort": self.rng.choice(SORTS)}
+        if self.rng.random() < 0.5:
+            params["category"] = self.rng.choice(self.fixture["category_slugs"])
+            params["includeSubcategories"] = "true"
+        await self.request("GET /products/", "GET", "/products/", params=params)
+
+    async def detail(self) -> None:
+        await self.request("GET /products/{slug}", "GET", f"/products/{self.rng.choice(self.fixture['slugs'])}")
+
+    async def cart(self) -> None:
+        await self.request("POST /cart/items", "POST", "/cart/items", json=self._random_variant())
+        await self.request("GET /cart/", "GET", "/cart/")
+
+    async def checkout(self) -> None:
+        if not self.auth_headers:
+            await self.login("setup")
+        await self.request("POST /cart/items", "POST", "/cart/items", json=self._random_variant(), headers=self.auth_headers)
+        await self.request("POST /orders/", "POST", "/orders/", headers=self.auth_headers,
+                           json={"shippingAddress": ADDRESS, "billingAddress": ADDRESS, "paymentMethod": "credit_card"})
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("browse", "detail", "cart", "checkout", "login"):
+            raise SystemExit(f"Bilinmeyen senaryo: {name}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+async def run_load(app, fixture: dict, args, metrics: Metrics, duration: float, seed_offset: int) -> float:
+    weights = parse_mix(args.mix)
+    names, scenario_weights = list(weights), list(weights.values())
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int):
+        rng = random.Random(args.seed + seed_offset + index)
+        user = VirtualUser(app, fixture["emails"][index % len(fixture["emails"])], fixture, metrics, rng)
+        try:
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(names, scenario_weights)[0]
+                if scenario == "login":
+                    await user.login()
+                else:
+                    await getattr(user, scenario)()
+        finally:
+            await user.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(args.concurrency)))
+    return time.perf_counter() - start
+
+
+# --- Raporlama ---
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(metrics: Metrics, counter: RoundTripCounter, elapsed: float) -> Dict[str, dict]:
+    results = {}
+    for label, latencies in sorted(metrics.latencies.items()):
+        if label == "setup":
+            continue
+        results[label] = {
+            "requests": len(latencies),
+            "errors": metrics.errors.get(label, 0),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2),
+            "db_round_trips_per_request": round(counter.counts.get(label, 0) / len(latencies), 2),
+        }
+    return results
+
+
+def print_results(results: Dict[str, dict], elapsed: float, baseline: Optional[Dict[str, dict]] = None) -> None:
+    total = sum(result["requests"] for result in results.values())
+    print(f"\n{total} istek, {elapsed:.1f} sn, toplam {total / elapsed:,.1f} RPS")
+    header = f"{'endpoint':<24}{'istek':>8}{'hata':>6}{'RPS':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'db/istek':>10}"
+    if baseline:
+        header += f"{'Δp99':>10}{'ΔRPS':>9}"
+    print(header)
+    for label, result in results.items():
+        line = (f"{label:<24}{result['requests']:>8}{result['errors']:>6}{result['rps']:>9.1f}"
+                f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['db_round_trips_per_request']:>10.2f}")
+        previous = (baseline or {}).get(label)
+        if previous:
+            line += f"{_percent_change(previous['p99_ms'], result['p99_ms']):>10}{_percent_change(previous['rps'], result['rps']):>9}"
+        print(line)
+
+
+def _percent_change(old: float, new: float) -> str:
+    if not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def main_async(args) -> None:
+    # Uygulama import'u ayarlar okunduktan sonra yapılır (router'lar ayarları import sırasında okur)
+    from main import app
+    from utils.view_counter import view_counter
+
+    counter = RoundTripCounter()
+    client, raw_db = await open_database(args, counter)
+    rng = random.Random(args.seed)
+    try:
+        if args.reuse and await raw_db["products"].estimated_document_count() >= args.products:
+            print("Mevcut benchmark verisi kullanılıyor.")
+            fixture = {
+                "slugs": [], "variants": [],
+                "category_slugs": [category["slug"] async for category in raw_db["categories"].find({}, {"slug": 1})],
+                "emails": [user["email"] async for user in raw_db["users"].find({"email": {"$regex": "^bench"}}, {"email": 1})],
+            }
+            async for product in raw_db["products"].find({}, {"slug": 1, "variants": {"$slice": 1}}).limit(5000):
+                fixture["slugs"].append(product["slug"])
+                fixture["variants"].append((str(product["_id"]), product["variants"][0]["sku"]))
+        else:
+            fixture = await seed(raw_db, args, rng)
+        if args.backend == "mongod":
+            from utils.indexes import ensure_indexes, log_index_report
+            log_index_report(await ensure_indexes(raw_db))
+            view_counter.start(database.db_instance.db)
+
+        if args.warmup > 0:
+            await run_load(app, fixture, args, Metrics(), args.warmup, seed_offset=10_000)
+        counter.reset()
+        metrics = Metrics()
+        elapsed = await run_load(app, fixture, args, metrics, args.duration, seed_offset=0)
+        results = summarize(metrics, counter, elapsed)
+
+        baseline = None
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)["results"]
+        print(f"\nbackend={args.backend} ürün={args.products} eşzamanlılık={args.concurrency} karışım={args.mix}")
+        print_results(results, elapsed, baseline)
+
+        if args.json:
+            report = {
+                "revision": _git_revision(),
+                "createdAt": datetime.now(timezone.utc).isoformat(),
+                "config": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+                "elapsedSeconds": round(elapsed, 3),
+                "results": results,
+            }
+            with open(args.json, "w", encoding="utf-8") as report_file:
+                json.dump(report, report_file, ensure_ascii=False, indent=2)
+            print(f"\nSonuçlar yazıldı: {args.json}")
+    finally:
+        if args.backend == "mongod":
+            await view_counter.stop(database.db_instance.db)
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Uçtan uca HTTP yük ve gecikme benchmark'ı")
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="dovl_bench")
+    parser.add_argument("--products", type=int, default=10_000, help="Ürün sayısı (örn. 10000, 100000, 1000000)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Veri yükleme insert_many boyutu")
+    parser.add_argument("--reuse", action="store_true", help="Yeterli veri varsa yeniden doldurma (sadece mongod)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Sanal kullanıcı sayısı")
+    parser.add_argument("--duration", type=float, default=15.0, help="Ölçüm süresi (sn)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Ölçüm öncesi ısınma süresi (sn)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Senaryo ağırlıkları (varsayılan: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Sonuçların yazılacağı JSON dosyası")
+    parser.add_argument("--compare", help="Karşılaştırılacak önceki JSON sonucu")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
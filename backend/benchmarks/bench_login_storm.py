@@ -0,0 +1,121 @@
+# backend/benchmarks/bench_login_storm.py
+"""
+Giriş yoğunluğu sırasında ilgisiz endpoint gecikmesi (veritabanı gerektirmez).
+
+Aynı event loop'ta eşzamanlı şifre doğrulamaları yapılırken hafif bir endpoint'e
+sabit aralıklarla istek "gelir"; her isteğin gecikmesi planlanan geliş anından yanıta
+kadar ölçülür (loop bloklandığında bekleyen istekler de sayılır) ve p50/p99 raporlanır:
+- inline: bcrypt doğrudan event loop'ta (eski davranış)
+- pool:   bcrypt PasswordHasher thread havuzunda (utils/password_hashing.py)
+
+Kullanım (backend dizininden):
+    python -m benchmarks.bench_login_storm --logins 40 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from passlib.context import CryptContext
+
+from config import settings
+from utils.password_hashing import PasswordHasher, PasswordHasherBusy
+
+PASSWORD = "benchmark-secret"
+
+
+def build_app(context: CryptContext, hasher: PasswordHasher, hashed_password: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login-inline")
+    async def login_inline():
+        return {"ok": context.verify(PASSWORD, hashed_password)}
+
+    @app.post("/login-pool")
+    async def login_pool():
+        try:
+            is_valid, _ = await hasher.verify_and_update(PASSWORD, hashed_password)
+        except PasswordHasherBusy:
+            raise HTTPException(status_code=429)
+        return {"ok": is_valid}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_storm(client: httpx.AsyncClient, login_path: str, logins: int, probe_interval: float):
+    latencies = []
+    statuses = []
+    storm_done = asyncio.Event()
+    storm_end = [0.0]
+
+    async def ping(arrival: float):
+        await client.get("/ping")
+        latencies.append(time.perf_counter() - arrival)
+
+    async def probe():
+        # Açık döngü: istekler yanıt beklenmeden planlanan anlarda gönderilir; loop
+        # bloklandığı için gecikenler (fırtına bitene kadar planlananlar) hemen gönderilir
+        first_arrival = time.perf_counter()
+        pings = []
+        while True:
+            arrival = first_arrival + len(pings) * probe_interval
+            if storm_done.is_set() and arrival > storm_end[0]:
+                break
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            pings.append(asyncio.create_task(ping(arrival)))
+        await asyncio.gather(*pings)
+
+    async def storm():
+        responses = await asyncio.gather(*(client.post(login_path) for _ in range(logins)))
+        statuses.extend(response.status_code for response in responses)
+        storm_end[0] = time.perf_counter()
+        storm_done.set()
+
+    start = time.perf_counter()
+    await asyncio.gather(probe(), storm())
+    return latencies, statuses, time.perf_counter() - start
+
+
+async def main_async(args) -> None:
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    hashed_password = context.hash(PASSWORD)
+    hasher = PasswordHasher(context, max_workers=args.workers, max_pending=args.max_pending)
+    app = build_app(context, hasher, hashed_password)
+
+    print(f"{args.logins} eşzamanlı giriş, bcrypt rounds={args.rounds}, havuz={args.workers} thread / {args.max_pending} bekleyen")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for mode, path in (("inline", "/login-inline"), ("pool", "/login-pool")):
+            latencies, statuses, duration = await run_storm(client, path, args.logins, args.probe_interval)
+            rejected = sum(1 for status_code in statuses if status_code == 429)
+            print(
+                f"{mode:>6}: /ping p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms  "
+                f"({len(latencies)} ölçüm, süre {duration:.2f} sn, 429: {rejected})"
+            )
+    hasher.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Giriş yoğunluğu sırasında ilgisiz endpoint gecikmesi")
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=settings.PASSWORD_HASH_MAX_PENDING)
+    parser.add_argument("--probe-interval", type=float, default=0.005, help="/ping istekleri arası bekleme (sn)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# backend/benchmarks/bench_pricing.py
+"""
+Sepet fiyatlandırma motoru için mikro benchmark (veritabanı gerektirmez).
+
+Kullanım (backend dizininden):
+    python -m benchmarks.bench_pricing --carts 10000 --items 5
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from utils.pricing import price_carts
+
+
+def build_fixture(cart_count: int, items_per_cart: int, product_count: int, seed: int = 42):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    products = {}
+    for i in range(product_count):
+        product_id = ObjectId()
+        price = round(rng.uniform(50, 2000), 2)
+        products[product_id] = {
+            "_id": product_id,
+            "name": f"Ürün {i}",
+            "slug": f"urun-{i}",
+            "price": price,
+            "salePrice": round(price * 0.8, 2) if rng.random() < 0.3 else None,
+            "images": [{"url": f"https://example.com/{i}.jpg"}],
+            "variants": [{"sku": f"SKU-{i}-{size}", "size": size, "colorName": "Siyah", "colorHex": "#000000",
+                          "stock": rng.randint(0, 20)} for size in ("S", "M", "L")],
+        }
+    campaign_id = ObjectId()
+    campaigns = {campaign_id: {
+        "_id": campaign_id, "code": "YUZDE10", "isActive": True, "discountType": "percentage",
+        "discountValue": 10, "maxDiscount": 250, "minPurchaseAmount": 300,
+        "startDate": now - timedelta(days=1), "endDate": now + timedelta(days=1),
+    }}
+
+    product_list = list(products.values())
+    carts = []
+    for _ in range(cart_count):
+        items = []
+        for product in rng.sample(product_list, items_per_cart):
+            variant = rng.choice(product["variants"])
+            items.append({"_id": ObjectId(), "product": product["_id"], "variantSku": variant["sku"],
+                          "quantity": rng.randint(1, 3)})
+        cart = {"_id": ObjectId(), "items": items}
+        if rng.random() < 0.5:
+            cart["campaign"] = {"id": campaign_id}
+        carts.append(cart)
+    return carts, products, campaigns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sepet fiyatlandırma mikro benchmark")
+    parser.add_argument("--carts", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    carts, products, campaigns = build_fixture(args.carts, args.items, args.products)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        price_carts(carts, products, campaigns)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    print(f"{args.carts} sepet x {args.items} kalem, {args.repeat} tekrar")
+    print(f"en iyi: {best * 1000:.1f} ms  ({args.carts / best:,.0f} sepet/sn, {best / args.carts * 1e6:.1f} µs/sepet)")
+
+
+if __name__ == "__main__":
+    main()
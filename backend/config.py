@@ -16,15 +16,84 @@ class Settings(BaseSettings):
     JWT_SECRET: str = os.getenv("JWT_SECRET", "default_secret")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60 * 24 * 7))
+    # bcrypt maliyeti; değiştirilirse eski hash'ler kullanıcı giriş yaptığında yeniden üretilir
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    # Şifre hash havuzu: thread sayısı ve çalışan + bekleyen işlem sınırı (aşılırsa 429)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
     ALLOWED_ORIGINS_STR: str = os.getenv("ALLOWED_ORIGINS_STR", "http://localhost:3000")
     TAX: int = int(os.getenv("TAX", 18))
     FREE_SHIPPING_THRESHOLD: float = float(os.getenv("FREE_SHIPPING_THRESHOLD", 300.0))
     SHIPPING_COST: float = float(os.getenv("SHIPPING_COST", 29.90))
 
+    # MongoDB istemci ayarları (her worker process'inin kendi havuzu vardır)
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 0))  # 0 = sınırsız
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))  # 0 = sınırsız
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    # Sunucu ile anlaşılan ilk ortak sıkıştırma kullanılır; kurulu olmayanlar atlanır (zstandard, python-snappy)
+    MONGO_COMPRESSORS: str = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    MONGO_RETRY_WRITES: bool = os.getenv("MONGO_RETRY_WRITES", "true").lower() == "true"
+    MONGO_RETRY_READS: bool = os.getenv("MONGO_RETRY_READS", "true").lower() == "true"
+    MONGO_APP_NAME: str = os.getenv("MONGO_APP_NAME", "dovl-api")
+    # Ürün listeleme/detay okumaları (replica set'te ikincil üyelere dağıtılır)
+    CATALOG_READ_PREFERENCE: str = os.getenv("CATALOG_READ_PREFERENCE", "secondaryPreferred")
+
+    # Index ayarları
+    ENSURE_INDEXES_ON_STARTUP: bool = os.getenv("ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true"
+    GUEST_CART_TTL_DAYS: int = int(os.getenv("GUEST_CART_TTL_DAYS", 30))
+    EMPTY_GUEST_CART_TTL_HOURS: int = int(os.getenv("EMPTY_GUEST_CART_TTL_HOURS", 24))
+    CART_SWEEP_INTERVAL_MINUTES: float = float(os.getenv("CART_SWEEP_INTERVAL_MINUTES", 60))
+    CATEGORY_CACHE_TTL_SECONDS: int = int(os.getenv("CATEGORY_CACHE_TTL_SECONDS", 300))
+    CAMPAIGN_CACHE_TTL_SECONDS: int = int(os.getenv("CAMPAIGN_CACHE_TTL_SECONDS", 60))
+    COUNT_CACHE_TTL_SECONDS: int = int(os.getenv("COUNT_CACHE_TTL_SECONDS", 30))
+    # Doğrulanmış kullanıcı önbelleği (kullanıcı ID + token iat); 0 kapatır
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 30))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+    SEARCH_BACKFILL_ON_STARTUP: bool = os.getenv("SEARCH_BACKFILL_ON_STARTUP", "true").lower() == "true"
+    CATEGORY_TREE_BACKFILL_ON_STARTUP: bool = os.getenv("CATEGORY_TREE_BACKFILL_ON_STARTUP", "true").lower() == "true"
+
+    # Yanıt önbelleği ayarları (anonim ürün listeleme)
+    PRODUCT_LIST_CACHE_ENABLED: bool = os.getenv("PRODUCT_LIST_CACHE_ENABLED", "true").lower() == "true"
+    PRODUCT_LIST_CACHE_TTL_SECONDS: int = int(os.getenv("PRODUCT_LIST_CACHE_TTL_SECONDS", 30))
+    PRODUCT_LIST_CACHE_STALE_SECONDS: int = int(os.getenv("PRODUCT_LIST_CACHE_STALE_SECONDS", 120))
+    RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory | mongo
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 512))
+
+    # Ürün görüntülenme sayaçları bellekte biriktirilip toplu yazılır
+    VIEW_COUNT_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("VIEW_COUNT_FLUSH_INTERVAL_SECONDS", 10))
+    VIEW_COUNT_MAX_BUFFER_SIZE: int = int(os.getenv("VIEW_COUNT_MAX_BUFFER_SIZE", 5000))
+
+    # Sipariş numarası: 1 = her siparişte tek $inc, >1 = worker başına numara bloğu ayır
+    ORDER_NUMBER_BLOCK_SIZE: int = int(os.getenv("ORDER_NUMBER_BLOCK_SIZE", 1))
+
+    # Loglama: JSON satırları kuyruk üzerinden arka plan thread'inde yazılır
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")  # Modül bazında, örn. "routers.products=DEBUG,utils.security=WARNING"
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json | text
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # Doluysa yeni kayıtlar atılır
+    # Aynı uyarı/hata mesajı pencere başına en fazla LOG_SAMPLE_BURST kez yazılır (0 kapatır)
+    LOG_SAMPLE_WINDOW_SECONDS: float = float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", 60))
+    LOG_SAMPLE_BURST: int = int(os.getenv("LOG_SAMPLE_BURST", 10))
+
+    # İstek metrikleri: Server-Timing başlığı, /metrics (Prometheus) ve Mongo komut sayımı
+    REQUEST_METRICS_ENABLED: bool = os.getenv("REQUEST_METRICS_ENABLED", "true").lower() == "true"
+    # Bir istekte bundan fazla Mongo komutu çalışırsa uyarı loglanır (0 kapatır)
+    REQUEST_DB_CALL_WARNING_THRESHOLD: int = int(os.getenv("REQUEST_DB_CALL_WARNING_THRESHOLD", 25))
+    # /metrics'e erişebilen istemci ağları (virgülle ayrılmış CIDR). Route şablonları ve Mongo
+    # komut sayıları iç bilgidir; sadece scraper ağı eklenmeli. Proxy arkasında istemci adresi
+    # proxy'nin adresidir, /metrics proxy'den dışarı açılmamalıdır.
+    METRICS_ALLOWED_NETWORKS_STR: str = os.getenv("METRICS_ALLOWED_NETWORKS", "127.0.0.1/32,::1/128")
+
     @property
     def allowed_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS_STR.split(',') if origin.strip()]
 
+    @property
+    def metrics_allowed_networks_list(self) -> List[str]:
+        return [network.strip() for network in self.METRICS_ALLOWED_NETWORKS_STR.split(',') if network.strip()]
+
     class Config:
         env_file = '.env'
         env_file_encoding = 'utf-8'
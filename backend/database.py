@@ -1,13 +1,60 @@
 # backend/database.py
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from config import settings, IS_TESTING # IS_TESTING import edildi
-from typing import Optional
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from typing import List, Optional
+import importlib.util
+import logging
+import os
+from utils.request_metrics import db_command_listener
 
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     db: Optional[AsyncIOMotorDatabase] = None
+    catalog_db: Optional[AsyncIOMotorDatabase] = None  # Katalog okumaları (CATALOG_READ_PREFERENCE)
+    supports_transactions: bool = False  # Replica set / mongos ise True
 
 db_instance = Database()
+logger = logging.getLogger(__name__)
+
+# Sıkıştırma adı -> gereken Python modülü (zlib standart kütüphanede)
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+def available_compressors(names: str) -> List[str]:
+    """Ayardaki sıkıştırıcılardan modülü kurulu olanları sırayla döndürür."""
+    compressors = []
+    for name in (item.strip().lower() for item in names.split(",")):
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            compressors.append(name)
+        elif name:
+            logger.info("MongoDB sıkıştırması '%s' kullanılamıyor (%s modülü kurulu değil veya bilinmiyor)", name, module or "?")
+    return compressors
+
+def client_options() -> dict:
+    """
+    AsyncIOMotorClient ayarları. Havuz her worker process'i için ayrıdır: toplam bağlantı
+    üst sınırı worker sayısı x MONGO_MAX_POOL_SIZE olur.
+    """
+    options = {
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "retryWrites": settings.MONGO_RETRY_WRITES,
+        "retryReads": settings.MONGO_RETRY_READS,
+        "appname": settings.MONGO_APP_NAME,
+    }
+    # 0 = pymongo varsayılanı (boşta bağlantı kapatılmaz / havuz beklemesi sınırsız)
+    if settings.MONGO_MAX_IDLE_TIME_MS > 0:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS > 0:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    compressors = available_compressors(settings.MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = compressors
+    if settings.REQUEST_METRICS_ENABLED:
+        options["event_listeners"] = [db_command_listener]
+    return options
 
 async def connect_to_mongo():
     """MongoDB'ye bağlanır. Test ortamı için farklı veritabanı kullanır."""
@@ -15,37 +62,70 @@ async def connect_to_mongo():
     mongo_uri = settings.TEST_MONGO_URI if IS_TESTING else settings.MONGO_URI
     db_name = settings.TEST_DB_NAME if IS_TESTING else settings.DB_NAME
 
-    print(f"MongoDB'ye bağlanılıyor ({'TEST' if IS_TESTING else 'NORMAL'}) -> {db_name}...")
+    logger.info("MongoDB'ye bağlanılıyor (%s) -> %s...", "TEST" if IS_TESTING else "NORMAL", db_name)
     try:
-        db_instance.client = AsyncIOMotorClient(mongo_uri, serverSelectionTimeoutMS=5000)
-        await db_instance.client.admin.command('ping') # Bağlantıyı test et
+        # İstemci her process'te lifespan içinde oluşturulur (fork sonrası; gunicorn.conf.py)
+        options = client_options()
+        db_instance.client = AsyncIOMotorClient(mongo_uri, **options)
+        hello = await db_instance.client.admin.command('hello') # Bağlantıyı test et
         db_instance.db = db_instance.client[db_name]
-        print(f"MongoDB bağlantısı başarılı: Veritabanı '{db_name}'")
+        read_preference = make_read_preference(read_pref_mode_from_name(settings.CATALOG_READ_PREFERENCE), None)
+        db_instance.catalog_db = db_instance.client.get_database(db_name, read_preference=read_preference)
+        logger.info(
+            "MongoDB istemcisi (pid %d): havuz %d-%d, sıkıştırma %s, katalog okumaları %s",
+            os.getpid(), options["minPoolSize"], options["maxPoolSize"],
+            ",".join(options.get("compressors", [])) or "yok", settings.CATALOG_READ_PREFERENCE,
+        )
+        # Çok belgeli transaction'lar sadece replica set veya sharded cluster'da desteklenir
+        db_instance.supports_transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        logger.info("MongoDB bağlantısı başarılı: Veritabanı '%s' (transaction desteği: %s)", db_name, db_instance.supports_transactions)
     except Exception as e:
-        print(f"MongoDB bağlantı hatası ({db_name}): {e}")
+        logger.error("MongoDB bağlantı hatası (%s): %s", db_name, e)
         db_instance.client = None
         db_instance.db = None
+        db_instance.catalog_db = None
+        db_instance.supports_transactions = False
         raise RuntimeError(f"Database connection failed for {db_name}: {e}") # Testlerin başarısız olması için hata fırlat
 
 async def close_mongo_connection():
     """MongoDB bağlantısını kapatır."""
     db_name = settings.TEST_DB_NAME if IS_TESTING else settings.DB_NAME
-    print(f"MongoDB bağlantısı kapatılıyor ({db_name})...")
+    logger.info("MongoDB bağlantısı kapatılıyor (%s)...", db_name)
     if db_instance.client:
         db_instance.client.close()
-        print(f"MongoDB bağlantısı kapatıldı ({db_name}).")
+        logger.info("MongoDB bağlantısı kapatıldı (%s).", db_name)
     # Test sonrası için db nesnesini sıfırla
     db_instance.client = None
     db_instance.db = None
+    db_instance.catalog_db = None
+    db_instance.supports_transactions = False
 
 
 def get_database() -> AsyncIOMotorDatabase:
     """Veritabanı nesnesini döndürür."""
     if db_instance.db is None:
-        print("Hata: Veritabanı bağlantısı henüz kurulmamış veya başarısız olmuş.")
+        logger.error("Veritabanı bağlantısı henüz kurulmamış veya başarısız olmuş.")
         raise RuntimeError("Database connection not established.")
     return db_instance.db
 
+def get_catalog_database() -> AsyncIOMotorDatabase:
+    """
+    Ürün listeleme/detay okumaları için veritabanı (varsayılan secondaryPreferred).
+    Replikasyon gecikmesi kadar eski veri dönebilir; yazma sonrası okuma gereken
+    yerlerde ve önbelleğe uzun süre alınan veride get_database kullanılmalı.
+    """
+    if db_instance.catalog_db is not None:
+        return db_instance.catalog_db
+    return get_database()
+
+def supports_transactions() -> bool:
+    """Bağlı sunucunun çok belgeli transaction destekleyip desteklemediğini döndürür."""
+    return db_instance.supports_transactions
+
 async def get_db_dependency():
     """FastAPI dependency to get database instance."""
-    return get_database()
\ No newline at end of file
+    return get_database()
+
+async def get_catalog_db_dependency():
+    """Katalog okumaları için FastAPI dependency (CATALOG_READ_PREFERENCE)."""
+    return get_catalog_database()
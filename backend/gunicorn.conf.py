@@ -0,0 +1,55 @@
+# backend/gunicorn.conf.py
+"""
+Çok process'li üretim başlatıcısı: gunicorn worker'ları yönetir, her worker bir
+uvicorn event loop'u çalıştırır.
+
+Kullanım (backend dizininden):
+    gunicorn main:app -c gunicorn.conf.py
+    WEB_CONCURRENCY=8 MONGO_MAX_POOL_SIZE=50 gunicorn main:app -c gunicorn.conf.py
+
+Process başına durum:
+- MongoDB istemcisi lifespan içinde, yani fork'tan sonra her worker'da ayrı oluşturulur
+  (database.connect_to_mongo). MongoClient fork güvenli değildir; master process'te
+  istemci açılmaz. Toplam bağlantı üst sınırı WEB_CONCURRENCY x MONGO_MAX_POOL_SIZE'dır,
+  sunucunun bağlantı limitine göre ayarlanmalıdır.
+- Önbellekler (kategori, kampanya, kullanıcı, yanıt önbelleği memory backend) worker
+  başınadır; admin değişikliği sadece isteği alan worker'da anında geçersiz kılınır,
+  diğerlerinde TTL sonunda yenilenir. Paylaşımlı yanıt önbelleği için RESPONSE_CACHE_BACKEND=mongo.
+- Görüntülenme sayacı ve sepet temizleyici her worker'da çalışır (yazmalar $inc /
+  koşullu silme olduğundan tekrar çalışması güvenlidir).
+- ORDER_NUMBER_BLOCK_SIZE > 1 ise her worker kendi sipariş numarası bloğunu ayırır.
+- bcrypt havuzu (PASSWORD_HASH_WORKERS) worker başınadır; CPU sayısı x 1 civarı
+  toplam thread yeterlidir.
+- /metrics worker başınadır ve sadece METRICS_ALLOWED_NETWORKS (varsayılan loopback)
+  içinden okunabilir; scraper ağı bu ayara eklenmeli, /metrics dış proxy'den açılmamalıdır.
+
+preload_app kapalıdır: uygulama her worker'da ayrı import edilir. Açılırsa loglama
+thread'i fork sonrası yeniden başlatılır (utils/log.py), MongoDB istemcisi zaten
+lifespan'de oluşturulduğu için etkilenmez.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = False
+
+# Uzun süren istekler (toplu admin işlemleri) dışında 30 sn yeterli; graceful_timeout
+# içinde lifespan kapanışı (bekleyen sayaçların yazılması) tamamlanır
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Bellek sızıntılarına karşı worker'lar periyodik olarak yenilenir (aynı anda değil)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+# Uygulama logları utils/log.py ile stdout'a JSON yazılır; gunicorn'un kendi logları
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None  # Erişim logu varsayılan kapalı (/metrics kullanılır)
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    server.log.info("Worker başlatıldı (pid %s)", worker.pid)
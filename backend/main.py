@@ -1,10 +1,18 @@
 # backend/main.py
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from database import connect_to_mongo, close_mongo_connection, get_database
 from config import settings # settings import edildi
+from utils.indexes import ensure_indexes, log_index_report
+from utils.search import backfill_search_tokens
+from utils.category_tree import backfill_category_tree
+from utils.view_counter import view_counter
+from utils.cart_sweeper import cart_sweeper
+from utils.security import password_hasher
+from utils.request_metrics import RequestMetricsMiddleware, metrics_registry, client_in_networks
+from utils.log import setup_logging, shutdown_logging
 from pymongo.errors import ConnectionFailure
 import time
 import os
@@ -12,16 +20,51 @@ import random
 from bson import ObjectId
 import pymongo
 import traceback # Geliştirme için traceback
+import logging
 
 # --- Rotaları Import Etme ---
 from routers import auth, users, products, categories, orders, campaigns, cart, favorites, addresses
 
+# Loglar kuyruk üzerinden arka plan thread'inde yazılır (event loop stdout'u beklemez).
+# Import sırasındaki loglar için burada, yeniden başlatmalar için lifespan'de başlatılır.
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # Ömür Döngüsü Yöneticisi
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_logging()  # Önceki kapanışta durdurulduysa yazıcı yeniden başlatılır
     await connect_to_mongo()
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        try:
+            index_report = await ensure_indexes(get_database())
+            log_index_report(index_report)
+        except Exception as e:
+            # Index hatası uygulamanın açılmasını engellemesin
+            logger.error("Index kontrolü sırasında hata: %s", e)
+    if settings.SEARCH_BACKFILL_ON_STARTUP:
+        try:
+            updated = await backfill_search_tokens(get_database())
+            if updated:
+                logger.info("Arama alanları güncellendi: %d ürün", updated)
+        except Exception as e:
+            logger.error("Arama alanları güncellenirken hata: %s", e)
+    if settings.CATEGORY_TREE_BACKFILL_ON_STARTUP:
+        try:
+            updated = await backfill_category_tree(get_database())
+            if updated:
+                logger.info("Kategori yolları/ürün sayıları güncellendi: %d kategori", updated)
+        except Exception as e:
+            logger.error("Kategori ağacı güncellenirken hata: %s", e)
+    view_counter.start(get_database())
+    cart_sweeper.start(get_database())
     yield
+    await cart_sweeper.stop()
+    password_hasher.shutdown()
+    # Bekleyen görüntülenme sayaçlarını bağlantı kapanmadan yaz
+    await view_counter.stop(get_database())
     await close_mongo_connection()
+    shutdown_logging()
 
 # FastAPI Uygulaması
 app = FastAPI(
@@ -42,12 +85,17 @@ if settings.allowed_origins_list:
         allow_headers=["*"],
     )
 else:
-     print("UYARI: ALLOWED_ORIGINS_STR ayarlanmamış veya boş. CORS Middleware devre dışı.")
+     logger.warning("ALLOWED_ORIGINS_STR ayarlanmamış veya boş. CORS Middleware devre dışı.")
+
+# İstek metrikleri (Server-Timing + /metrics). CORS'tan sonra eklenir, yani en dışta
+# çalışır ve CORS preflight dahil tüm istekleri ölçer.
+if settings.REQUEST_METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware, registry=metrics_registry)
 
 # Genel Hata Yakalayıcı
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    print(f"Beklenmedik Hata: {exc} - İstek: {request.method} {request.url}")
+    logger.error("Beklenmedik hata: %s", exc, exc_info=exc, extra={"method": request.method, "path": request.url.path})
     detail = "Sunucu hatası oluştu."
     status_code = 500
     if isinstance(exc, HTTPException):
@@ -89,6 +137,15 @@ async def read_root():
         "version": app.version
     }
 
+# Prometheus metrikleri (route bazında süre / Mongo komutu histogramları).
+# Sadece METRICS_ALLOWED_NETWORKS içindeki istemcilere açıktır, diğerleri için yok sayılır.
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics(request: Request):
+    client_host = request.client.host if request.client else None
+    if not settings.REQUEST_METRICS_ENABLED or not client_in_networks(client_host, settings.metrics_allowed_networks_list):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- Rotaları (Router) Dahil Etme ---
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
@@ -101,12 +158,14 @@ app.include_router(favorites.router, prefix="/favorites", tags=["Favorites"])
 app.include_router(addresses.router, prefix="/addresses", tags=["Addresses"])
 
 # Bilgilendirme Logları
-print("="*50)
-print(f"DOVL API v{app.version} Başlatılıyor...")
-# print(f"Ortam: {os.getenv('NODE_ENV', 'development')}")
-print(f"MongoDB URI: {settings.MONGO_URI[:15]}...{settings.MONGO_URI[-10:]}")
-print(f"Veritabanı Adı: {settings.DB_NAME}")
-print(f"JWT Secret: {'Ayarlı' if settings.JWT_SECRET != 'default_secret' else 'Varsayılan!'}")
-print(f"İzin Verilen Originler: {settings.allowed_origins_list}") # <<< Değişiklik burada
-print(f"API Dokümantasyonu: http://localhost:8000/docs")
-print("="*50)
\ No newline at end of file
+logger.info(
+    "DOVL API v%s başlatılıyor",
+    app.version,
+    extra={
+        "mongo_uri": f"{settings.MONGO_URI[:15]}...{settings.MONGO_URI[-10:]}",
+        "db_name": settings.DB_NAME,
+        "jwt_secret": "Ayarlı" if settings.JWT_SECRET != "default_secret" else "Varsayılan!",
+        "allowed_origins": settings.allowed_origins_list,
+        "docs_url": "http://localhost:8000/docs",
+    },
+)
\ No newline at end of file
@@ -17,6 +17,7 @@ class CampaignBase(BaseModel):
     isActive: bool = True
     maxUses: Optional[int] = Field(None, ge=1, description="Toplam kullanım limiti")
     usagePerCustomer: Optional[int] = Field(1, ge=0, description="Müşteri başına kullanım (0=limitsiz)")
+    usageShards: Optional[int] = Field(None, ge=1, le=64, description="Kullanım sayacı parça sayısı (yoğun flash indirim kodları için)")
     applicableTo: str = Field("all_products", pattern=r'^(all_products|specific_categories|specific_products)$')
     categories: List[PyObjectId] = [] # Uygulanacak kategoriler
     products: List[PyObjectId] = [] # Uygulanacak ürünler
@@ -40,6 +41,7 @@ class CampaignUpdate(BaseModel):
     isActive: Optional[bool] = None
     maxUses: Optional[int] = Field(None, ge=1)
     usagePerCustomer: Optional[int] = Field(None, ge=0)
+    usageShards: Optional[int] = Field(None, ge=1, le=64)
     applicableTo: Optional[str] = Field(None, pattern=r'^(all_products|specific_categories|specific_products)$')
     categories: Optional[List[PyObjectId]] = None
     products: Optional[List[PyObjectId]] = None
@@ -78,6 +78,8 @@ class Category(CategoryBase):
         arbitrary_types_allowed=True # ObjectId için
     )
     id: PyObjectId = Field(..., alias='_id')
+    ancestors: List[PyObjectId] = []  # Kökten üst kategoriye kadar olan yol
+    productCount: int = 0  # Kategoriye doğrudan bağlı ürün sayısı
     createdAt: datetime
     updatedAt: datetime
     # Üst kategori detayını da içerebiliriz
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from bson import ObjectId
 
@@ -85,4 +85,5 @@ class FavoriteList(BaseModel):
             }
         }
     )
-    favorites: List[FavoriteItem] = [] 
\ No newline at end of file
+    favorites: List[FavoriteItem] = []
+    pagination: Optional[Dict[str, Any]] = None  # total/page/limit/totalPages 
\ No newline at end of file
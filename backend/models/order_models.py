@@ -182,7 +182,7 @@ class Order(BaseModel):
 class OrderListResponse(BaseModel):
     success: bool = True
     data: List[Order]
-    pagination: Dict[str, int]
+    pagination: Dict[str, Any] # Sayfa modunda total/page/totalPages, cursor modunda nextCursor/hasMore
 
 class OrderDetailResponse(BaseModel):
     success: bool = True
@@ -135,9 +135,9 @@ class Product(ProductBase):
     viewCount: int = 0
     createdAt: datetime
     updatedAt: datetime
-    category_details: Optional[Any] = Field(None, serialization_alias='categoryDetails', validation_alias='category')
+    category_details: Optional[Any] = Field(None, serialization_alias='categoryDetails', validation_alias='category_details')
 
 class ProductListResponse(BaseModel):
     success: bool = True
     data: List[Product]
-    pagination: Dict[str, int]
\ No newline at end of file
+    pagination: Dict[str, Any] # Sayfa modunda total/page/totalPages, cursor modunda nextCursor/hasMore
\ No newline at end of file
@@ -11,4 +11,5 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     id: Optional[str] = None # Kullanıcı ID'si (veya sub)
     email: Optional[str] = None
-    role: Optional[str] = None
\ No newline at end of file
+    role: Optional[str] = None
+    iat: Optional[int] = None # Token oluşturulma zamanı (kullanıcı önbelleği anahtarı)
\ No newline at end of file
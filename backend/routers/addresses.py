@@ -8,11 +8,13 @@ from datetime import datetime, timezone
 from database import get_db_dependency
 from models.user_models import Address, AddressCreate
 from utils.security import get_current_active_user
+from utils.user_cache import user_cache
 
 router = APIRouter()
 
 # Dependency Injection
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
+# Aktiflik kontrolü için tam kullanıcı; aynı token ile gelen istekler user_cache'ten karşılanır
 CurrentUserDep = Annotated[dict, Depends(get_current_active_user)]
 
 @router.get("", response_model=List[Address])
@@ -103,6 +105,7 @@ async def add_address(address: AddressCreate, current_user: CurrentUserDep, db:
         {"_id": ObjectId(user_id)},
         {"$set": {"addresses": user["addresses"], "updatedAt": datetime.now(timezone.utc)}}
     )
+    user_cache.invalidate(user_id) # /users/me önbelleği adresleri de içerir
     
     if result.modified_count == 0:
         raise HTTPException(
@@ -183,6 +186,7 @@ async def update_address(
         {"_id": ObjectId(user_id)},
         {"$set": {"addresses": user["addresses"], "updatedAt": datetime.now(timezone.utc)}}
     )
+    user_cache.invalidate(user_id) # /users/me önbelleği adresleri de içerir
     
     if result.modified_count == 0:
         raise HTTPException(
@@ -235,6 +239,7 @@ async def delete_address(address_id: str, current_user: CurrentUserDep, db: DBDe
         {"_id": ObjectId(user_id)},
         {"$set": {"addresses": new_addresses, "updatedAt": datetime.now(timezone.utc)}}
     )
+    user_cache.invalidate(user_id) # /users/me önbelleği adresleri de içerir
     
     if result.modified_count == 0:
         raise HTTPException(
@@ -309,6 +314,7 @@ async def set_default_address(
         {"_id": ObjectId(user_id)},
         {"$set": {"addresses": user["addresses"], "updatedAt": datetime.now(timezone.utc)}}
     )
+    user_cache.invalidate(user_id) # /users/me önbelleği adresleri de içerir
     
     if result.modified_count == 0:
         raise HTTPException(
@@ -1,5 +1,5 @@
 # backend/routers/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status, Form  # Form'u ekleyin
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Request, Response  # Form'u ekleyin
 from fastapi.security import OAuth2PasswordRequestForm
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Annotated
@@ -7,6 +7,7 @@ from pymongo.errors import DuplicateKeyError
 import pymongo
 from bson import ObjectId # ObjectId'i kontrol etmek için import edebiliriz
 
+import logging
 import secrets
 import string
 from datetime import datetime, timedelta, timezone
@@ -14,9 +15,12 @@ from datetime import datetime, timedelta, timezone
 from database import get_db_dependency
 from models.user_models import UserCreate, UserPublic, UserLogin
 from models.token_models import Token
-from utils.security import verify_password, create_access_token, get_password_hash
+from utils.security import create_access_token, hash_password, verify_and_update_password
+from utils.user_cache import user_cache
+from .cart import merge_guest_cart # Misafir sepetini girişte birleştirmek için
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
 
@@ -79,7 +83,7 @@ async def reset_password(
         )
     
     # Yeni şifreyi hashle ve kullanıcıyı güncelle
-    hashed_password = get_password_hash(password)
+    hashed_password = await hash_password(password)
     
     await users_collection.update_one(
         {"_id": user["_id"]},
@@ -92,6 +96,7 @@ async def reset_password(
             "passwordResetExpires": ""
         }}
     )
+    user_cache.invalidate(user["_id"])
     
     return {"message": "Şifreniz başarıyla sıfırlandı. Şimdi giriş yapabilirsiniz."}
 
@@ -107,7 +112,7 @@ async def register_user(user_data: UserCreate, db: DBDep):
             detail="Bu e-posta adresi zaten kayıtlı."
         )
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
 
     user_db_data = user_data.model_dump(exclude={"password"})
     user_db_data["hashed_password"] = hashed_password
@@ -145,7 +150,7 @@ async def register_user(user_data: UserCreate, db: DBDep):
             detail="Bu e-posta adresi zaten kayıtlı."
         )
     except Exception as e:
-        print(f"Kayıt hatası: {e}") # Genel hatayı logla
+        logger.exception("Kayıt hatası: %s", e)
         # Pydantic ValidationError hatasını da yakalayabiliriz ama şimdilik genel hata
         if "validation error" in str(e).lower(): # Basit kontrol
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Veri doğrulama hatası: {e}")
@@ -159,6 +164,8 @@ async def register_user(user_data: UserCreate, db: DBDep):
 @router.post("/login", response_model=Token)
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    request: Request,
+    response: Response,
     db: DBDep
 ):
     """Kullanıcı girişi yapar ve access token döndürür."""
@@ -170,7 +177,11 @@ async def login_for_access_token(
     # Bu genellikle bcrypt kütüphanesinin doğru kurulmamasından kaynaklanır
     try:
         password_field = user.get("hashed_password") if user else None
-        if not user or not password_field or not verify_password(form_data.password, password_field):
+        # Doğrulama havuzda çalışır; hash eski maliyetle üretilmişse yenisi de döner
+        is_valid, rehashed_password = (
+            await verify_and_update_password(form_data.password, password_field) if password_field else (False, None)
+        )
+        if not user or not is_valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="E-posta veya şifre hatalı.",
@@ -178,7 +189,7 @@ async def login_for_access_token(
             )
     except AttributeError as ae:
         if "'bcrypt'" in str(ae): # Bcrypt hatasıysa daha açıklayıcı log
-             print("\n\n *** Bcrypt/Passlib Hatası: 'bcrypt' modülü ile ilgili bir sorun var. 'pip install bcrypt' komutunu çalıştırdınız mı? ***\n\n")
+             logger.critical("Bcrypt/Passlib hatası: 'bcrypt' modülü ile ilgili bir sorun var. 'pip install bcrypt' komutunu çalıştırdınız mı?")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Şifre doğrulama sırasında bir hata oluştu."
@@ -200,13 +211,25 @@ async def login_for_access_token(
     }
     access_token = create_access_token(data=access_token_payload)
 
+    login_update = {"lastLogin": datetime.now(timezone.utc)}
+    if rehashed_password:
+        # BCRYPT_ROUNDS değişmiş: hash yeni maliyetle güncellenir (eski hash'e göre koşullu)
+        login_update["hashed_password"] = rehashed_password
     try:
         await users_collection.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"lastLogin": datetime.now(timezone.utc)}}
+            {"_id": user["_id"], "hashed_password": password_field} if rehashed_password else {"_id": user["_id"]},
+            {"$set": login_update}
         )
     except Exception as e:
-        print(f"Son giriş güncellenirken hata (kullanıcı: {user['email']}): {e}")
-
+        logger.warning("Son giriş güncellenirken hata (kullanıcı: %s): %s", user["_id"], e)
+
+    # Misafir sepeti varsa kullanıcının sepetine taşı
+    guest_session_id = request.cookies.get("cartSessionId")
+    if guest_session_id:
+        try:
+            await merge_guest_cart(db, guest_session_id, user["_id"])
+            response.delete_cookie("cartSessionId")
+        except Exception as e:
+            logger.warning("Misafir sepeti birleştirilirken hata (kullanıcı: %s): %s", user["_id"], e)
 
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -6,6 +6,7 @@ from bson import ObjectId
 from slugify import slugify
 from datetime import datetime, timezone
 import pymongo
+import logging
 import random
 
 from database import get_db_dependency
@@ -20,8 +21,12 @@ from models.product_models import Product as ProductModel # Ürün modeli (opsiy
 from models.cart_models import ApplyCampaignRequest # <<< ApplyCampaignRequest import edildi
 # Güvenlik fonksiyonları
 from utils.security import get_current_admin_user, get_current_user_payload
+from utils.pricing import calculate_discount, to_money
+from utils.campaign_registry import campaign_registry
+from utils.campaign_usage import ensure_usage_shards, apply_usage_totals, customer_key, customer_usage_count
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
 AdminDep = Annotated[dict, Depends(get_current_admin_user)]
 
@@ -100,6 +105,9 @@ async def create_campaign(campaign_data: CampaignCreate, db: DBDep, admin_user:
 
     try:
         result = await campaigns_collection.insert_one(campaign_dict)
+        campaign_registry.invalidate()
+        if (campaign_dict.get("usageShards") or 1) > 1:
+            await ensure_usage_shards(db, {**campaign_dict, "_id": result.inserted_id})
         created_campaign_raw = await campaigns_collection.find_one({"_id": result.inserted_id})
 
         if not created_campaign_raw:
@@ -115,7 +123,7 @@ async def create_campaign(campaign_data: CampaignCreate, db: DBDep, admin_user:
         return CampaignDetailResponse(data=Campaign.model_validate(created_campaign_raw))
 
     except Exception as e:
-        print(f"Kampanya oluşturma hatası: {e}")
+        logger.exception("Kampanya oluşturma hatası: %s", e)
         if "duplicate key" in str(e).lower():
              raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bu kampanya kodu zaten kullanılıyor.")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Kampanya oluşturulamadı: {e}")
@@ -146,6 +154,7 @@ async def read_campaigns(
     try:
         campaign_cursor = campaigns_collection.find(filter_query).sort([("endDate", 1), ("createdAt", -1)])
         campaigns_raw = await campaign_cursor.to_list(length=None)
+        await apply_usage_totals(db, campaigns_raw)
 
         campaigns_validated = []
         for camp_raw in campaigns_raw:
@@ -158,7 +167,7 @@ async def read_campaigns(
 
         return CampaignListResponse(data=campaigns_validated)
     except Exception as e:
-        print(f"Kampanya listeleme hatası: {e}")
+        logger.exception("Kampanya listeleme hatası: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Kampanyalar listelenirken bir hata oluştu.")
 
 @router.post("/check", response_model=CampaignCheckResponse)
@@ -171,28 +180,20 @@ async def check_campaign_code(
 ):
     # ... (kod önceki gibi) ...
     """Verilen kampanya kodunun geçerliliğini ve uygulanabilirliğini kontrol eder."""
-    campaigns_collection = db["campaigns"]
     users_collection = db["users"] # Kullanıcı kontrolü için
 
-    code = campaign_data.code.upper().strip()
-    campaign_raw = await campaigns_collection.find_one({"code": code})
-
-    if not campaign_raw:
+    # Kampanya bellekteki kayıttan gelir (kod ile, veritabanına gitmeden)
+    compiled_campaign = (await campaign_registry.get(db)).get_by_code(campaign_data.code)
+    if not compiled_campaign:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Geçersiz kampanya kodu.")
 
-    # Pydantic modeline çevirerek validasyon yapabiliriz (ama ObjectId'ler sorun çıkarabilir)
-    # Şimdilik dict üzerinden gidelim
-    campaign = campaign_raw # Dict olarak kullan
+    # Önbellekteki belge paylaşıldığı için yanıtta değiştirilecek bir kopya ile çalış
+    campaign = dict(compiled_campaign.doc)
 
-    # Geçerlilik kontrolleri
-    now = datetime.now(timezone.utc)
-    if not campaign.get('isActive'): raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kampanya aktif değil.")
-    if now < campaign.get('startDate'): raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kampanya henüz başlamadı.")
-    if now > campaign.get('endDate'): raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kampanya süresi doldu.")
-    if campaign.get('maxUses') is not None and campaign.get('usageCount', 0) >= campaign.get('maxUses', float('inf')):
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kampanya kullanım limiti doldu.")
-    if cart_total < campaign.get('minPurchaseAmount', 0):
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Minimum sepet tutarı ({campaign.get('minPurchaseAmount', 0):.2f} TL) gerekli.")
+    # Geçerlilik kontrolleri (aktiflik, tarih, kullanım limiti, minimum tutar)
+    eligibility_error = compiled_campaign.eligibility_error(datetime.now(timezone.utc), subtotal=cart_total)
+    if eligibility_error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=eligibility_error)
 
     # Kullanıcıya özel kontroller (kullanıcı giriş yapmışsa)
     if current_user:
@@ -203,23 +204,17 @@ async def check_campaign_code(
                 if campaign.get('forNewCustomers') and len(user_doc.get('orderHistory', [])) > 0:
                      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bu kampanya sadece ilk sipariş için geçerlidir.")
 
-                usage_limit = campaign.get('usagePerCustomer', 0)
+                usage_limit = campaign.get('usagePerCustomer') or 0
                 if usage_limit > 0:
-                    used_info = next((uc for uc in user_doc.get('usedCampaigns', []) if str(uc.get('campaign')) == str(campaign['_id'])), None)
-                    if used_info and used_info.get('usageCount', 0) >= usage_limit:
+                    # Kesin kontrol sipariş kaydında yapılır; burada sadece erken bilgilendirme
+                    used_count = await customer_usage_count(db, campaign['_id'], customer_key(user_id))
+                    if used_count >= usage_limit:
                          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Bu kampanyayı maksimum {usage_limit} kez kullanabilirsiniz.")
 
     # TODO: Ürün/Kategori kontrolleri (Sepet verisi gerektirir)
 
-    # İndirim hesapla
-    discount_amount = 0
-    discount_value = campaign.get('discountValue', 0)
-    if campaign.get('discountType') == 'percentage':
-        calculated_discount = cart_total * (discount_value / 100)
-        max_discount = campaign.get('maxDiscount')
-        discount_amount = min(calculated_discount, max_discount) if max_discount is not None else calculated_discount
-    elif campaign.get('discountType') == 'fixed_amount':
-        discount_amount = min(discount_value, cart_total) # Sepet tutarını geçemez
+    # İndirim hesapla (sepet fiyatlandırması ile aynı kurallar, sepet tutarını geçemez)
+    discount_amount = to_money(calculate_discount(campaign, cart_total))
 
     # Yanıt için ObjectId'leri string'e çevir
     campaign['_id'] = str(campaign['_id'])
@@ -232,7 +227,7 @@ async def check_campaign_code(
         message="Kampanya kodu geçerli.",
         data={
             "campaign": Campaign.model_validate(campaign), # Doğrula ve döndür
-            "discountAmount": round(discount_amount, 2)
+            "discountAmount": discount_amount
         }
     )
 
@@ -247,6 +242,7 @@ async def read_campaign(campaign_id: str, db: DBDep):
     campaign_raw = await campaigns_collection.find_one({"_id": ObjectId(campaign_id)})
     if not campaign_raw:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kampanya bulunamadı.")
+    await apply_usage_totals(db, [campaign_raw])
 
     campaign_raw['_id'] = str(campaign_raw['_id'])
     for field in ["categories", "products", "excludedCategories", "excludedProducts"]:
@@ -290,6 +286,12 @@ async def update_campaign(campaign_id: str, campaign_data: CampaignUpdate, db: D
 
     if not updated_campaign:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Güncellenecek kampanya bulunamadı.")
+    campaign_registry.invalidate()
+    # Parça sayısı veya toplam limit değiştiyse parçalı sayaç yeniden dağıtılır
+    if "usageShards" in update_data or ("maxUses" in update_data and (updated_campaign.get("usageShards") or 1) > 1):
+        await ensure_usage_shards(db, updated_campaign)
+        updated_campaign = await campaigns_collection.find_one({"_id": ObjectId(campaign_id)})
+    await apply_usage_totals(db, [updated_campaign])
 
     updated_campaign['_id'] = str(updated_campaign['_id'])
     for field in ["categories", "products", "excludedCategories", "excludedProducts"]:
@@ -310,5 +312,7 @@ async def delete_campaign(campaign_id: str, db: DBDep, admin_user: AdminDep):
 
     if delete_result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Silinecek kampanya bulunamadı.")
+    campaign_registry.invalidate()
+    await db["campaign_usage_shards"].delete_many({"campaign": ObjectId(campaign_id)})
 
     return None
\ No newline at end of file
@@ -1,41 +1,36 @@
 # backend/routers/cart.py
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Annotated, Optional
+from typing import Annotated, Dict, Optional, Tuple
 from bson import ObjectId
 from uuid import uuid4
 from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
+import logging
 import pymongo
+import pymongo.errors
 
 from database import get_db_dependency
 from models.cart_models import Cart, CartResponse, AddToCartRequest, UpdateCartItemRequest, ApplyCampaignRequest, PyObjectId
 from models.product_models import Product as ProductModel # Ürün modelini import et
 from models.campaign_models import Campaign as CampaignModel # Kampanya modelini import et
-from utils.security import get_current_user_payload # Opsiyonel: Giriş yapmış kullanıcıyı almak için
-from config import settings
+from utils.security import get_optional_user_id
+from utils.pricing import price_cart, cart_product_ids, cart_campaign_id
+from utils.loaders import ProductLoader, ProductLoaderDep
+from utils.campaign_registry import campaign_registry
+from utils.campaign_usage import customer_key, customer_usage_count
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
 
 # Yardımcı fonksiyon: Sepet ID'sini al (Cookie veya User)
 async def get_cart_identifier(request: Request, db: DBDep) -> dict:
-    """Cookie'den sessionId veya token'dan userId alır."""
-    # Önce token'ı kontrol et
-    try:
-        # Not: security dependency'si direkt router seviyesinde değilse burada manuel çağırabiliriz
-        # Veya bu fonksiyonu opsiyonel token alacak şekilde düzenleyebiliriz.
-        # Şimdilik get_current_user_payload'u doğrudan çağırmayalım,
-        # onun yerine çereze veya isteğe bağlı token'a bakalım.
-        # token_data = await get_current_user_payload(Depends(oauth2_scheme)) # Bu burada çalışmaz
-        # Eğer kullanıcı girişi zorunluysa security dependency'si kullanılmalı.
-        # Eğer hem misafir hem kayıtlı kullanıcı sepeti olacaksa,
-        # önce çereze bakıp, token varsa kullanıcıya bağlamak daha mantıklı.
-        pass # Token kontrolü şimdilik atlandı, router'da yapılacak
-    except HTTPException:
-        pass # Token yoksa veya geçersizse devam et (misafir olabilir)
-
+    """Geçerli bir token varsa kullanıcıyı, yoksa cookie'deki sessionId'yi sepet sahibi olarak döndürür."""
+    user_id = get_optional_user_id(request)  # Token yoksa/geçersizse misafir kabul edilir
     session_id = request.cookies.get("cartSessionId")
-    user_id = None # Şimdilik token kontrolü yapmıyoruz
 
     # Eğer kullanıcı ID varsa önceliklendir
     if user_id:
@@ -46,198 +41,178 @@ async def get_cart_identifier(request: Request, db: DBDep) -> dict:
         # Ne kullanıcı ID ne de session ID varsa, yeni session ID oluştur
         return {"sessionId": str(uuid4())}
 
-# Yardımcı fonksiyon: Sepeti hesapla ve kaydet
-async def calculate_and_save_cart(cart_doc: dict, db: DBDep) -> dict:
-    """Sepet toplamlarını hesaplar ve veritabanına kaydeder."""
-    # cart_doc None kontrolü
-    if cart_doc is None:
-        return {
-            "id": "empty",
-            "items": [],
-            "subtotal": 0,
-            "discountAmount": 0,
-            "shippingCost": 0,
-            "taxAmount": 0,
-            "total": 0,
-            "campaign": None,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc)
-        }
-        
+def _merge_cart_items(user_items: list, guest_items: list) -> list:
+    """Aynı ürün/varyant kalemlerinin adetlerini toplar, diğer misafir kalemlerini ekler (stok sınırı fiyatlandırmada uygulanır)."""
+    merged = [dict(item) for item in user_items]
+    lines = {(str(item.get("product")), item.get("variantSku")): item for item in merged}
+    for item in guest_items:
+        key = (str(item.get("product")), item.get("variantSku"))
+        if key in lines:
+            lines[key]["quantity"] = lines[key].get("quantity", 0) + item.get("quantity", 0)
+        else:
+            lines[key] = dict(item)
+            merged.append(lines[key])
+    return merged
+
+async def merge_guest_cart(db: DBDep, session_id: str, user_id: ObjectId, attempts: int = 3) -> bool:
+    """
+    Misafir sepetini kullanıcının sepetine taşır (giriş sonrası).
+    Kullanıcının sepeti yoksa önce boş olarak oluşturulur (upsert + $setOnInsert; eşzamanlı
+    isteklerde tek sepet carts_user_unique index'iyle sağlanır, bu index zorunludur).
+    Kalemler birleştirilir, kullanıcının kampanyası yoksa misafirinki
+    alınır, kullanıcı sepeti sürüm kontrolüyle yazılır ve misafir sepeti silinir.
+    Birleştirme yapıldıysa True döner. Toplamlar bir sonraki okumada yeniden hesaplanır.
+    """
     carts_collection = db["carts"]
-    products_collection = db["products"]
-    campaigns_collection = db["campaigns"]
-
-    subtotal = 0
-    valid_items = []
-
-    # Ürünleri tek seferde çekmek için ID listesi
-    product_ids = [ObjectId(item['product']) for item in cart_doc.get('items', []) 
-                  if 'product' in item and ObjectId.is_valid(str(item['product']))]
-
-    # Veritabanından ilgili ürünleri çek
-    product_docs = {}
-    if product_ids:
-        cursor = products_collection.find({"_id": {"$in": product_ids}, "isActive": True})
-        async for prod in cursor:
-            product_docs[prod['_id']] = prod
-
-    # Sepetteki ürünleri işle
-    for item_data in cart_doc.get('items', []):
-        if 'product' not in item_data:
-            continue  # Geçersiz item, product alanı yok
-            
-        product_id = item_data.get('product')
-        if not product_id:
-            continue  # Geçersiz item, product ID yok
-            
-        # ObjectId kontrolü
-        if isinstance(product_id, str) and ObjectId.is_valid(product_id):
-            product_id = ObjectId(product_id)
-        elif not isinstance(product_id, ObjectId):
-            continue  # Geçersiz ObjectId
-        
-        # Variant ve SKU kontrolü - item_data'dan variantSku'yu doğrudan al
-        variant_sku = item_data.get('variantSku')
-        if not variant_sku:
-            # Eğer variantSku doğrudan yoksa, variant objesi içinde kontrol et (geriye dönük uyumluluk)
-            variant_obj = item_data.get('variant', {})
-            if isinstance(variant_obj, dict):
-                variant_sku = variant_obj.get('sku')
-            
-            if not variant_sku:
-                continue  # Geçersiz item, SKU yok
-
-        # Ürün kontrolü
-        product = product_docs.get(product_id)
-        if not product:
-            continue  # Ürün bulunamadı veya aktif değil
-
-        # Varyant kontrolü
-        variant = next((v for v in product.get('variants', []) if v.get('sku') == variant_sku), None)
-        if not variant:
-            continue  # Varyant bulunamadı
-
-        # Stok kontrolü
-        quantity = max(1, item_data.get('quantity', 1))  # En az 1 adet
-        if quantity > variant.get('stock', 0):
-            quantity = variant.get('stock', 0)  # Miktarı stoğa eşitle
-            if quantity == 0:
-                continue  # Stok yoksa ürünü atla (veya kaldır)
-
-        # Fiyat hesaplama
-        price = product.get('salePrice') if product.get('salePrice') is not None else product.get('price', 0)
-        item_subtotal = price * quantity
-
-        # Gerekli alanları güncelle/ekle
-        item_data['productName'] = product.get('name', 'Ürün')
-        item_data['productSlug'] = product.get('slug', '')
-        item_data['productImage'] = product.get('images', [{}])[0].get('url', '') if product.get('images') else ''  # İlk görseli al
-        
-        # variantSku alanını doğrudan ekle/güncelle
-        item_data['variantSku'] = variant_sku
-        
-        # Variant bilgilerini güncelle
-        if not isinstance(item_data.get('variant'), dict):
-            item_data['variant'] = {}
-            
-        item_data['variant']['size'] = variant.get('size', '')
-        item_data['variant']['colorName'] = variant.get('colorName', '')
-        item_data['variant']['colorHex'] = variant.get('colorHex', '')
-        item_data['variant']['sku'] = variant_sku
-        
-        item_data['price'] = price
-        item_data['originalPrice'] = product.get('price')
-        item_data['quantity'] = quantity
-        item_data['subtotal'] = item_subtotal
-
-        subtotal += item_subtotal
-        valid_items.append(item_data)
-
-    cart_doc['items'] = valid_items  # Sadece geçerli ve stoğu olan ürünleri tut
-    cart_doc['subtotal'] = subtotal
-
-    # Kampanyayı uygula
-    discount_amount = 0
-    campaign_applied = None
-    
-    # Campaign kontrolü
-    campaign_obj = cart_doc.get('campaign')
-    campaign_id_str = None
-    
-    if campaign_obj and isinstance(campaign_obj, dict):
-        campaign_id = campaign_obj.get('id')
-        if campaign_id:
-            if isinstance(campaign_id, ObjectId):
-                campaign_id_str = str(campaign_id)
-            elif isinstance(campaign_id, str) and ObjectId.is_valid(campaign_id):
-                campaign_id_str = campaign_id
-
-    if campaign_id_str:
-        try:
-            campaign = await campaigns_collection.find_one({"_id": ObjectId(campaign_id_str)})
-            now = datetime.now(timezone.utc)
-            
-            if (campaign and campaign.get('isActive') and 
-                campaign.get('startDate') <= now and 
-                campaign.get('endDate') >= now and 
-                (not campaign.get('minPurchaseAmount') or subtotal >= campaign.get('minPurchaseAmount', 0))):
-
-                # TODO: Ürün/Kategori filtrelerini burada kontrol et
-                # TODO: Kullanım limiti kontrolü (toplam ve kullanıcı başına)
-
-                if campaign.get('discountType') == 'percentage':
-                    calculated_discount = subtotal * (campaign.get('discountValue', 0) / 100)
-                    max_discount = campaign.get('maxDiscount')
-                    discount_amount = min(calculated_discount, max_discount) if max_discount is not None else calculated_discount
-                elif campaign.get('discountType') == 'fixed_amount':
-                    discount_amount = min(campaign.get('discountValue', 0), subtotal)
-
-                campaign_applied = {
-                    "id": str(campaign['_id']),  # String olarak sakla
-                    "code": campaign.get('code', ''),
-                    "discountType": campaign.get('discountType', ''),
-                    "discountValue": campaign.get('discountValue', 0),
-                    "discountAmount": discount_amount
-                }
-            else:
-                cart_doc['campaign'] = None  # Geçersizse kaldır
-        except Exception as e:
-            print(f"Kampanya uygulanırken hata: {e}")
-            cart_doc['campaign'] = None  # Hata durumunda kaldır
+    identifier = {"user": user_id}
+    insert_defaults = {**{key: value for key, value in build_empty_cart(identifier).items() if key not in identifier}, "version": 0}
+    for _ in range(attempts):
+        guest_cart = await carts_collection.find_one({"sessionId": session_id})
+        if not guest_cart:
+            return False
+        now = datetime.now(timezone.utc)
+        user_cart = await carts_collection.find_one_and_update(
+            identifier,
+            {"$setOnInsert": insert_defaults},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
 
-    cart_doc['discountAmount'] = discount_amount
-    cart_doc['campaign'] = campaign_applied  # Uygulanan kampanya bilgisini ata
+        version = user_cart.get("version", 0)
+        update = {
+            "items": _merge_cart_items(user_cart.get("items", []), guest_cart.get("items", [])),
+            "contentHash": None,  # Bir sonraki okumada yeniden fiyatlandırılsın
+            "updatedAt": now,
+        }
+        if not user_cart.get("campaign") and guest_cart.get("campaign"):
+            update["campaign"] = guest_cart["campaign"]
+        result = await carts_collection.update_one(
+            {"_id": user_cart["_id"], "version": {"$in": [0, None]} if version == 0 else version},
+            {"$set": update, "$inc": {"version": 1}}
+        )
+        if not result.modified_count:
+            continue  # Kullanıcı sepeti araya giren bir istekle değişti, yeniden oku
+        await carts_collection.delete_one({"_id": guest_cart["_id"]})
+        return True
+    logger.warning("Misafir sepeti birleştirilemedi (eşzamanlı değişiklik)", extra={"session_id": session_id})
+    return False
+
+# Sepet içerik özetine giren kalem alanları (fiyat, stok ve ürün bilgisi değişiklikleri)
+_HASHED_ITEM_FIELDS = ("product", "variantSku", "quantity", "price", "originalPrice", "subtotal",
+                       "productName", "productSlug", "productImage", "variant")
+_HASHED_CART_FIELDS = ("subtotal", "discountAmount", "shippingCost", "taxAmount", "total", "campaign")
+
+def cart_content_hash(cart_doc: dict) -> str:
+    """Hesaplanmış sepet içeriğinin özeti. Değişmediyse sepet tekrar yazılmaz."""
+    content = {field: cart_doc.get(field) for field in _HASHED_CART_FIELDS}
+    content["items"] = [{field: item.get(field) for field in _HASHED_ITEM_FIELDS} for item in cart_doc.get("items", [])]
+    raw = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def build_empty_cart(identifier: dict) -> dict:
+    """Veritabanına yazılmayan (sanal) boş sepet. İlk ürün eklenince kalıcı hale gelir."""
+    now = datetime.now(timezone.utc)
+    return {
+        "items": [],
+        "subtotal": 0,
+        "discountAmount": 0,
+        "shippingCost": 0,
+        "taxAmount": 0,
+        "total": 0,
+        "campaign": None,
+        "createdAt": now,
+        "updatedAt": now,
+        **identifier  # sessionId veya user ekle
+    }
+
+async def load_pricing_snapshot(cart_doc: dict, db: DBDep, loader: Optional[ProductLoader] = None) -> Tuple[Dict[ObjectId, dict], Optional[dict]]:
+    """
+    Fiyatlandırma için gereken ürünleri ve kampanyayı birlikte getirir. Ürünler
+    istek kapsamlı yükleyiciden gelir; bu istekte daha önce okunanlar tekrar sorgulanmaz.
+    """
+    product_ids = cart_product_ids(cart_doc)
+    campaign_id = cart_campaign_id(cart_doc)
+    loader = loader or ProductLoader(db)
+
+    async def fetch_products() -> Dict[ObjectId, dict]:
+        products = await loader.load_many(product_ids)
+        return {product_id: product for product_id, product in products.items() if product.get("isActive")}
+
+    async def fetch_campaign() -> Optional[dict]:
+        if not campaign_id:
+            return None
+        # Kampanya kuralları bellekteki kayıttan gelir (silinmiş kampanya sepetten düşer)
+        compiled_campaign = (await campaign_registry.get(db)).get(campaign_id)
+        return compiled_campaign.doc if compiled_campaign else None
+
+    return await asyncio.gather(fetch_products(), fetch_campaign())
+
+async def calculate_cart(cart_doc: dict, db: DBDep, loader: Optional[ProductLoader] = None) -> dict:
+    """Sepet fiyatlarını, stoklarını ve toplamlarını bellekte yeniden hesaplar (veritabanına yazmaz)."""
+    products, campaign = await load_pricing_snapshot(cart_doc, db, loader)
+    cart_doc.update(price_cart(cart_doc, products, campaign))
+    cart_doc['contentHash'] = cart_content_hash(cart_doc)
+    return cart_doc
 
-    # Vergi ve kargo hesapla
-    tax_base = subtotal - discount_amount
-    tax_amount = max(0, tax_base * (settings.TAX / 100))  # %18 KDV varsayımı
-    shipping_cost = 0 if tax_base >= settings.FREE_SHIPPING_THRESHOLD else settings.SHIPPING_COST
+# Fiyatlandırma sonucu yazılan alanlar (sürüm kontrollü kayıtta sadece bunlar güncellenir)
+PRICED_CART_FIELDS = ("items", "subtotal", "discountAmount", "campaign", "taxAmount", "shippingCost", "total", "contentHash")
 
-    cart_doc['taxAmount'] = tax_amount
-    cart_doc['shippingCost'] = shipping_cost
-    cart_doc['total'] = max(0, tax_base + tax_amount + shipping_cost)
+async def save_cart(cart_doc: dict, db: DBDep, expected_version: int) -> bool:
+    """
+    Hesaplanmış sepetin sadece fiyatlandırılmış alanlarını, sepet expected_version
+    sürümündeyse yazar (iyimser eşzamanlılık). Araya başka bir değişiklik girdiyse
+    False döner. Kalemler ve kampanya atomik güncellemelerle değişir; sepet belgesi
+    hiçbir zaman bütün olarak üzerine yazılmaz.
+    """
+    carts_collection = db["carts"]
     cart_doc['updatedAt'] = datetime.now(timezone.utc)
 
-    # Veritabanına kaydet/güncelle
     try:
-        if '_id' in cart_doc:
-            cart_id = cart_doc['_id']
-            if isinstance(cart_id, str) and ObjectId.is_valid(cart_id):
-                cart_id = ObjectId(cart_id)
-                
-            if isinstance(cart_id, ObjectId):
-                await carts_collection.update_one({"_id": cart_id}, {"$set": cart_doc}, upsert=True)
-        elif 'sessionId' in cart_doc:
-            await carts_collection.update_one({"sessionId": cart_doc['sessionId']}, {"$set": cart_doc}, upsert=True)
-        else:
-            # Ne _id ne de sessionId varsa, yeni belge ekle
-            result = await carts_collection.insert_one(cart_doc)
-            cart_doc['_id'] = result.inserted_id
+        version_filter = {"$in": [0, None]} if expected_version == 0 else expected_version
+        priced_fields = {field: cart_doc[field] for field in PRICED_CART_FIELDS if field in cart_doc}
+        result = await carts_collection.update_one(
+            {"_id": cart_doc['_id'], "version": version_filter},
+            {"$set": {**priced_fields, "updatedAt": cart_doc['updatedAt']}, "$inc": {"version": 1}}
+        )
+        if result.modified_count:
+            cart_doc['version'] = expected_version + 1
+        return bool(result.modified_count)
     except Exception as e:
-        print(f"Sepet kaydedilirken hata: {e}")
+        logger.exception("Sepet kaydedilirken hata: %s", e)
         # İşleme devam et, veritabanı hatası olsa bile hesaplanmış sepeti döndür
-
+        return False
+
+async def reprice_cart(cart_doc: dict, db: DBDep, loader: Optional[ProductLoader] = None, attempts: int = 3) -> dict:
+    """
+    Atomik bir değişiklik sonrası sepeti yeniden fiyatlandırır ve sürüm kontrolüyle kaydeder.
+    Araya başka bir değişiklik girdiyse sepet yeniden okunup tekrar fiyatlandırılır.
+    """
+    for _ in range(attempts):
+        version = cart_doc.get('version', 0)
+        stored_hash = cart_doc.get('contentHash')
+        await calculate_cart(cart_doc, db, loader)
+        if cart_doc['contentHash'] == stored_hash or await save_cart(cart_doc, db, expected_version=version):
+            break
+        latest = await db["carts"].find_one({"_id": cart_doc['_id']})
+        if latest is None:
+            break  # Sepet bu arada silindi (ör. sipariş oluşturuldu)
+        cart_doc = latest
+    return cart_to_public(cart_doc)
+
+async def set_cart_campaign(db: DBDep, identifier: dict, campaign: Optional[dict]) -> Optional[dict]:
+    """Sepetin sadece kampanya alanını atomik olarak değiştirir ve güncel sepeti döndürür (sepet yoksa None)."""
+    update = {"campaign": campaign, "updatedAt": datetime.now(timezone.utc)}
+    if campaign is None:
+        update["discountAmount"] = 0
+    return await db["carts"].find_one_and_update(
+        identifier,
+        {"$set": update, "$inc": {"version": 1}},
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+
+def cart_to_public(cart_doc: dict) -> dict:
+    """Sepet belgesini Pydantic modeline uygun hale getirir (ObjectId -> str)."""
+    cart_doc.pop('contentHash', None)
     # Pydantic modeli için _id'yi string'e çevir
     if '_id' in cart_doc:
         cart_doc['id'] = str(cart_doc.pop('_id'))
@@ -261,12 +236,21 @@ async def calculate_and_save_cart(cart_doc: dict, db: DBDep) -> dict:
     return cart_doc
 
 @router.get("/", response_model=CartResponse)
-async def get_cart(request: Request, response: Response, db: DBDep):
+async def get_cart(request: Request, response: Response, db: DBDep, loader: ProductLoaderDep):
     """Mevcut kullanıcının veya oturumun sepetini getirir."""
     try:
         identifier = await get_cart_identifier(request, db)
         carts_collection = db["carts"]
 
+        # Giriş yapmış kullanıcıda hâlâ misafir sepeti cookie'si varsa (örn. eski oturum) sepetleri birleştir
+        guest_session_id = request.cookies.get("cartSessionId")
+        if "user" in identifier and guest_session_id:
+            try:
+                await merge_guest_cart(db, guest_session_id, identifier["user"])
+            except Exception as e:
+                logger.warning("Misafir sepeti birleştirilirken hata: %s", e)
+            response.delete_cookie("cartSessionId")
+
         # Session ID veya user ile sepeti bul
         cart_doc = None
         if identifier:
@@ -282,36 +266,21 @@ async def get_cart(request: Request, response: Response, db: DBDep):
                     httponly=True, 
                     samesite='lax'
                 )
-                
-            # Boş sepet oluştur
-            cart_doc = {
-                "items": [],
-                "subtotal": 0,
-                "discountAmount": 0,
-                "shippingCost": 0,
-                "taxAmount": 0,
-                "total": 0,
-                "campaign": None,
-                "createdAt": datetime.now(timezone.utc),
-                "updatedAt": datetime.now(timezone.utc),
-                **identifier  # sessionId veya user ekle
-            }
-            
-            # Boş sepeti DB'ye kaydet
-            try:
-                result = await carts_collection.insert_one(cart_doc)
-                cart_doc["_id"] = result.inserted_id
-            except Exception as e:
-                print(f"Boş sepet kaydedilirken hata: {e}")
-                # Hata olsa bile devam et, sepet hesaplamasını yapmaya çalış
 
-        # Sepeti hesapla ve kaydet
-        calculated_cart = await calculate_and_save_cart(cart_doc, db)
-        
+            # Boş sepet veritabanına yazılmaz, ilk ürün eklendiğinde oluşturulur
+            return CartResponse(data=Cart.model_validate(cart_to_public(build_empty_cart(identifier))))
+
+        # Sepeti bellekte yeniden hesapla; fiyat, stok veya kampanya değiştiyse kaydet
+        stored_hash = cart_doc.get('contentHash')
+        await calculate_cart(cart_doc, db, loader)
+        if cart_doc['contentHash'] != stored_hash:
+            await save_cart(cart_doc, db, expected_version=cart_doc.get('version', 0))
+        calculated_cart = cart_to_public(cart_doc)
+
         try:
             return CartResponse(data=Cart.model_validate(calculated_cart))
         except Exception as e:
-            print(f"Sepet modeli doğrulanırken hata: {e}")
+            logger.error("Sepet modeli doğrulanırken hata: %s", e)
             # Model doğrulama hatası durumunda manuel bir sepet oluştur
             emergency_cart = {
                 "id": calculated_cart.get("id", "temp-id"),
@@ -328,7 +297,7 @@ async def get_cart(request: Request, response: Response, db: DBDep):
             return CartResponse(data=Cart.model_validate(emergency_cart))
             
     except Exception as e:
-        print(f"Sepet alınırken hata: {e}")
+        logger.exception("Sepet alınırken hata: %s", e)
         
         # Hata durumunda boş sepet döndür
         empty_cart = {
@@ -346,20 +315,26 @@ async def get_cart(request: Request, response: Response, db: DBDep):
         return CartResponse(data=Cart.model_validate(empty_cart))
 
 
+def _item_id_values(item_id: str) -> list:
+    """Kalem ID'si eski sepetlerde string, yenilerde ObjectId olarak saklanmış olabilir."""
+    if not ObjectId.is_valid(item_id):
+        return [item_id]
+    return [ObjectId(item_id), item_id]
+
 @router.post("/items", response_model=CartResponse)
-async def add_item_to_cart(item_data: AddToCartRequest, request: Request, response: Response, db: DBDep):
+async def add_item_to_cart(item_data: AddToCartRequest, request: Request, response: Response, db: DBDep, loader: ProductLoaderDep):
     """Sepete yeni ürün ekler veya mevcut ürünün miktarını artırır."""
     try:
         identifier = await get_cart_identifier(request, db)
         carts_collection = db["carts"]
-        products_collection = db["products"]
 
         # Ürünü ve varyantı kontrol et
         if not ObjectId.is_valid(str(item_data.productId)):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Geçersiz ürün ID formatı.")
             
-        product = await products_collection.find_one({"_id": ObjectId(item_data.productId), "isActive": True})
-        if not product:
+        product_id = ObjectId(item_data.productId)
+        product = await loader.load(product_id)  # Yeniden fiyatlandırmada aynı anlık görüntü kullanılır
+        if not product or not product.get('isActive'):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ürün bulunamadı veya aktif değil.")
 
         variant = next((v for v in product.get('variants', []) if v.get('sku') == item_data.variantSku), None)
@@ -367,98 +342,90 @@ async def add_item_to_cart(item_data: AddToCartRequest, request: Request, respon
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ürün varyantı bulunamadı.")
 
         # Stoğu kontrol et
-        if variant.get('stock', 0) < item_data.quantity:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Yetersiz stok. Mevcut: {variant.get('stock', 0)}")
+        stock = variant.get('stock', 0)
+        if stock < item_data.quantity:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Yetersiz stok. Mevcut: {stock}")
+
+        if "sessionId" in identifier and not request.cookies.get("cartSessionId"):
+            response.set_cookie(
+                key="cartSessionId",
+                value=identifier["sessionId"],
+                max_age=60*60*24*30,
+                httponly=True,
+                samesite='lax'
+            )
 
-        # Sepeti bul veya oluştur
-        cart_doc = await carts_collection.find_one(identifier)
-        if not cart_doc:
-            cart_doc = {
-                "_id": ObjectId(),  # Yeni sepet için ObjectId oluştur
-                "items": [],
-                "subtotal": 0,
-                "discountAmount": 0,
-                "shippingCost": 0,
-                "taxAmount": 0,
-                "total": 0,
-                "campaign": None,
-                "createdAt": datetime.now(timezone.utc),
-                "updatedAt": datetime.now(timezone.utc),
-                **identifier
-            }
-            
-            if "sessionId" in identifier and not request.cookies.get("cartSessionId"):
-                response.set_cookie(
-                    key="cartSessionId",
-                    value=identifier["sessionId"],
-                    max_age=60*60*24*30,
-                    httponly=True,
-                    samesite='lax'
-                )
+        price = product.get('salePrice') if product.get('salePrice') is not None else product.get('price', 0)
+        now = datetime.now(timezone.utc)
+        line_match = {"product": product_id, "variantSku": item_data.variantSku}
+        new_item = {
+            "_id": ObjectId(),  # Yeni item için ID oluştur
+            "product": product_id,
+            "variantSku": item_data.variantSku,  # variantSku'yu doğrudan ekle
+            "productName": product.get('name', 'Ürün'),
+            "productSlug": product.get('slug', ''),
+            "productImage": product['images'][0].get('url', '') if product.get('images') else '',
+            "variant": {
+                "size": variant.get('size', ''),
+                "colorName": variant.get('colorName', ''),
+                "colorHex": variant.get('colorHex', '#000000'),
+                "sku": variant.get('sku', '')
+            },
+            "price": price,
+            "originalPrice": product.get('price', price),
+            "quantity": item_data.quantity,
+            "subtotal": item_data.quantity * price
+        }
+        empty_cart = build_empty_cart(identifier)
+        insert_defaults = {**{key: value for key, value in empty_cart.items() if key not in identifier}, "version": 0}
 
-        # Sepetteki item'ı bul veya oluştur
-        item_index = -1
-        for i, item in enumerate(cart_doc.get('items', [])):
-            product_match = False
-            if isinstance(item.get('product'), ObjectId) and str(item.get('product')) == str(item_data.productId):
-                product_match = True
-            elif isinstance(item.get('product'), str) and item.get('product') == str(item_data.productId):
-                product_match = True
-                
-            if (product_match and 
-                item.get('variantSku') == item_data.variantSku):
-                item_index = i
+        # Önce satırsız sepeti oluştur (yoksa). Satır ekleme ve artırma upsert'süz yapılır;
+        # satır koşulu içeren bir upsert, satır zaten varken sepetin ikinci kopyasını oluşturur.
+        # Eşzamanlı ilk isteklerde tek sepet carts_session_unique/carts_user_unique index'leriyle
+        # sağlanır (INDEX_REGISTRY); bu index'ler olmadan iki sepet oluşabilir.
+        await carts_collection.update_one(identifier, {"$setOnInsert": insert_defaults}, upsert=True)
+
+        # Atomik güncelleme: önce yeni satır eklemeyi, satır zaten varsa stok sınırı içinde miktar artırmayı dene
+        cart_doc = None
+        for _ in range(3):
+            cart_doc = await carts_collection.find_one_and_update(
+                {**identifier, "items": {"$not": {"$elemMatch": line_match}}},
+                {"$push": {"items": new_item}, "$inc": {"version": 1}, "$set": {"updatedAt": now}},
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            if cart_doc:
                 break
 
-        price = product.get('salePrice') if product.get('salePrice') is not None else product.get('price', 0)
-        product_image = product.get('images', [{}])[0].get('url', '') if product.get('images') else ''
+            cart_doc = await carts_collection.find_one_and_update(
+                {**identifier, "items": {"$elemMatch": {**line_match, "quantity": {"$lte": stock - item_data.quantity}}}},
+                {"$inc": {"items.$.quantity": item_data.quantity, "version": 1}, "$set": {"updatedAt": now}},
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            if cart_doc:
+                break
 
-        if item_index != -1:
-            # Miktarı güncelle
-            new_quantity = cart_doc['items'][item_index]['quantity'] + item_data.quantity
-            if new_quantity > variant.get('stock', 0):
+            existing = await carts_collection.find_one({**identifier, "items": {"$elemMatch": line_match}}, {"items": {"$elemMatch": line_match}})
+            if existing:
+                current_quantity = existing['items'][0].get('quantity', 0)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST, 
-                    detail=f"Maksimum stok aşıldı. Sepete ekleyebileceğiniz: {variant.get('stock', 0) - cart_doc['items'][item_index]['quantity']}"
+                    detail=f"Maksimum stok aşıldı. Sepete ekleyebileceğiniz: {max(0, stock - current_quantity)}"
                 )
-                
-            cart_doc['items'][item_index]['quantity'] = new_quantity
-            cart_doc['items'][item_index]['subtotal'] = new_quantity * price  # Subtotal'ı da güncelle
-        else:
-            # Yeni item ekle
-            new_item = {
-                "_id": ObjectId(),  # Yeni item için ID oluştur
-                "product": ObjectId(item_data.productId),
-                "variantSku": item_data.variantSku,  # variantSku'yu doğrudan ekle
-                "productName": product.get('name', 'Ürün'),
-                "productSlug": product.get('slug', ''),
-                "productImage": product_image,
-                "variant": {
-                    "size": variant.get('size', ''),
-                    "colorName": variant.get('colorName', ''),
-                    "colorHex": variant.get('colorHex', '#000000'),
-                    "sku": variant.get('sku', '')
-                },
-                "price": price,
-                "originalPrice": product.get('price', price),
-                "quantity": item_data.quantity,
-                "subtotal": item_data.quantity * price
-            }
-            
-            if 'items' not in cart_doc:
-                cart_doc['items'] = []
-                
-            cart_doc['items'].append(new_item)
+            # Satır ya da sepet bu arada silinmiş (ör. sipariş oluşturuldu): sepeti yeniden oluştur ve tekrar dene
+            await carts_collection.update_one(identifier, {"$setOnInsert": insert_defaults}, upsert=True)
 
-        # Sepeti hesapla ve kaydet
-        calculated_cart = await calculate_and_save_cart(cart_doc, db)
+        if not cart_doc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Sepet aynı anda güncellendi, lütfen tekrar deneyin.")
+
+        # Toplamları yeniden hesapla (sürüm kontrollü kayıt)
+        calculated_cart = await reprice_cart(cart_doc, db, loader)
 
         return CartResponse(data=Cart.model_validate(calculated_cart))
     
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Sepete ürün eklerken beklenmedik hata: {e}")
+        logger.exception("Sepete ürün eklerken beklenmedik hata: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Sepete ürün eklenirken bir hata oluştu."
@@ -466,80 +433,64 @@ async def add_item_to_cart(item_data: AddToCartRequest, request: Request, respon
 
 
 @router.put("/items", response_model=CartResponse)
-async def update_cart_item(item_update: UpdateCartItemRequest, request: Request, db: DBDep):
+async def update_cart_item(item_update: UpdateCartItemRequest, request: Request, db: DBDep, loader: ProductLoaderDep):
     """Sepetteki bir ürünün miktarını günceller."""
     try:
+        if not ObjectId.is_valid(str(item_update.itemId)):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Geçersiz ürün ID formatı.")
+
         identifier = await get_cart_identifier(request, db)
         carts_collection = db["carts"]
-        products_collection = db["products"]
-
-        cart_doc = await carts_collection.find_one(identifier)
-        if not cart_doc:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepet bulunamadı.")
-
-        # Item'ı bul
-        item_index = -1
-        for i, item in enumerate(cart_doc.get('items', [])):
-            item_id_match = False
-            
-            if '_id' in item:
-                # ObjectId karşılaştırması
-                if isinstance(item['_id'], ObjectId) and str(item['_id']) == str(item_update.itemId):
-                    item_id_match = True
-                elif isinstance(item['_id'], str) and item['_id'] == str(item_update.itemId):
-                    item_id_match = True
-                    
-            if 'id' in item and not item_id_match:
-                # id alanı kontrolü
-                if item['id'] == str(item_update.itemId):
-                    item_id_match = True
-                    
-            if item_id_match:
-                item_index = i
-                break
-
-        if item_index == -1:
+        item_ids = _item_id_values(str(item_update.itemId))
+
+        # Sadece ilgili satırı getir
+        line_match = {"_id": {"$in": item_ids}}
+        line_doc = await carts_collection.find_one({**identifier, "items": {"$elemMatch": line_match}}, {"items": {"$elemMatch": line_match}})
+        if not line_doc:
+            cart_exists = await carts_collection.find_one(identifier, {"_id": 1})
+            if not cart_exists:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepet bulunamadı.")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepette güncellenecek ürün bulunamadı.")
 
         # Stok kontrolü
-        item_to_update = cart_doc['items'][item_index]
-        
+        item_to_update = line_doc['items'][0]
         product_id = item_to_update.get('product')
         if isinstance(product_id, str) and ObjectId.is_valid(product_id):
             product_id = ObjectId(product_id)
-            
-        product = await products_collection.find_one({"_id": product_id})
-        if not product:
-            # Ürün bulunamazsa sepetten kaldırabiliriz
-            cart_doc['items'].pop(item_index)
-            calculated_cart = await calculate_and_save_cart(cart_doc, db)
-            return CartResponse(data=Cart.model_validate(calculated_cart))
 
-        variant_sku = item_to_update.get('variant', {}).get('sku')
-        variant = next((v for v in product.get('variants', []) if v.get('sku') == variant_sku), None)
-        if not variant:
-            # Varyant bulunamazsa sepetten kaldır
-            cart_doc['items'].pop(item_index)
-            calculated_cart = await calculate_and_save_cart(cart_doc, db)
-            return CartResponse(data=Cart.model_validate(calculated_cart))
+        product = await loader.load(product_id) if isinstance(product_id, ObjectId) else None
+        variant_sku = item_to_update.get('variantSku') or item_to_update.get('variant', {}).get('sku')
+        variant = next((v for v in product.get('variants', []) if v.get('sku') == variant_sku), None) if product else None
 
-        if item_update.quantity > variant.get('stock', 0):
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Yetersiz stok. Mevcut: {variant.get('stock', 0)}")
+        if not variant:
+            # Ürün veya varyant bulunamazsa satırı sepetten kaldır
+            update = {"$pull": {"items": {"_id": {"$in": item_ids}}}, "$inc": {"version": 1}, "$set": {"updatedAt": datetime.now(timezone.utc)}}
+        else:
+            if item_update.quantity > variant.get('stock', 0):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Yetersiz stok. Mevcut: {variant.get('stock', 0)}")
+            update = {
+                "$set": {"items.$.quantity": item_update.quantity, "updatedAt": datetime.now(timezone.utc)},
+                "$inc": {"version": 1}
+            }
 
-        # Miktarı güncelle
-        item_to_update['quantity'] = item_update.quantity
-        price = item_to_update.get('price', 0)
-        item_to_update['subtotal'] = item_update.quantity * price
+        # Miktarı atomik olarak güncelle
+        cart_doc = await carts_collection.find_one_and_update(
+            {**identifier, "items._id": {"$in": item_ids}},
+            update,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        if not cart_doc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepette güncellenecek ürün bulunamadı.")
 
-        # Sepeti hesapla ve kaydet
-        calculated_cart = await calculate_and_save_cart(cart_doc, db)
+        # Toplamları yeniden hesapla (sürüm kontrollü kayıt)
+        calculated_cart = await reprice_cart(cart_doc, db, loader)
 
         return CartResponse(data=Cart.model_validate(calculated_cart))
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Sepet ürünü güncellenirken hata: {e}")
+        logger.exception("Sepet ürünü güncellenirken hata: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Sepet ürünü güncellenirken bir hata oluştu."
@@ -547,7 +498,7 @@ async def update_cart_item(item_update: UpdateCartItemRequest, request: Request,
 
 
 @router.delete("/items/{item_id}", response_model=CartResponse)
-async def remove_item_from_cart(item_id: str, request: Request, db: DBDep):
+async def remove_item_from_cart(item_id: str, request: Request, db: DBDep, loader: ProductLoaderDep):
     """Sepetten bir ürünü kaldırır."""
     try:
         if not ObjectId.is_valid(item_id):
@@ -555,49 +506,29 @@ async def remove_item_from_cart(item_id: str, request: Request, db: DBDep):
 
         identifier = await get_cart_identifier(request, db)
         carts_collection = db["carts"]
+        item_ids = _item_id_values(item_id)
 
-        cart_doc = await carts_collection.find_one(identifier)
+        # Satırı atomik olarak çıkar
+        cart_doc = await carts_collection.find_one_and_update(
+            {**identifier, "items._id": {"$in": item_ids}},
+            {"$pull": {"items": {"_id": {"$in": item_ids}}}, "$inc": {"version": 1}, "$set": {"updatedAt": datetime.now(timezone.utc)}},
+            return_document=pymongo.ReturnDocument.AFTER
+        )
         if not cart_doc:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepet bulunamadı.")
-
-        initial_length = len(cart_doc.get('items', []))
-        
-        # Yeni items listesi oluştur
-        new_items = []
-        for item in cart_doc.get('items', []):
-            item_id_match = False
-            
-            if '_id' in item:
-                # ObjectId karşılaştırması
-                if isinstance(item['_id'], ObjectId) and str(item['_id']) == item_id:
-                    item_id_match = True
-                elif isinstance(item['_id'], str) and item['_id'] == item_id:
-                    item_id_match = True
-                    
-            if 'id' in item and not item_id_match:
-                # id alanı kontrolü
-                if item['id'] == item_id:
-                    item_id_match = True
-                    
-            # Eşleşme yoksa listeye ekle
-            if not item_id_match:
-                new_items.append(item)
-        
-        # Yeni items listesini cart_doc'a ata
-        cart_doc['items'] = new_items
-
-        if len(cart_doc.get('items', [])) == initial_length:
+            cart_exists = await carts_collection.find_one(identifier, {"_id": 1})
+            if not cart_exists:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepet bulunamadı.")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepette silinecek ürün bulunamadı.")
 
-        # Sepeti hesapla ve kaydet
-        calculated_cart = await calculate_and_save_cart(cart_doc, db)
+        # Toplamları yeniden hesapla (sürüm kontrollü kayıt)
+        calculated_cart = await reprice_cart(cart_doc, db, loader)
 
         return CartResponse(data=Cart.model_validate(calculated_cart))
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Sepetten ürün kaldırılırken hata: {e}")
+        logger.exception("Sepetten ürün kaldırılırken hata: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Sepetten ürün kaldırılırken bir hata oluştu."
@@ -605,13 +536,12 @@ async def remove_item_from_cart(item_id: str, request: Request, db: DBDep):
 
 
 @router.post("/campaign", response_model=CartResponse)
-async def apply_campaign_to_cart(campaign_data: ApplyCampaignRequest, request: Request, db: DBDep):
+async def apply_campaign_to_cart(campaign_data: ApplyCampaignRequest, request: Request, db: DBDep, loader: ProductLoaderDep):
     """Sepete kampanya kodu uygular."""
     try:
         # Kullanıcının sepetini tanımlayan kimliği al (session veya user ID)
         identifier = await get_cart_identifier(request, db)
         carts_collection = db["carts"]
-        campaigns_collection = db["campaigns"]
 
         # Sepeti veritabanından getir
         cart_doc = await carts_collection.find_one(identifier)
@@ -629,117 +559,56 @@ async def apply_campaign_to_cart(campaign_data: ApplyCampaignRequest, request: R
                 detail="Kampanya uygulamak için sepette ürün olmalı."
             )
 
-        # Kampanya kodunu standartlaştır (büyük harf)
-        code = campaign_data.code.upper().strip()
-        
-        # Kampanyayı veritabanından getir
-        campaign = await campaigns_collection.find_one({"code": code, "isActive": True})
-        if not campaign:
+        # Kampanyayı bellekteki kayıttan kod ile bul (veritabanına gitmez)
+        campaigns = await campaign_registry.get(db)
+        compiled_campaign = campaigns.get_by_code(campaign_data.code)
+        if not compiled_campaign or not compiled_campaign.is_active:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
                 detail="Geçersiz veya aktif olmayan kampanya kodu."
             )
-
-        # Geçerlilik kontrolleri
-        now = datetime.now(timezone.utc)
-        
-        # Tarih kontrolü
-        if now < campaign.get('startDate'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, 
-                detail=f"Bu kampanya henüz başlamadı. Başlangıç tarihi: {campaign.get('startDate').strftime('%d.%m.%Y')}"
-            )
-            
-        if now > campaign.get('endDate'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, 
-                detail=f"Bu kampanya süresi doldu. Bitiş tarihi: {campaign.get('endDate').strftime('%d.%m.%Y')}"
-            )
-        
-        # Minimum sepet tutarı kontrolü
-        min_amount = campaign.get('minPurchaseAmount', 0)
-        if min_amount > 0 and cart_doc.get('subtotal', 0) < min_amount:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Bu kampanya için minimum sepet tutarı {min_amount:.2f} TL olmalıdır. Mevcut sepet tutarınız: {cart_doc.get('subtotal', 0):.2f} TL"
-            )
-        
-        # Kullanım limiti kontrolü
-        max_uses = campaign.get('maxUses')
-        if max_uses is not None and campaign.get('usageCount', 0) >= max_uses:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Bu kampanya maksimum kullanım limitine ({max_uses}) ulaştı."
-            )
-            
-        # Spesifik kategori/ürün kontrolleri
-        if campaign.get('applicableTo') == 'specific_categories' and campaign.get('categories'):
-            # Kategori bazlı kampanya, sepetteki ürünler bu kategorilere ait mi kontrol et
-            categories = campaign.get('categories', [])
-            products_collection = db["products"]
-            
-            # Sepetteki ürünlerin ID'lerini al
-            product_ids = []
-            for item in cart_doc.get('items', []):
-                if item.get('product'):
-                    product_id = item.get('product')
-                    if isinstance(product_id, str) and ObjectId.is_valid(product_id):
-                        product_ids.append(ObjectId(product_id))
-                    elif isinstance(product_id, ObjectId):
-                        product_ids.append(product_id)
-            
-            # Bu ürünlerin kategori bilgilerini getir
-            if product_ids:
-                products_cursor = products_collection.find(
-                    {"_id": {"$in": product_ids}},
-                    {"category": 1}  # Sadece kategori alanını getir
-                )
-                
-                product_categories = []
-                async for prod in products_cursor:
-                    if prod.get('category'):
-                        product_categories.append(prod['category'])
-                
-                # Sepetteki ürünlerin en az biri kampanya kategorilerinde mi?
-                valid_category_found = False
-                for cat in product_categories:
-                    if str(cat) in [str(c) for c in categories]:
-                        valid_category_found = True
-                        break
-                
-                if not valid_category_found:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Bu kampanya sadece belirli kategorilerdeki ürünler için geçerlidir."
-                    )
+        campaign = compiled_campaign.doc
+
+        # Geçerlilik kontrolleri: tarih, kullanım limiti, minimum tutar ve ürün/kategori kapsamı.
+        # Ürünler sepet fiyatlandırmasıyla aynı istek kapsamlı yüklemeden gelir.
+        products = await loader.load_many(cart_product_ids(cart_doc))
+        eligibility_error = compiled_campaign.eligibility_error(
+            datetime.now(timezone.utc),
+            subtotal=cart_doc.get('subtotal', 0),
+            products=products.values(),
+        )
+        if eligibility_error:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=eligibility_error)
+
+        # Müşteri başına limit (kesin kontrol sipariş kaydında yapılır; burada erken bilgilendirme)
+        usage_limit = campaign.get('usagePerCustomer') or 0
+        if usage_limit > 0 and identifier.get("user"):
+            used_count = await customer_usage_count(db, campaign['_id'], customer_key(identifier["user"]))
+            if used_count >= usage_limit:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Bu kampanyayı maksimum {usage_limit} kez kullanabilirsiniz.")
         
-        # Kampanyayı sepete ekle
-        cart_doc['campaign'] = {
+        # Kampanyayı sepete atomik olarak ekle (araya giren kalem değişiklikleri korunur)
+        cart_doc = await set_cart_campaign(db, identifier, {
             "id": campaign['_id'],  # ObjectId olarak sakla
             "code": campaign.get('code', ''),
             "discountType": campaign.get('discountType', ''),
             "discountValue": campaign.get('discountValue', 0),
-            # discountAmount hesaplaması calculate_and_save_cart fonksiyonunda yapılacak
-        }
+            # discountAmount yeniden fiyatlandırmada hesaplanır
+        })
+        if not cart_doc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepet bulunamadı. Lütfen önce ürün ekleyin.")
 
-        # Kampanya kullanım sayısını artır (henüz veritabanına yansıtma)
-        usage_count = campaign.get('usageCount', 0) + 1
-        
-        # Sepeti hesapla ve kaydet
-        calculated_cart = await calculate_and_save_cart(cart_doc, db)
+        # Sepeti yeniden fiyatlandır (sürüm kontrollü kayıt)
+        calculated_cart = await reprice_cart(cart_doc, db, loader)
 
-        # Eğer calculate_and_save_cart fonksiyonu kampanyayı geçersiz kıldıysa hata döndür
+        # Fiyatlandırma kampanyayı geçersiz kıldıysa hata döndür
         if not calculated_cart.get('campaign'):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, 
                 detail="Kampanya sepetinize uygulanamadı. Lütfen koşulları kontrol edin."
             )
 
-        # Kampanya kullanım sayısını artır (veritabanına yansıt)
-        await campaigns_collection.update_one(
-            {"_id": campaign['_id']},
-            {"$set": {"usageCount": usage_count, "updatedAt": datetime.now(timezone.utc)}}
-        )
+        # Kullanım sayısı burada artırılmaz; sipariş kaydında limitle birlikte atomik olarak ayrılır
 
         return CartResponse(data=Cart.model_validate(calculated_cart))
         
@@ -748,7 +617,7 @@ async def apply_campaign_to_cart(campaign_data: ApplyCampaignRequest, request: R
         raise
     except Exception as e:
         # Beklenmedik hataları logla ve genel bir hata mesajı döndür
-        print(f"Kampanya uygulanırken beklenmedik hata: {e}")
+        logger.exception("Kampanya uygulanırken beklenmedik hata: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Kampanya uygulanırken bir hata oluştu. Lütfen daha sonra tekrar deneyin."
@@ -756,7 +625,7 @@ async def apply_campaign_to_cart(campaign_data: ApplyCampaignRequest, request: R
 
 
 @router.delete("/campaign", response_model=CartResponse)
-async def remove_campaign_from_cart(request: Request, db: DBDep):
+async def remove_campaign_from_cart(request: Request, db: DBDep, loader: ProductLoaderDep):
    """Sepetteki kampanyayı kaldırır."""
    try:
        identifier = await get_cart_identifier(request, db)
@@ -768,22 +637,23 @@ async def remove_campaign_from_cart(request: Request, db: DBDep):
 
        if not cart_doc.get('campaign'):
            # Zaten kampanya yoksa bir şey yapma
-           calculated_cart = await calculate_and_save_cart(cart_doc, db)
+           calculated_cart = await reprice_cart(cart_doc, db, loader)
            return CartResponse(data=Cart.model_validate(calculated_cart))
 
-       # Kampanyayı kaldır
-       cart_doc['campaign'] = None
-       cart_doc['discountAmount'] = 0
+       # Kampanyayı atomik olarak kaldır
+       cart_doc = await set_cart_campaign(db, identifier, None)
+       if not cart_doc:
+           raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sepet bulunamadı.")
 
-       # Sepeti hesapla ve kaydet
-       calculated_cart = await calculate_and_save_cart(cart_doc, db)
+       # Sepeti yeniden fiyatlandır (sürüm kontrollü kayıt)
+       calculated_cart = await reprice_cart(cart_doc, db, loader)
 
        return CartResponse(data=Cart.model_validate(calculated_cart))
        
    except HTTPException:
        raise
    except Exception as e:
-       print(f"Kampanya kaldırılırken hata: {e}")
+       logger.exception("Kampanya kaldırılırken hata: %s", e)
        raise HTTPException(
            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
            detail="Kampanya kaldırılırken bir hata oluştu."
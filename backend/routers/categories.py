@@ -6,19 +6,24 @@ from bson import ObjectId
 from slugify import slugify
 from datetime import datetime, timezone
 import pymongo
-import traceback
+import logging
 
 from database import get_db_dependency
 from models.category_models import CategoryCreate, CategoryUpdate, Category, CategoryListResponse, PyObjectId
 from utils.security import get_current_admin_user
+from utils.search import TURKISH_REPLACEMENTS
+from utils.category_cache import category_cache
+from utils.category_tree import build_ancestors, move_subtree, CategoryTreeError
+from utils.response_cache import product_list_cache
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
 AdminDep = Annotated[dict, Depends(get_current_admin_user)]
 
 # Helper function to create slug
 def create_category_slug(name: str) -> str:
-    return slugify(name, replacements=[('ı', 'i')])  # Türkçe karakter desteği
+    return slugify(name, replacements=TURKISH_REPLACEMENTS)  # Türkçe karakter desteği
 
 @router.post("/", response_model=Category, status_code=status.HTTP_201_CREATED)
 async def create_category(category_data: CategoryCreate, db: DBDep, admin_user: AdminDep):
@@ -44,11 +49,18 @@ async def create_category(category_data: CategoryCreate, db: DBDep, admin_user:
             category_data.parentCategory = ObjectId(category_data.parentCategory)
 
         category_dict = category_data.model_dump()
+        try:
+            category_dict["ancestors"] = await build_ancestors(db, category_dict.get("parentCategory"))
+        except CategoryTreeError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        category_dict["productCount"] = 0
         now = datetime.now(timezone.utc)
         category_dict["createdAt"] = now
         category_dict["updatedAt"] = now
 
         result = await categories_collection.insert_one(category_dict)
+        category_cache.invalidate()
+        await product_list_cache.invalidate()  # Kategori filtresi sonuçları değişebilir
         created_category_raw = await categories_collection.find_one({"_id": result.inserted_id})
 
         if not created_category_raw:
@@ -59,14 +71,14 @@ async def create_category(category_data: CategoryCreate, db: DBDep, admin_user:
         if 'parentCategory' in created_category_raw and created_category_raw['parentCategory']:
             if isinstance(created_category_raw['parentCategory'], ObjectId):
                 created_category_raw['parentCategory'] = str(created_category_raw['parentCategory'])
+        created_category_raw['ancestors'] = [str(ancestor_id) for ancestor_id in created_category_raw.get('ancestors', [])]
 
         return Category.model_validate(created_category_raw)
     except HTTPException:
         raise
     except Exception as e:
         error_detail = str(e)
-        print(f"Kategori oluşturma hatası: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception("Kategori oluşturma hatası: %s", error_detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Kategori oluşturulamadı: {error_detail}")
 
 
@@ -76,89 +88,34 @@ async def read_categories(
     include_inactive: bool = Query(False, description="Aktif olmayanları da dahil et (Admin için)")
 ):
     """Kategorileri listeler (varsayılan olarak sadece aktif olanlar)."""
-    categories_collection = db["categories"]
-    filter_query = {} if include_inactive else {"isActive": True}
-
     try:
-        # Hata kontrolü ile sorgu yap
-        try:
-            category_cursor = categories_collection.find(filter_query).sort([("order", 1), ("name", 1)])
-            categories_raw = await category_cursor.to_list(length=None)  # Tüm kategorileri al
-        except Exception as e:
-            print(f"Kategori listesi alma hatası: {e}")
-            print(f"Sorgu: {filter_query}")
-            # Hata durumunda boş liste döndür
-            categories_raw = []
-
-        # ObjectId'leri string'e çevir ve response modelini doğrula
-        categories_validated = []
-        for cat_raw in categories_raw:
-            try:
-                # ID kontrolü
-                if '_id' in cat_raw:
-                    cat_raw['_id'] = str(cat_raw['_id'])
-                else:
-                    print(f"Hatalı kategori verisi - '_id' alanı yok: {cat_raw}")
-                    continue
-                
-                # Üst kategori varsa kontrol et
-                if 'parentCategory' in cat_raw and cat_raw['parentCategory']:
-                    if isinstance(cat_raw['parentCategory'], ObjectId):
-                        cat_raw['parentCategory'] = str(cat_raw['parentCategory'])
-                
-                # Modeli doğrula
-                try:
-                    category = Category.model_validate(cat_raw)
-                    categories_validated.append(category)
-                except Exception as validation_error:
-                    print(f"Kategori modeli doğrulama hatası: {validation_error}")
-                    print(f"Hatalı kategori: {cat_raw}")
-                    # Hatalı kategoriyi atla
-                    continue
-            except Exception as e:
-                print(f"Kategori işleme hatası: {e}")
-                print(f"Hatalı kategori: {cat_raw}")
-                # Hatalı kategoriyi atla
-                continue
-
+        # Kategori ağacı bellekteki önbellekten gelir (modeller yüklemede bir kez doğrulanır)
+        snapshot = await category_cache.get(db)
+        categories_validated = snapshot.all_models if include_inactive else snapshot.active_models
         return CategoryListResponse(data=categories_validated)
     except Exception as e:
         error_detail = str(e)
-        print(f"Kategori listeleme hatası: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception("Kategori listeleme hatası: %s", error_detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Kategoriler listelenirken bir hata oluştu: {error_detail}")
 
 
 @router.get("/{category_id_or_slug}", response_model=Category)
 async def read_category(category_id_or_slug: str, db: DBDep):
     """ID veya slug ile tek bir kategoriyi getirir."""
-    categories_collection = db["categories"]
-    
     try:
-        query = {}
-        if ObjectId.is_valid(category_id_or_slug):
-            query["_id"] = ObjectId(category_id_or_slug)
-        else:
-            query["slug"] = category_id_or_slug
-
-        category_raw = await categories_collection.find_one(query)
+        # Kategori önbellekten çözülür (aktif olmayanlar da dahil)
+        snapshot = await category_cache.get(db)
+        category_raw = snapshot.resolve(category_id_or_slug, active_only=False)
 
         if not category_raw:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kategori bulunamadı.")
 
-        # ObjectId'leri string'e çevir
-        category_raw['_id'] = str(category_raw['_id'])
-        if 'parentCategory' in category_raw and category_raw['parentCategory']:
-            if isinstance(category_raw['parentCategory'], ObjectId):
-                category_raw['parentCategory'] = str(category_raw['parentCategory'])
-
-        return Category.model_validate(category_raw)
+        return Category.model_validate(snapshot.public_details(category_raw['_id']))
     except HTTPException:
         raise
     except Exception as e:
         error_detail = str(e)
-        print(f"Kategori getirme hatası: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception("Kategori getirme hatası: %s", error_detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Kategori getirilirken bir hata oluştu: {error_detail}")
 
 
@@ -191,6 +148,11 @@ async def update_category(category_id: str, category_data: CategoryUpdate, db: D
                 pass
             else:
                  raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Geçersiz Üst Kategori ID formatı.")
+            # Yeni yolu hesapla (kategori kendi alt ağacına taşınamaz)
+            try:
+                update_data["ancestors"] = await build_ancestors(db, update_data["parentCategory"], ObjectId(category_id))
+            except CategoryTreeError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
         # Zaman damgasını güncelle
         update_data["updatedAt"] = datetime.now(timezone.utc)
@@ -203,20 +165,25 @@ async def update_category(category_id: str, category_data: CategoryUpdate, db: D
 
         if not updated_category:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Güncellenecek kategori bulunamadı.")
+        if "ancestors" in update_data:
+            # Alt kategorilerin yolunu da taşı
+            await move_subtree(db, updated_category['_id'], update_data["ancestors"])
+        category_cache.invalidate()
+        await product_list_cache.invalidate()
 
         # ObjectId'leri string'e çevir
         updated_category['_id'] = str(updated_category['_id'])
         if 'parentCategory' in updated_category and updated_category['parentCategory']:
             if isinstance(updated_category['parentCategory'], ObjectId):
                 updated_category['parentCategory'] = str(updated_category['parentCategory'])
+        updated_category['ancestors'] = [str(ancestor_id) for ancestor_id in updated_category.get('ancestors', [])]
 
         return Category.model_validate(updated_category)
     except HTTPException:
         raise
     except Exception as e:
         error_detail = str(e)
-        print(f"Kategori güncelleme hatası: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception("Kategori güncelleme hatası: %s", error_detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Kategori güncellenirken bir hata oluştu: {error_detail}")
 
 
@@ -230,8 +197,14 @@ async def delete_category(category_id: str, db: DBDep, admin_user: AdminDep):
         if not ObjectId.is_valid(category_id):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Geçersiz Kategori ID formatı.")
 
-        # Kategoriye bağlı ürün var mı kontrol et
-        products_count = await products_collection.count_documents({"category": ObjectId(category_id)})
+        category_doc = await categories_collection.find_one({"_id": ObjectId(category_id)}, {"productCount": 1})
+        if not category_doc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Silinecek kategori bulunamadı.")
+
+        # Kategoriye bağlı ürün var mı kontrol et (sayaç henüz hesaplanmamışsa ürünler sayılır)
+        products_count = category_doc.get("productCount")
+        if products_count is None:
+            products_count = await products_collection.count_documents({"category": ObjectId(category_id)})
         if products_count > 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -250,12 +223,13 @@ async def delete_category(category_id: str, db: DBDep, admin_user: AdminDep):
 
         if delete_result.deleted_count == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Silinecek kategori bulunamadı.")
+        category_cache.invalidate()
+        await product_list_cache.invalidate()
 
         return None
     except HTTPException:
         raise
     except Exception as e:
         error_detail = str(e)
-        print(f"Kategori silme hatası: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception("Kategori silme hatası: %s", error_detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Kategori silinirken bir hata oluştu: {error_detail}")
\ No newline at end of file
@@ -1,5 +1,5 @@
 # backend/routers/favorites.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Annotated
 from bson import ObjectId
@@ -8,17 +8,24 @@ from datetime import datetime, timezone
 from database import get_db_dependency
 from models.favorites_models import FavoriteItemCreate, FavoriteList, FavoriteItem
 from utils.security import get_current_active_user
+from utils.loaders import ProductLoader, ProductLoaderDep, FAVORITE_SUMMARY_PROJECTION
 
 router = APIRouter()
 
 # Dependency Injection
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
+# Aktiflik kontrolü için tam kullanıcı; aynı token ile gelen istekler user_cache'ten karşılanır
 CurrentUserDep = Annotated[dict, Depends(get_current_active_user)]
 
 @router.get("", response_model=FavoriteList)
-async def get_favorites(current_user: CurrentUserDep, db: DBDep):
+async def get_favorites(
+    current_user: CurrentUserDep,
+    db: DBDep,
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=100)
+):
     """
-    Kullanıcının favori ürünlerini getirir.
+    Kullanıcının favori ürünlerini sayfalı olarak getirir.
     """
     user_id = current_user.get("_id")
     if not user_id:
@@ -28,36 +35,45 @@ async def get_favorites(current_user: CurrentUserDep, db: DBDep):
         )
 
     favorites_collection = db["favorites"]
-    products_collection = db["products"]
-    
-    # Kullanıcının favori ürünlerini bul
-    favorites_cursor = favorites_collection.find({"userId": ObjectId(user_id)})
-    favorites_list = await favorites_cursor.to_list(length=100)
-    
+    user_filter = {"userId": ObjectId(user_id)}
+
+    # Kullanıcının favori ürünlerini bul (en yeni önce, favorites_user_created index'i)
+    total = await favorites_collection.count_documents(user_filter)
+    favorites_cursor = favorites_collection.find(user_filter).sort([("createdAt", -1), ("_id", -1)]).skip((page - 1) * limit).limit(limit)
+    favorites_list = await favorites_cursor.to_list(length=limit)
+    pagination = {
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "totalPages": (total + limit - 1) // limit,
+    }
+
     # Favori ürün yoksa boş liste döndür
     if not favorites_list:
-        return FavoriteList(favorites=[])
-    
-    # Her favori için ürün detaylarını getir
+        return FavoriteList(favorites=[], pagination=pagination)
+
+    # Sayfadaki tüm ürünleri tek sorguda, sadece özet alanlarıyla getir
+    loader = ProductLoader(db, FAVORITE_SUMMARY_PROJECTION)
+    products_by_id = await loader.load_many(favorite["productId"] for favorite in favorites_list if "productId" in favorite)
+
     for favorite in favorites_list:
-        if "productId" in favorite:
-            product = await products_collection.find_one({"_id": favorite["productId"]})
-            if product:
-                # Ürün varsa, özet ürün bilgilerini ekle
-                favorite["product"] = {
-                    "id": str(product["_id"]),
-                    "name": product["name"],
-                    "slug": product["slug"],
-                    "price": product["price"],
-                    "salePrice": product.get("salePrice"),
-                    "image": product["images"][0]["url"] if product.get("images") and len(product["images"]) > 0 else None,
-                    "inStock": sum(variant["stock"] for variant in product.get("variants", [])) > 0 if product.get("variants") else True
-                }
-    
-    return FavoriteList(favorites=favorites_list)
+        product = products_by_id.get(favorite.get("productId"))
+        if product:
+            # Ürün varsa, özet ürün bilgilerini ekle
+            favorite["product"] = {
+                "id": str(product["_id"]),
+                "name": product["name"],
+                "slug": product["slug"],
+                "price": product["price"],
+                "salePrice": product.get("salePrice"),
+                "image": product["images"][0]["url"] if product.get("images") else None,
+                "inStock": product["totalStock"] > 0 if "totalStock" in product else True
+            }
+
+    return FavoriteList(favorites=favorites_list, pagination=pagination)
 
 @router.post("", status_code=status.HTTP_201_CREATED)
-async def add_to_favorites(favorite: FavoriteItemCreate, current_user: CurrentUserDep, db: DBDep):
+async def add_to_favorites(favorite: FavoriteItemCreate, current_user: CurrentUserDep, db: DBDep, loader: ProductLoaderDep):
     """
     Ürünü favorilere ekler.
     """
@@ -69,11 +85,10 @@ async def add_to_favorites(favorite: FavoriteItemCreate, current_user: CurrentUs
         )
     
     favorites_collection = db["favorites"]
-    products_collection = db["products"]
     
     # Ürünün var olup olmadığını kontrol et
     product_id = favorite.productId
-    product = await products_collection.find_one({"_id": ObjectId(product_id)})
+    product = await loader.load(ObjectId(product_id))
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
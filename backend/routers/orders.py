@@ -5,7 +5,8 @@ from typing import Annotated, List, Optional
 from bson import ObjectId
 from datetime import datetime, timezone
 import pymongo
-import traceback
+import re
+import logging
 
 from database import get_db_dependency
 from models.order_models import (
@@ -17,24 +18,40 @@ from models.product_models import Product as ProductModel # Ürün modeli
 from models.campaign_models import Campaign as CampaignModel # Kampanya modeli
 from models.user_models import UserPublic # Kullanıcı modeli
 from utils.security import get_current_user_payload, get_current_active_user, get_current_admin_user
-from .cart import get_cart_identifier, calculate_and_save_cart # Sepet yardımcı fonksiyonları
+from utils.checkout import build_stock_requirements, validate_stock, place_order, StockReservationError
+from utils.sequences import order_number_sequence
+from utils.loaders import ProductLoaderDep
+from utils.campaign_registry import campaign_registry
+from utils.campaign_usage import reserve_campaign_usage, release_campaign_usage, customer_key, CampaignUsageError
+from utils.pagination import encode_cursor, decode_cursor, build_keyset_filter, count_with_cache, InvalidCursorError
+from .cart import get_cart_identifier, reprice_cart # Sepet yardımcı fonksiyonları
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
 CurrentUserDep = Annotated[dict, Depends(get_current_active_user)]
 AdminUserDep = Annotated[dict, Depends(get_current_admin_user)]
 
+async def highest_order_sequence(db: AsyncIOMotorDatabase, date_str: str) -> int:
+    """O güne ait en büyük mevcut sipariş sırası (orderNumber indeksinde tek kayıt okunur)."""
+    prefix = f"DOVL-{date_str}-"
+    latest = await db["orders"].find_one(
+        {"orderNumber": {"$regex": f"^{re.escape(prefix)}"}},
+        {"orderNumber": 1, "_id": 0},
+        sort=[("orderNumber", -1)],
+    )
+    suffix = latest["orderNumber"][len(prefix):] if latest else ""
+    return int(suffix) if suffix.isdigit() else 0
+
 # Yardımcı fonksiyon: Yeni sipariş numarası oluştur
 async def generate_order_number(db: AsyncIOMotorDatabase) -> str:
-    orders_collection = db["orders"]
     date_str = datetime.now(timezone.utc).strftime('%y%m%d')
-    # O günkü sipariş sayısını bul
-    count = await orders_collection.count_documents({
-        "createdAt": {
-            "$gte": datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        }
-    })
-    sequence = str(count + 1).zfill(4) # Günlük 4 haneli sıra numarası
+    # Günlük atomik sayaç (counters koleksiyonu): sayım sorgusu yok, eşzamanlı siparişler çakışmaz.
+    # Sayaç ilk kullanımda o günün mevcut siparişlerinden başlatılır (sayaçtan önceki numaralarla çakışmasın)
+    sequence_value = await order_number_sequence.next(
+        db, f"orderNumber:{date_str}", seed=lambda: highest_order_sequence(db, date_str)
+    )
+    sequence = str(sequence_value).zfill(4) # Günlük 4 haneli sıra numarası
     return f"DOVL-{date_str}-{sequence}"
 
 @router.post("/", response_model=OrderCreateResponse, status_code=status.HTTP_201_CREATED)
@@ -42,16 +59,14 @@ async def create_order(
     order_data: OrderCreate,
     request: Request, # Cookie'den sepet ID'si almak için
     db: DBDep,
+    loader: ProductLoaderDep, # Sepet ve stok kontrolü aynı ürün yüklemesini paylaşır
     current_user: Optional[dict] = Depends(get_current_active_user) # Giriş yapmış kullanıcı (opsiyonel)
 ):
     """Yeni bir sipariş oluşturur."""
     try:
         # Gerekli koleksiyonları tanımla
         carts_collection = db["carts"]
-        products_collection = db["products"]
-        orders_collection = db["orders"]
         users_collection = db["users"] # Kullanıcı bilgilerini almak için
-        campaigns_collection = db["campaigns"]
 
         # Sepeti bul
         identifier = {}
@@ -59,7 +74,7 @@ async def create_order(
             # ID anahtarını kontrol et - _id veya id olabilir
             user_id = current_user.get("id") or current_user.get("_id")
             if not user_id:
-                print(f"HATA: Kullanıcı nesnesinde id veya _id alanı bulunamadı: {current_user}")
+                logger.error("Kullanıcı nesnesinde id veya _id alanı bulunamadı", extra={"user_keys": sorted(current_user)})
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Kullanıcı kimliği alınamadı. Lütfen tekrar giriş yapın."
@@ -78,52 +93,33 @@ async def create_order(
 
         # Sepeti yeniden hesapla (son kontrol)
         try:
-            cart = await calculate_and_save_cart(cart_doc, db)
+            cart = await reprice_cart(cart_doc, db, loader)
             validated_cart = CartModel.model_validate(cart) # Pydantic ile doğrula
         except Exception as cart_error:
-            print(f"Sepet hesaplama hatası: {cart_error}")
+            logger.warning("Sepet hesaplama hatası: %s", cart_error)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sepetiniz hesaplanırken bir hata oluştu. Lütfen sepetinizi kontrol edin.")
 
         if not validated_cart.items:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sepetinizdeki ürünlerin stoğu tükenmiş olabilir.")
 
-        # Stokları son kez kontrol et ve kilitle (ideal olarak transaction içinde)
-        # Basitleştirilmiş kontrol:
-        for item in validated_cart.items:
-            try:
-                product = await products_collection.find_one({"_id": ObjectId(item.product)})
-                if not product: 
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"'{item.productName}' ürünü artık mevcut değil. Lütfen sepetinizi güncelleyin."
-                    )
-                
-                variant = next((v for v in product.get('variants', []) if v.get('sku') == item.variant.sku), None)
-                if not variant:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"'{item.productName}' ürününün seçili varyantı artık mevcut değil. Lütfen sepetinizi güncelleyin."
-                    )
-                
-                if variant.get('stock', 0) < item.quantity:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"'{item.productName}' ürünü için stok yetersiz (Mevcut: {variant.get('stock', 0)}). Lütfen sepetinizi güncelleyin."
-                    )
-            except HTTPException:
-                raise
-            except Exception as e:
-                print(f"Stok kontrol hatası: {e}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Stok kontrolü yapılırken bir hata oluştu. Lütfen daha sonra tekrar deneyin."
-                )
+        # Stokları tek sorguda son kez kontrol et (ayırma işlemi sipariş kaydıyla birlikte yapılır)
+        stock_requirements, item_names = build_stock_requirements(validated_cart.items)
+        try:
+            await validate_stock(db, stock_requirements, item_names, loader)
+        except StockReservationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except Exception as e:
+            logger.exception("Stok kontrol hatası: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Stok kontrolü yapılırken bir hata oluştu. Lütfen daha sonra tekrar deneyin."
+            )
 
         # Sipariş numarasını oluştur
         try:
             order_number = await generate_order_number(db)
         except Exception as e:
-            print(f"Sipariş numarası oluşturma hatası: {e}")
+            logger.exception("Sipariş numarası oluşturma hatası: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
                 detail="Sipariş numarası oluşturulamadı. Lütfen daha sonra tekrar deneyin."
@@ -175,7 +171,7 @@ async def create_order(
                 item_dict = item.model_dump(exclude={'id'})
                 order_db_data["items"].append(item_dict)
             except Exception as e:
-                print(f"Ürün dönüştürme hatası: {e}, Ürün: {item}")
+                logger.error("Ürün dönüştürme hatası: %s", e, extra={"product_id": str(getattr(item, "product", None))})
                 # Hataya rağmen diğer ürünlere devam et, kritik olmayan hatalar sepeti engellemesin
                 continue
 
@@ -189,26 +185,31 @@ async def create_order(
         order_db_data["timeline"].append({"status": "processing", "date": now, "description": "Ödeme onaylandı, sipariş hazırlanıyor"})
         # -------------------------------------------
 
+        # Kampanya kullanımını limitlerle birlikte atomik olarak ayır (sipariş kaydedilemezse geri verilir)
+        campaign_reservation = None
+        if validated_cart.campaign:
+            compiled_campaign = (await campaign_registry.get(db)).get(validated_cart.campaign.id)
+            if not compiled_campaign:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sepetinizdeki kampanya artık geçerli değil. Lütfen sepetinizi kontrol edin.")
+            try:
+                campaign_reservation = await reserve_campaign_usage(
+                    db, compiled_campaign.doc, customer_key(user_id, order_data.guestEmail)
+                )
+            except CampaignUsageError as e:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
         try:
-            # Siparişi veritabanına kaydet
-            result = await orders_collection.insert_one(order_db_data)
-            new_order_id = result.inserted_id
-
-            # Stokları düş (Ödeme başarılı olduktan sonra yapılmalı)
-            if order_db_data["isPaid"]:
-                for item in validated_cart.items:
-                    try:
-                        update_result = await products_collection.update_one(
-                            {"_id": ObjectId(item.product), "variants.sku": item.variant.sku},
-                            {"$inc": {"variants.$.stock": -item.quantity, "totalStock": -item.quantity, "salesCount": item.quantity}}
-                        )
-                        
-                        if update_result.modified_count == 0:
-                            print(f"Stok güncellenemedi: Ürün: {item.product}, SKU: {item.variant.sku}, Miktar: {item.quantity}")
-                    except Exception as update_error:
-                        print(f"Stok güncelleme hatası: {update_error}")
-                        # Stok güncellemesindeki hata kritik olsa da sepeti iptal etmeyelim
-                        # Yönetici panelinden manuel düzeltilebilir
+            # Stoğu ayır ve siparişi kaydet (replica set varsa tek transaction içinde)
+            try:
+                new_order_id = await place_order(db, order_db_data, stock_requirements)
+            except Exception as e:
+                try:
+                    await release_campaign_usage(db, campaign_reservation)
+                except Exception as release_error:
+                    logger.error("Kampanya kullanımı geri alınamadı (%s): %s", validated_cart.campaign.code, release_error)
+                if isinstance(e, StockReservationError):
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+                raise
 
             # Kullanıcının sipariş geçmişini güncelle (giriş yapmışsa)
             if current_user:
@@ -220,14 +221,14 @@ async def create_order(
                             {"$push": {"orderHistory": new_order_id}}
                         )
                 except Exception as e:
-                    print(f"Kullanıcı sipariş geçmişi güncelleme hatası: {e}")
+                    logger.warning("Kullanıcı sipariş geçmişi güncelleme hatası: %s", e)
                     # Bu hata kritik değil, siparişi iptal etmeyelim
 
             # Sepeti temizle
             try:
                 await carts_collection.delete_one(identifier)
             except Exception as e:
-                print(f"Sepet temizleme hatası: {e}")
+                logger.warning("Sepet temizleme hatası: %s", e)
                 # Bu hata kritik değil, siparişi iptal etmeyelim
 
             # Başarı yanıtı döndür
@@ -236,8 +237,10 @@ async def create_order(
                 data={"orderId": str(new_order_id), "orderNumber": order_number}
             )
 
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Sipariş oluşturma veritabanı hatası: {e}")
+            logger.exception("Sipariş oluşturma veritabanı hatası: %s", e)
             # TODO: Eğer ödeme alındıysa ama DB kaydı/stok düşürme başarısız olduysa
             #       bu durumu loglayıp manuel düzeltme veya iade işlemi tetiklenmeli.
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Sipariş kaydedilirken bir hata oluştu. Ödeme alındıysa, iade işleminiz otomatik olarak başlatılacaktır.")
@@ -246,8 +249,7 @@ async def create_order(
         raise
     except Exception as e:
         error_detail = str(e)
-        print(f"Sipariş oluşturma hatası: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception("Sipariş oluşturma hatası: %s", error_detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Sunucu hatası oluştu.")
 
 
@@ -259,7 +261,9 @@ async def read_orders(
     status: Optional[str] = Query(None, description="Sipariş durumu filtresi"),
     user_id_filter: Optional[str] = Query(None, description="Belirli bir kullanıcı ID'si (Admin için)"),
     page: int = Query(1, ge=1),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset sayfalama. İlk sayfa için boş gönderin, sonraki sayfalar için nextCursor değerini kullanın."),
+    includeTotal: Optional[bool] = Query(None, description="Toplam sipariş sayısını döndür (cursor modunda varsayılan: hayır)")
 ):
     """Siparişleri listeler. Admin tümünü, kullanıcı sadece kendininkini görür."""
     try:
@@ -285,12 +289,34 @@ async def read_orders(
         if status:
             filter_query["status"] = status
 
-        # Sayfalama
-        skip = (page - 1) * limit
+        sort_list = [("createdAt", -1), ("_id", -1)]
+
+        # Sayfalama: cursor verildiyse keyset (aralık sorgusu), verilmediyse skip/limit
+        use_cursor = cursor is not None
+        page_query = filter_query
+        skip = 0
+        if use_cursor:
+            if cursor:
+                try:
+                    last_values = decode_cursor(cursor, sort_list)
+                except InvalidCursorError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                page_query = {"$and": [filter_query, build_keyset_filter(sort_list, last_values)]}
+        else:
+            skip = (page - 1) * limit
+
+        if includeTotal is None:
+            includeTotal = not use_cursor
+        total = await count_with_cache(orders_collection, filter_query) if includeTotal else None
 
-        total = await orders_collection.count_documents(filter_query)
-        order_cursor = orders_collection.find(filter_query).sort([("createdAt", -1)]).skip(skip).limit(limit)
-        orders_raw = await order_cursor.to_list(length=limit)
+        fetch_limit = limit + 1 if use_cursor else limit
+        order_cursor = orders_collection.find(page_query).sort(sort_list).skip(skip).limit(fetch_limit)
+        orders_raw = await order_cursor.to_list(length=fetch_limit)
+
+        next_cursor = None
+        if use_cursor and len(orders_raw) > limit:
+            orders_raw = orders_raw[:limit]
+            next_cursor = encode_cursor(sort_list, orders_raw[-1])
 
         # ObjectId'leri string'e çevir ve modeli doğrula
         orders_validated = []
@@ -317,8 +343,8 @@ async def read_orders(
                     validated_order = Order.model_validate(order_raw)
                     orders_validated.append(validated_order)
                 except Exception as validation_error:
-                    print(f"Sipariş validasyon hatası: {validation_error}")
-                    print(f"Hatalı sipariş verisi: {order_raw}")
+                    # Tüm belge yerine sadece ID loglanır (büyük siparişler log hattını tıkamasın)
+                    logger.warning("Sipariş validasyon hatası: %s", validation_error, extra={"order_id": order_raw.get("_id")})
                     
                     # Basitleştirilmiş bir Order oluştur ve ekle
                     basic_order = Order(
@@ -331,27 +357,31 @@ async def read_orders(
                     )
                     orders_validated.append(basic_order)
             except Exception as e:
-                print(f"Sipariş dönüştürme hatası: {e}")
+                logger.error("Sipariş dönüştürme hatası: %s", e)
                 # Hatalı siparişi atla
                 continue
 
         # Sayfalama bilgisi
-        total_pages = (total + limit - 1) // limit if total > 0 else 1
-
-        return OrderListResponse(
-            data=orders_validated,
-            pagination={
+        if use_cursor:
+            pagination = {"limit": limit, "nextCursor": next_cursor, "hasMore": next_cursor is not None}
+            if total is not None:
+                pagination["total"] = total
+        elif total is None:
+            pagination = {"page": page, "limit": limit}
+        else:
+            total_pages = (total + limit - 1) // limit if total > 0 else 1
+            pagination = {
                 "total": total,
                 "page": page,
                 "limit": limit,
                 "totalPages": total_pages
             }
-        )
+
+        return OrderListResponse(data=orders_validated, pagination=pagination)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Sipariş listeleme hatası: {e}")
-        traceback.print_exc()
+        logger.exception("Sipariş listeleme hatası: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Siparişler listelenirken bir hata oluştu."
@@ -401,8 +431,6 @@ async def read_order(order_id: str, db: DBDep, current_user: CurrentUserDep):
 
         try:
             # Sipariş nesnesini oluşturmayı dene
-            # Hata ayıklama için print ekle
-            print(f"Siparişi doğrulamayı deniyorum: {order_raw}")
             
             # Test ortamında eksik alanları kontrol et ve ekle
             if "totalAmount" in order_raw and "total" not in order_raw:
@@ -411,11 +439,7 @@ async def read_order(order_id: str, db: DBDep, current_user: CurrentUserDep):
             validated_order = Order.model_validate(order_raw)
             return OrderDetailResponse(data=validated_order)
         except Exception as validation_error:
-            print(f"Sipariş validasyon hatası: {validation_error}")
-            traceback.print_exc()
-            
-            # Hata detaylarını yazdır
-            print(f"Hatalı sipariş verisi: {order_raw}")
+            logger.warning("Sipariş validasyon hatası: %s", validation_error, extra={"order_id": order_raw.get("_id")})
             
             # Basitleştirilmiş bir cevap dön
             try:
@@ -434,7 +458,7 @@ async def read_order(order_id: str, db: DBDep, current_user: CurrentUserDep):
                 manual_order = Order(**order_data)
                 return OrderDetailResponse(data=manual_order)
             except Exception as fallback_error:
-                print(f"Fallback sipariş oluşturma hatası: {fallback_error}")
+                logger.error("Fallback sipariş oluşturma hatası: %s", fallback_error, extra={"order_id": order_raw.get("_id")})
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Sipariş verisi işlenirken bir hata oluştu."
@@ -443,8 +467,7 @@ async def read_order(order_id: str, db: DBDep, current_user: CurrentUserDep):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Sipariş getirme hatası: {e}")
-        traceback.print_exc()
+        logger.exception("Sipariş getirme hatası: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Sipariş getirilirken bir hata oluştu."
@@ -523,7 +546,7 @@ async def update_order(order_id: str, order_data: OrderUpdateAdmin, db: DBDep, a
                 validated_order = Order.model_validate(current_order)
                 return OrderDetailResponse(data=validated_order)
             except Exception as validation_error:
-                print(f"Güncellemesiz sipariş validasyon hatası: {validation_error}")
+                logger.error("Güncellemesiz sipariş validasyon hatası: %s", validation_error, extra={"order_id": order_id})
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Sipariş verisi işlenirken bir hata oluştu.")
 
         updated_order = await orders_collection.find_one_and_update(
@@ -551,12 +574,11 @@ async def update_order(order_id: str, order_data: OrderUpdateAdmin, db: DBDep, a
             validated_updated_order = Order.model_validate(updated_order)
             return OrderDetailResponse(data=validated_updated_order)
         except Exception as validation_error:
-            print(f"Güncellenmiş sipariş validasyon hatası: {validation_error}")
+            logger.error("Güncellenmiş sipariş validasyon hatası: %s", validation_error, extra={"order_id": order_id})
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Güncellenmiş sipariş verisi işlenirken bir hata oluştu.")
     
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Sipariş güncelleme hatası: {e}")
-        print(traceback.format_exc())
+        logger.exception("Sipariş güncelleme hatası: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Sipariş güncellenirken bir hata oluştu.")
\ No newline at end of file
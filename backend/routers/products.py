@@ -1,23 +1,37 @@
 # backend/routers/products.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Annotated, List, Optional
 from bson import ObjectId
-import re # Slug oluşturma için re import edilebilir veya slugify kütüphanesi kurulabilir
-import traceback
+from datetime import datetime, timezone
+import pymongo
+import logging
 
-from database import get_db_dependency
+from config import settings
+from database import get_db_dependency, get_catalog_db_dependency
 from models.product_models import ProductCreate, ProductUpdate, Product, ProductListResponse, PyObjectId
 from utils.security import get_current_admin_user # Sadece admin işlemleri için
+from utils.category_cache import category_cache
+from utils.category_tree import adjust_product_count, move_product_count
+from utils.pagination import encode_cursor, decode_cursor, build_keyset_filter, count_with_cache, InvalidCursorError
+from utils.response_cache import product_list_cache
+from utils.view_counter import view_counter
+from utils.search import (
+    TURKISH_REPLACEMENTS, build_search_fields, parse_search_query,
+    build_search_filter, build_relevance_score
+)
 from slugify import slugify # slugify kütüphanesini kurun: pip install python-slugify
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 DBDep = Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]
+# Listeleme/detay okumaları (CATALOG_READ_PREFERENCE, varsayılan secondaryPreferred)
+CatalogDBDep = Annotated[AsyncIOMotorDatabase, Depends(get_catalog_db_dependency)]
 AdminDep = Annotated[dict, Depends(get_current_admin_user)] # Admin yetkisi kontrolü
 
 # Helper function to create slug
 def create_product_slug(name: str) -> str:
-    return slugify(name, replacements=[('ı', 'i')]) # Türkçe karakter desteği
+    return slugify(name, replacements=TURKISH_REPLACEMENTS) # Türkçe karakter desteği
 
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED)
 async def create_product(product_data: ProductCreate, db: DBDep, admin_user: AdminDep):
@@ -51,6 +65,9 @@ async def create_product(product_data: ProductCreate, db: DBDep, admin_user: Adm
     total_stock = sum(variant.get("stock", 0) for variant in product_dict.get("variants", []))
     product_dict["totalStock"] = total_stock
 
+    # Arama alanlarını hesapla
+    product_dict.update(build_search_fields(product_dict))
+
     # Zaman damgalarını ekle
     now = datetime.now(timezone.utc)
     product_dict["createdAt"] = now
@@ -63,6 +80,9 @@ async def create_product(product_data: ProductCreate, db: DBDep, admin_user: Adm
 
     try:
         result = await products_collection.insert_one(product_dict)
+        await adjust_product_count(db, product_dict.get("category"), 1)
+        category_cache.invalidate()  # Kategori ürün sayıları değişti
+        await product_list_cache.invalidate()
         created_product_raw = await products_collection.find_one({"_id": result.inserted_id})
 
         if not created_product_raw:
@@ -76,64 +96,52 @@ async def create_product(product_data: ProductCreate, db: DBDep, admin_user: Adm
         return Product.model_validate(created_product_raw) # Pydantic V2
 
     except Exception as e:
-        print(f"Ürün oluşturma hatası: {e}")
+        logger.exception("Ürün oluşturma hatası: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ürün oluşturulamadı: {e}")
 
 
-@router.get("/", response_model=ProductListResponse)
-async def read_products(
-    db: DBDep,
-    category: Optional[str] = Query(None, description="Kategori slug veya ID'si"),
-    q: Optional[str] = Query(None, description="Arama sorgusu (isim, açıklama)"),
-    minPrice: Optional[float] = Query(None, ge=0),
-    maxPrice: Optional[float] = Query(None, ge=0),
-    isNew: Optional[bool] = Query(None),
-    isFeatured: Optional[bool] = Query(None),
-    sort: str = Query("createdAt_desc", description="Sıralama (örn: price_asc, name_desc)"),
-    page: int = Query(1, ge=1),
-    limit: int = Query(12, ge=1, le=100)  # Sayfa başına ürün limiti
-):
+async def _list_products(
+    db: AsyncIOMotorDatabase,
+    category: Optional[str],
+    includeSubcategories: bool,
+    q: Optional[str],
+    minPrice: Optional[float],
+    maxPrice: Optional[float],
+    isNew: Optional[bool],
+    isFeatured: Optional[bool],
+    sort: str,
+    page: int,
+    limit: int,
+    cursor: Optional[str],
+    includeTotal: Optional[bool],
+) -> ProductListResponse:
     """Ürünleri filtreleyerek, sıralayarak ve sayfalayarak listeler."""
     try:
         products_collection = db["products"]
-        categories_collection = db["categories"]
 
         filter_query = {"isActive": True}
 
-        # Kategori filtresi (slug veya ID ile)
+        # Kategori filtresi (slug veya ID ile, bellekteki kategori önbelleğinden çözülür)
         if category:
-            category_doc = None
-            if ObjectId.is_valid(category):
-                try:
-                    category_doc = await categories_collection.find_one({"_id": ObjectId(category), "isActive": True})
-                except Exception as e:
-                    print(f"Kategori ID ile arama hatası: {e}")
-                    pass
-            
-            if not category_doc:
-                try:
-                    category_doc = await categories_collection.find_one({"slug": category, "isActive": True})
-                except Exception as e:
-                    print(f"Kategori slug ile arama hatası: {e}")
-                    pass
+            category_snapshot = await category_cache.get(db)
+            category_doc = category_snapshot.resolve(category, active_only=True)
 
-            if category_doc:
+            if category_doc and includeSubcategories:
+                # Alt ağaç önceden hesaplanmış yoldan gelir, tek bir $in sorgusu yeterli
+                filter_query["category"] = {"$in": category_snapshot.subtree_ids(category_doc["_id"], active_only=True)}
+            elif category_doc:
                 filter_query["category"] = category_doc["_id"]
             else:
                 # Kategori bulunamazsa boş liste döndür
-                return ProductListResponse(
-                    data=[], 
-                    pagination={"total": 0, "page": page, "limit": limit, "totalPages": 0}
-                )
-
-        # Arama filtresi
-        if q:
-            search_regex = {"$regex": q, "$options": "i"}
-            filter_query["$or"] = [
-                {"name": search_regex},
-                {"description": search_regex},
-                {"tags": search_regex}
-            ]
+                empty_pagination = {"total": 0, "page": page, "limit": limit, "totalPages": 0}
+                if cursor is not None:
+                    empty_pagination = {"total": 0, "limit": limit, "nextCursor": None, "hasMore": False}
+                return ProductListResponse(data=[], pagination=empty_pagination)
+
+        # Arama filtresi (searchTokens üzerinde index'li önek araması)
+        search_terms = parse_search_query(q)
+        if search_terms:
+            filter_query.update(build_search_filter(search_terms))
 
         # Fiyat filtresi
         price_filter = {}
@@ -143,22 +151,11 @@ async def read_products(
             price_filter["$lte"] = maxPrice
         
         if price_filter:
-            # Eğer önceki bir $or varsa, mantığı birleştir
-            if "$or" in filter_query:
-                orig_or = filter_query.pop("$or")
-                filter_query["$and"] = [
-                    {"$or": orig_or},
-                    {"$or": [
-                        {"price": price_filter},
-                        {"salePrice": price_filter}
-                    ]}
-                ]
-            else:
-                # $or yoksa doğrudan ekle
-                filter_query["$or"] = [
-                    {"price": price_filter},
-                    {"salePrice": price_filter}
-                ]
+            # Arama filtresi $and kullandığı için $or doğrudan eklenebilir
+            filter_query["$or"] = [
+                {"price": price_filter},
+                {"salePrice": price_filter}
+            ]
 
         # Diğer filtreler
         if isNew is not None:
@@ -168,7 +165,11 @@ async def read_products(
 
         # Sıralama
         sort_options = {}
-        if sort:
+        sort_by_relevance = sort == "relevance" and bool(search_terms)
+        if sort_by_relevance:
+            sort_options["_score"] = -1
+            sort_options["salesCount"] = -1
+        elif sort:
             try:
                 parts = sort.split('_')
                 field = parts[0]
@@ -180,35 +181,78 @@ async def read_products(
                 else:
                     sort_options["createdAt"] = -1  # Varsayılan
             except Exception as e:
-                print(f"Sıralama hatası: {e}")
+                logger.warning("Sıralama hatası: %s", e)
                 sort_options["createdAt"] = -1  # Hata durumunda varsayılan
         else:
             sort_options["createdAt"] = -1  # Varsayılan
 
-        # Sayfalama
-        skip = (page - 1) * limit
+        # Sıralama listesini hazırla (_id eşitlikleri bozar ve keyset sayfalamayı mümkün kılar)
+        sort_list = list(sort_options.items())
+        sort_list.append(("_id", sort_list[0][1]))
+
+        # Sayfalama: cursor verildiyse keyset (aralık sorgusu), verilmediyse skip/limit
+        use_cursor = cursor is not None
+        page_query = filter_query
+        skip = 0
+        if use_cursor:
+            if cursor:
+                try:
+                    last_values = decode_cursor(cursor, sort_list)
+                except InvalidCursorError as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+                page_query = {"$and": [filter_query, build_keyset_filter(sort_list, last_values)]}
+        else:
+            skip = (page - 1) * limit
 
-        # Hata kontrolü
-        try:
-            total = await products_collection.count_documents(filter_query)
-        except Exception as e:
-            print(f"Count hatası: {e}")
-            print(f"Sorgu: {filter_query}")
-            # Hata durumunda güvenli bir değer
-            total = 0
+        # Toplam sayı: sayfa modunda varsayılan olarak, cursor modunda sadece istenirse
+        if includeTotal is None:
+            includeTotal = not use_cursor
+        total = None
+        if includeTotal:
+            try:
+                total = await count_with_cache(products_collection, filter_query)
+            except Exception as e:
+                # Sorgunun tamamı sadece DEBUG seviyesinde yazılır
+                logger.error("Count hatası: %s", e)
+                logger.debug("Count sorgusu", extra={"query": filter_query})
+                # Hata durumunda güvenli bir değer
+                total = 0
+
+        # Arama alanlarını yanıta dahil etme
+        search_projection = {"searchTokens": 0, "searchNameTokens": 0}
+        # Cursor modunda bir fazla belge çekilir: sonraki sayfa var mı?
+        fetch_limit = limit + 1 if use_cursor else limit
 
-        # Sıralama listesini hazırla
-        sort_list = list(sort_options.items())
-        
         try:
-            product_cursor = products_collection.find(filter_query).sort(sort_list).skip(skip).limit(limit)
-            products_raw = await product_cursor.to_list(length=limit)
+            if sort_by_relevance:
+                # Skor hesaplanan bir alan olduğu için keyset koşulu $addFields'ten sonra uygulanır
+                pipeline = [
+                    {"$match": filter_query},
+                    {"$addFields": {"_score": build_relevance_score(search_terms)}},
+                ]
+                if page_query is not filter_query:
+                    pipeline.append({"$match": page_query["$and"][1]})
+                pipeline += [
+                    {"$sort": dict(sort_list)},
+                    {"$skip": skip},
+                    {"$limit": fetch_limit},
+                    {"$project": search_projection},
+                ]
+                products_raw = await products_collection.aggregate(pipeline).to_list(length=fetch_limit)
+            else:
+                product_cursor = products_collection.find(page_query, search_projection).sort(sort_list).skip(skip).limit(fetch_limit)
+                products_raw = await product_cursor.to_list(length=fetch_limit)
         except Exception as e:
-            print(f"Ürün listesi alma hatası: {e}")
-            print(f"Sorgu: {filter_query}, Sıralama: {sort_list}, Skip: {skip}, Limit: {limit}")
+            logger.error("Ürün listesi alma hatası: %s", e)
+            logger.debug("Ürün listesi sorgusu", extra={"query": page_query, "sort": sort_list, "skip": skip, "limit": limit})
             # Hata durumunda boş liste
             products_raw = []
 
+        next_cursor = None
+        if use_cursor and len(products_raw) > limit:
+            products_raw = products_raw[:limit]
+            next_cursor = encode_cursor(sort_list, products_raw[-1])
+
         # ObjectId'leri string'e çevir
         products_validated = []
         for prod_raw in products_raw:
@@ -220,33 +264,82 @@ async def read_products(
                         prod_raw['category'] = str(prod_raw['category'])
                 products_validated.append(Product.model_validate(prod_raw))
             except Exception as e:
-                print(f"Ürün doğrulama hatası: {e}")
-                print(f"Hatalı ürün: {prod_raw}")
+                logger.warning("Ürün doğrulama hatası: %s", e, extra={"product_id": prod_raw.get("_id")})
                 # Hatalı ürünü atla ama listeye ekleme
                 continue
 
-        total_pages = (total + limit - 1) // limit if limit > 0 else 0  # Math.ceil
-
-        return ProductListResponse(
-            data=products_validated,
-            pagination={
+        if use_cursor:
+            pagination = {"limit": limit, "nextCursor": next_cursor, "hasMore": next_cursor is not None}
+            if total is not None:
+                pagination["total"] = total
+        elif total is None:
+            pagination = {"page": page, "limit": limit}
+        else:
+            total_pages = (total + limit - 1) // limit if limit > 0 else 0  # Math.ceil
+            pagination = {
                 "total": total,
                 "page": page,
                 "limit": limit,
                 "totalPages": total_pages
             }
-        )
+
+        return ProductListResponse(data=products_validated, pagination=pagination)
+    except HTTPException:
+        raise
     except Exception as e:
         error_detail = str(e)
-        print(f"Ürün listeleme hatası: {error_detail}")
-        print(traceback.format_exc())
+        logger.exception("Ürün listeleme hatası: %s", error_detail)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ürünler listelenirken bir hata oluştu: {error_detail}")
 
 
+@router.get("/", response_model=ProductListResponse)
+async def read_products(
+    request: Request,
+    db: CatalogDBDep,
+    primary_db: DBDep,
+    category: Optional[str] = Query(None, description="Kategori slug veya ID'si"),
+    includeSubcategories: bool = Query(False, description="Kategorinin aktif alt kategorilerindeki ürünleri de getir"),
+    q: Optional[str] = Query(None, description="Arama sorgusu (isim, açıklama, etiket; önek eşleşmeli)"),
+    minPrice: Optional[float] = Query(None, ge=0),
+    maxPrice: Optional[float] = Query(None, ge=0),
+    isNew: Optional[bool] = Query(None),
+    isFeatured: Optional[bool] = Query(None),
+    sort: str = Query("createdAt_desc", description="Sıralama (örn: price_asc, name_desc, relevance)"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(12, ge=1, le=100),  # Sayfa başına ürün limiti
+    cursor: Optional[str] = Query(None, description="Keyset sayfalama. İlk sayfa için boş gönderin, sonraki sayfalar için nextCursor değerini kullanın."),
+    includeTotal: Optional[bool] = Query(None, description="Toplam ürün sayısını döndür (cursor modunda varsayılan: hayır)")
+):
+    """Ürünleri listeler. Anonim ilk sayfa istekleri JSON'a çevrilmiş haliyle önbellekten sunulur."""
+    list_params = {
+        "category": category, "includeSubcategories": includeSubcategories, "q": q.strip() if q else None, "minPrice": minPrice, "maxPrice": maxPrice,
+        "isNew": isNew, "isFeatured": isFeatured, "sort": sort, "page": page, "limit": limit,
+        "cursor": cursor, "includeTotal": includeTotal,
+    }
+    # Oturum açmış istekler ve devam sayfaları (cursor değeri olan) önbelleğe girmez
+    if not settings.PRODUCT_LIST_CACHE_ENABLED or cursor or "authorization" in request.headers:
+        return await _list_products(db, **list_params)
+
+    # Önbelleğe alınan sayfa TTL boyunca sunulur; invalidate sonrası eski kopya (secondary
+    # gecikmesi) önbelleğe yazılmasın diye primary'den okunur
+    async def render() -> bytes:
+        response = await _list_products(primary_db, **list_params)
+        return response.model_dump_json(by_alias=True).encode("utf-8")
+
+    cache_key = product_list_cache.make_key(list_params)
+    entry, cache_status = await product_list_cache.get_or_render(cache_key, render)
+    return product_list_cache.build_response(request, entry, cache_status)
+
+
 @router.get("/{product_id_or_slug}", response_model=Product)
-async def read_product(product_id_or_slug: str, db: DBDep):
+async def read_product(
+    product_id_or_slug: str,
+    db: CatalogDBDep,
+    include: str = Query("category", description="Virgülle ayrılmış ek alanlar (category). Boş gönderilirse kategori detayı eklenmez.")
+):
     """ID veya slug ile tek bir ürünü getirir."""
     products_collection = db["products"]
+    include_fields = {field.strip() for field in include.split(",") if field.strip()}
 
     query = {}
     if ObjectId.is_valid(product_id_or_slug):
@@ -254,23 +347,24 @@ async def read_product(product_id_or_slug: str, db: DBDep):
     else:
         query["slug"] = product_id_or_slug
 
-    product_raw = await products_collection.find_one(query)
+    # Tek sorgu: arama alanları yanıtta kullanılmadığı için getirilmez
+    product_raw = await products_collection.find_one(query, {"searchTokens": 0, "searchNameTokens": 0})
 
     if not product_raw:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ürün bulunamadı.")
 
-    # Görüntülenme sayısını artır (performans için ayrı bir işlem olabilir)
-    await products_collection.update_one(query, {"$inc": {"viewCount": 1}})
+    # Görüntülenme sayısı bellekte biriktirilir, arka planda toplu yazılır
+    view_counter.record(product_raw['_id'])
 
     # ObjectId'leri string'e çevir
     product_raw['_id'] = str(product_raw['_id'])
     if 'category' in product_raw and isinstance(product_raw['category'], ObjectId):
         product_raw['category'] = str(product_raw['category'])
 
-    # İsteğe bağlı: Kategori detayını populate et
-    category_detail = await db["categories"].find_one({"_id": ObjectId(product_raw['category'])}) if 'category' in product_raw else None
-    product_raw['category_details'] = category_detail if category_detail else None
-
+    # Kategori detayı istenirse kategori önbelleğinden eklenir (ek DB sorgusu yok)
+    if "category" in include_fields:
+        category_snapshot = await category_cache.get(db)
+        product_raw['category_details'] = category_snapshot.public_details(product_raw.get('category'))
 
     return Product.model_validate(product_raw)
 
@@ -306,18 +400,29 @@ async def update_product(product_id: str, product_data: ProductUpdate, db: DBDep
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Yeni varyant SKU'larından biri zaten başka üründe kullanılıyor.")
         update_data["totalStock"] = sum(variant.get("stock", 0) for variant in update_data["variants"])
 
-
     # Zaman damgasını güncelle
     update_data["updatedAt"] = datetime.now(timezone.utc)
 
-    updated_product = await products_collection.find_one_and_update(
+    # Eski belge döner (kategori sayacı için eski kategori atomik olarak alınır), güncel hali $set ile aynı şekilde birleştirilir
+    previous_product = await products_collection.find_one_and_update(
         {"_id": ObjectId(product_id)},
         {"$set": update_data},
-        return_document=pymongo.ReturnDocument.AFTER # Güncellenmiş belgeyi döndür
+        return_document=pymongo.ReturnDocument.BEFORE
     )
 
-    if not updated_product:
+    if not previous_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Güncellenecek ürün bulunamadı.")
+    updated_product = {**previous_product, **update_data}
+
+    if "category" in update_data and str(previous_product.get("category")) != str(update_data["category"]):
+        await move_product_count(db, previous_product.get("category"), update_data["category"])
+        category_cache.invalidate()
+
+    # Aranan alanlardan biri değiştiyse arama alanlarını yeniden hesapla
+    if {"name", "description", "tags"} & update_data.keys():
+        search_fields = build_search_fields(updated_product)
+        await products_collection.update_one({"_id": updated_product["_id"]}, {"$set": search_fields})
+    await product_list_cache.invalidate()
 
     # ObjectId'leri string'e çevir
     updated_product['_id'] = str(updated_product['_id'])
@@ -335,17 +440,20 @@ async def delete_product(product_id: str, db: DBDep, admin_user: AdminDep):
     if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Geçersiz Ürün ID formatı.")
 
-    delete_result = await products_collection.delete_one({"_id": ObjectId(product_id)})
+    deleted_product = await products_collection.find_one_and_delete({"_id": ObjectId(product_id)}, projection={"category": 1})
 
-    if delete_result.deleted_count == 0:
+    if not deleted_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Silinecek ürün bulunamadı.")
+    await adjust_product_count(db, deleted_product.get("category"), -1)
+    category_cache.invalidate()
+    await product_list_cache.invalidate()
 
     return None # 204 No Content yanıtı için body olmaz
 
 @router.get("/similar/{product_id}", response_model=ProductListResponse)
 async def get_similar_products(
     product_id: str, 
-    db: DBDep,
+    db: CatalogDBDep,
     limit: int = Query(4, ge=1, le=12)
 ):
     """Verilen ürüne benzer ürünleri getirir."""
@@ -398,6 +506,5 @@ async def get_similar_products(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Benzer ürünleri getirme hatası: {e}")
-        print(traceback.format_exc())
+        logger.exception("Benzer ürünleri getirme hatası: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Benzer ürünler listelenirken bir hata oluştu.")
\ No newline at end of file
@@ -3,11 +3,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Annotated, List # List import et
 from bson import ObjectId
+from datetime import datetime, timezone
 
 from database import get_db_dependency
 from models.user_models import UserPublic, Address, AddressCreate # Gerekli modelleri import et
 # Güvenlik ve dependency fonksiyonlarını import et
-from utils.security import get_current_active_user, get_current_admin_user
+from utils.security import get_current_active_user, get_current_admin_user, verify_and_update_password, hash_password
+from utils.user_cache import user_cache
 from pydantic import BaseModel
 
 
@@ -54,7 +56,8 @@ async def change_my_password(passwords: PasswordChange, current_user: CurrentUse
         )
     
     # Mevcut şifreyi doğrula
-    if not verify_password(passwords.currentPassword, user.get("hashed_password")):
+    is_valid, _ = await verify_and_update_password(passwords.currentPassword, user.get("hashed_password"))
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Mevcut şifre yanlış."
@@ -68,7 +71,7 @@ async def change_my_password(passwords: PasswordChange, current_user: CurrentUse
         )
     
     # Yeni şifreyi hashle
-    hashed_password = get_password_hash(passwords.newPassword)
+    hashed_password = await hash_password(passwords.newPassword)
     
     # Şifreyi güncelle
     await users_collection.update_one(
@@ -78,5 +81,6 @@ async def change_my_password(passwords: PasswordChange, current_user: CurrentUse
             "updatedAt": datetime.now(timezone.utc)
         }}
     )
+    user_cache.invalidate(user_id)
     
     return {"message": "Şifreniz başarıyla değiştirildi."}
\ No newline at end of file
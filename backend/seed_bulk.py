@@ -0,0 +1,412 @@
+# backend/seed_bulk.py
+"""
+Büyük sentetik katalog üretici (yük testi için).
+
+Belgeler parça parça (chunk) üretilir ve her parça ayrı bir işlemde (process)
+sıralanmamış insert_many ile yazılır; bellekte hiçbir zaman tüm veri tutulmaz.
+Çıktı deterministiktir: ObjectId'ler (tür, sıra) çiftinden, rastgele alanlar
+(seed, tür, parça) ile tohumlanan RNG'den üretilir. İşlem sayısı değişse de aynı
+veri oluşur ve siparişler ürünleri okumadan referans verebilir.
+Tüm kullanıcılar aynı şifreyi kullanır; bcrypt bir kez hesaplanır.
+Index'ler veri yüklendikten sonra oluşturulur (yükleme sırasında index bakımı yapılmaz).
+
+Kullanım (backend dizininden):
+    python seed_bulk.py --products 1000000 --users 100000 --orders 5000000 --carts 50000 --drop
+    python seed_bulk.py --mongo-uri mongodb://localhost:27017 --db-name dovl_bench --products 10000
+
+Kullanıcı şifresi: --password (varsayılan "seed-password"), e-postalar user<N>@seed.dovl.local
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+
+from config import settings
+from utils.search import build_search_fields
+
+BASE_TIMESTAMP = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+KIND_CATEGORY, KIND_PRODUCT, KIND_USER, KIND_ORDER, KIND_CART = 1, 2, 3, 4, 5
+
+PRODUCT_TYPES = ["Elbise", "Bluz", "Etek", "Pantolon", "Ceket", "Gömlek", "Triko", "Şort"]
+ADJECTIVES = ["Basic", "Oversize", "Slim Fit", "Keten", "Saten", "Örme", "Desenli", "Klasik", "Crop", "Midi"]
+SIZES = ["XS", "S", "M", "L", "XL"]
+COLORS = [("Siyah", "#000000"), ("Beyaz", "#FFFFFF"), ("Lacivert", "#1F2A44"), ("Kırmızı", "#C0392B"),
+          ("Bej", "#D8C3A5"), ("Haki", "#6B705C"), ("Pudra", "#E8B4B8"), ("Gri", "#8E8E8E")]
+ORDER_STATUSES = ["processing", "shipped", "delivered", "delivered", "delivered", "cancelled"]
+CITIES = ["İstanbul", "Ankara", "İzmir", "Bursa", "Antalya", "Eskişehir"]
+
+
+def make_id(kind: int, index: int) -> ObjectId:
+    """(tür, sıra) için deterministik ObjectId: sabit zaman damgası + tür + 7 baytlık sıra."""
+    return ObjectId(BASE_TIMESTAMP.to_bytes(4, "big") + bytes([kind]) + index.to_bytes(7, "big"))
+
+
+def _mix(index: int, salt: int) -> int:
+    """Sıradan hızlı ve deterministik 32 bitlik karışım (RNG oluşturmadan ürün özelliği türetmek için)."""
+    value = (index * 2654435761 + salt * 40503) & 0xFFFFFFFF
+    value ^= value >> 15
+    return (value * 2246822519) & 0xFFFFFFFF
+
+
+def product_traits(index: int, category_count: int) -> dict:
+    """
+    Ürünün siparişlerde de gereken özellikleri. Sadece sıradan türetilir;
+    sipariş üreten işlem ürünü okumadan aynı değerleri hesaplar.
+    """
+    name = f"{ADJECTIVES[_mix(index, 1) % len(ADJECTIVES)]} {PRODUCT_TYPES[_mix(index, 2) % len(PRODUCT_TYPES)]} {index}"
+    price = float(100 + (_mix(index, 3) % 40) * 10)
+    sale_price = round(price * 0.8, 2) if _mix(index, 4) % 10 < 3 else None
+    first_color = _mix(index, 5) % len(COLORS)
+    color_indexes = [first_color] if _mix(index, 6) % 2 else [first_color, (first_color + 3) % len(COLORS)]
+    return {
+        "name": name,
+        "slug": f"urun-{index}",
+        "price": price,
+        "salePrice": sale_price,
+        "category_index": _mix(index, 7) % category_count,
+        "color_indexes": color_indexes,
+    }
+
+
+def variant_sku(index: int, color_index: int, size: str) -> str:
+    return f"P{index}-{color_index}-{size}"
+
+
+def image_url(index: int) -> str:
+    return f"https://placehold.co/800x1100/png?text=urun-{index}"
+
+
+# --- Belge üreticileri (her biri bir parçayı lazily üretir) ---
+
+def generate_categories(count: int, now: datetime) -> List[dict]:
+    """İki seviyeli kategori ağacı: kökler ve altlarındaki yaprak kategoriler (ürünler yapraklara bağlanır)."""
+    root_count = max(1, count // 5)
+    categories = []
+    for index in range(count):
+        category_id = make_id(KIND_CATEGORY, index)
+        is_root = index < root_count
+        parent_id = None if is_root else make_id(KIND_CATEGORY, index % root_count)
+        categories.append({
+            "_id": category_id,
+            "name": f"Kategori {index}",
+            "slug": f"kategori-{index}",
+            "description": None,
+            "parentCategory": parent_id,
+            "ancestors": [] if is_root else [parent_id],
+            "isActive": True,
+            "order": index,
+            "productCount": 0,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+    return categories
+
+
+def leaf_category_ids(count: int) -> List[ObjectId]:
+    root_count = max(1, count // 5)
+    leaves = range(root_count, count) if count > root_count else range(count)
+    return [make_id(KIND_CATEGORY, index) for index in leaves]
+
+
+def generate_products(start: int, end: int, rng: random.Random, options: dict):
+    leaves = options["leaf_categories"]
+    now = options["now"]
+    for index in range(start, end):
+        traits = product_traits(index, len(leaves))
+        variants = [
+            {"size": size, "colorName": COLORS[color_index][0], "colorHex": COLORS[color_index][1],
+             "stock": rng.randint(0, 40), "sku": variant_sku(index, color_index, size)}
+            for color_index in traits["color_indexes"]
+            for size in SIZES
+        ]
+        product = {
+            "_id": make_id(KIND_PRODUCT, index),
+            "name": traits["name"],
+            "slug": traits["slug"],
+            "description": f"{traits['name']} günlük kullanım için uygundur. Modern tasarımı ile kombinlerinizin vazgeçilmezi.",
+            "images": [{"url": image_url(index), "alt": traits["name"], "isMain": True}],
+            "brand": "DOVL",
+            "price": traits["price"],
+            "salePrice": traits["salePrice"],
+            "category": leaves[traits["category_index"]],
+            "tags": [traits["name"].split()[0].lower()],
+            "variants": variants,
+            "totalStock": sum(variant["stock"] for variant in variants),
+            "isFeatured": rng.random() < 0.1,
+            "isNew": rng.random() < 0.2,
+            "isActive": rng.random() < 0.97,
+            "averageRating": round(rng.uniform(3.0, 5.0), 1),
+            "numReviews": rng.randint(0, 200),
+            "salesCount": rng.randint(0, 1000),
+            "viewCount": rng.randint(0, 20000),
+            "createdAt": now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+            "updatedAt": now,
+        }
+        product.update(build_search_fields(product))
+        yield product
+
+
+def _address(rng: random.Random, full_name: str) -> dict:
+    city = rng.choice(CITIES)
+    return {"title": "Ev", "fullName": full_name, "address": f"Örnek Mahallesi {rng.randint(1, 200)}. Sokak No:{rng.randint(1, 90)}",
+            "city": city, "district": "Merkez", "postalCode": f"{rng.randint(10000, 81999)}", "country": "Türkiye",
+            "phone": f"05{rng.randint(300000000, 599999999)}"}
+
+
+def generate_users(start: int, end: int, rng: random.Random, options: dict):
+    now = options["now"]
+    for index in range(start, end):
+        full_name = f"Kullanıcı {index}"
+        address = {**_address(rng, full_name), "_id": make_id(KIND_USER, index), "isDefaultShipping": True, "isDefaultBilling": True}
+        yield {
+            "_id": make_id(KIND_USER, index),
+            "name": "Kullanıcı",
+            "surname": str(index),
+            "email": f"user{index}@seed.dovl.local",
+            "hashed_password": options["hashed_password"],
+            "role": "user",
+            "isActive": True,
+            "addresses": [address],
+            "wishlist": [],
+            "orderHistory": [],
+            "usedCampaigns": [],
+            "createdAt": now - timedelta(seconds=rng.randint(0, 2 * 365 * 24 * 3600)),
+            "updatedAt": now,
+        }
+
+
+def _pick_products(rng: random.Random, options: dict, count: int) -> List[Tuple[int, dict, int, str]]:
+    picked = []
+    for _ in range(count):
+        # Popüler ürünler daha sık satılır (karesel dağılım düşük sıraları öne çıkarır)
+        index = int(options["products"] * rng.random() ** 2)
+        traits = product_traits(index, options["leaf_count"])
+        color_index = rng.choice(traits["color_indexes"])
+        picked.append((index, traits, color_index, rng.choice(SIZES)))
+    return picked
+
+
+def generate_orders(start: int, end: int, rng: random.Random, options: dict):
+    now = options["now"]
+    for index in range(start, end):
+        user_index = rng.randrange(options["users"])
+        created_at = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        items = []
+        for product_index, traits, color_index, size in _pick_products(rng, options, rng.randint(1, 4)):
+            quantity = rng.randint(1, 3)
+            price = traits["salePrice"] or traits["price"]
+            items.append({
+                "product": make_id(KIND_PRODUCT, product_index),
+                "productName": traits["name"],
+                "productSlug": traits["slug"],
+                "productImage": image_url(product_index),
+                "variant": {"size": size, "colorName": COLORS[color_index][0], "colorHex": COLORS[color_index][1],
+                            "sku": variant_sku(product_index, color_index, size)},
+                "price": price,
+                "quantity": quantity,
+                "subtotal": round(price * quantity, 2),
+            })
+        subtotal = round(sum(item["subtotal"] for item in items), 2)
+        shipping_cost = 0.0 if subtotal >= 500 else 29.9
+        status = rng.choice(ORDER_STATUSES)
+        address = _address(rng, f"Kullanıcı {user_index}")
+        yield {
+            "_id": make_id(KIND_ORDER, index),
+            "orderNumber": f"SEED-{index:09d}",
+            "user": make_id(KIND_USER, user_index),
+            "userEmail": f"user{user_index}@seed.dovl.local",
+            "items": items,
+            "shippingAddress": address,
+            "billingAddress": address,
+            "paymentMethod": "credit_card",
+            "paymentDetails": {},
+            "campaign": None,
+            "subtotal": subtotal,
+            "shippingCost": shipping_cost,
+            "taxAmount": 0.0,
+            "total": round(subtotal + shipping_cost, 2),
+            "status": status,
+            "notes": None,
+            "isGuestCheckout": False,
+            "shippingInfo": {},
+            "timeline": [{"status": status, "date": created_at, "description": "Sentetik sipariş"}],
+            "isPaid": status != "cancelled",
+            "paidAt": created_at if status != "cancelled" else None,
+            "createdAt": created_at,
+            "updatedAt": created_at,
+        }
+
+
+def _cart_item(rng: random.Random, product_index: int, traits: dict, color_index: int, size: str) -> dict:
+    quantity = rng.randint(1, 2)
+    price = traits["salePrice"] or traits["price"]
+    sku = variant_sku(product_index, color_index, size)
+    return {
+        "_id": ObjectId(rng.randbytes(12)),
+        "product": make_id(KIND_PRODUCT, product_index),
+        "variantSku": sku,
+        "quantity": quantity,
+        "productName": traits["name"],
+        "productSlug": traits["slug"],
+        "productImage": image_url(product_index),
+        "variant": {"size": size, "colorName": COLORS[color_index][0], "colorHex": COLORS[color_index][1], "sku": sku},
+        "price": price,
+        "subtotal": round(price * quantity, 2),
+    }
+
+
+def generate_carts(start: int, end: int, rng: random.Random, options: dict):
+    now = options["now"]
+    for index in range(start, end):
+        # Her kullanıcının en fazla bir sepeti olur (carts_user_unique)
+        yield {
+            "_id": make_id(KIND_CART, index),
+            "user": make_id(KIND_USER, index),
+            "items": [_cart_item(rng, *picked) for picked in _pick_products(rng, options, rng.randint(1, 5))],
+            "campaign": None,
+            "version": 0,
+            "createdAt": now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600)),
+            "updatedAt": now,
+        }
+
+
+GENERATORS = {
+    "products": (KIND_PRODUCT, generate_products),
+    "users": (KIND_USER, generate_users),
+    "orders": (KIND_ORDER, generate_orders),
+    "carts": (KIND_CART, generate_carts),
+}
+
+
+# --- Paralel yükleme ---
+
+_worker_db = None
+_worker_options: Optional[dict] = None
+
+
+def _init_worker(mongo_uri: str, db_name: str, options: dict) -> None:
+    global _worker_db, _worker_options
+    _worker_db = MongoClient(mongo_uri)[db_name]
+    _worker_options = options
+
+
+def _insert_chunk(task: Tuple[str, int, int]) -> Tuple[str, int]:
+    collection_name, start, end = task
+    kind, generator = GENERATORS[collection_name]
+    # Parça başına tohum: çıktı işlem sayısından bağımsızdır
+    rng = random.Random(f"{_worker_options['seed']}:{kind}:{start}")
+    documents = list(generator(start, end, rng, _worker_options))
+    _worker_db[collection_name].insert_many(documents, ordered=False)
+    return collection_name, len(documents)
+
+
+def _chunks(collection_name: str, total: int, chunk_size: int):
+    for start in range(0, total, chunk_size):
+        yield collection_name, start, min(total, start + chunk_size)
+
+
+def update_category_counts(db) -> None:
+    """Ürün yüklendikten sonra kategori productCount alanlarını tek aggregate ile hesaplar."""
+    operations = [
+        UpdateOne({"_id": group["_id"]}, {"$set": {"productCount": group["count"]}})
+        for group in db["products"].aggregate([{"$group": {"_id": "$category", "count": {"$sum": 1}}}])
+        if group["_id"] is not None
+    ]
+    if operations:
+        db["categories"].bulk_write(operations, ordered=False)
+
+
+async def _ensure_indexes(mongo_uri: str, db_name: str) -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from utils.indexes import ensure_indexes, log_index_report
+    client = AsyncIOMotorClient(mongo_uri)
+    try:
+        log_index_report(await ensure_indexes(client[db_name]))
+    finally:
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Büyük sentetik katalog üretici")
+    parser.add_argument("--mongo-uri", default=settings.MONGO_URI)
+    parser.add_argument("--db-name", default=settings.DB_NAME)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--carts", type=int, default=500, help="Kullanıcı sepeti sayısı (en fazla --users)")
+    parser.add_argument("--chunk-size", type=int, default=5_000, help="Her insert_many'deki belge sayısı")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Paralel işlem sayısı")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="seed-password", help="Tüm sentetik kullanıcıların şifresi")
+    parser.add_argument("--drop", action="store_true", help="Yüklemeden önce ilgili koleksiyonları sil")
+    parser.add_argument("--skip-indexes", action="store_true", help="Yükleme sonrası index oluşturmayı atla")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")  # Index raporu loglanır
+
+    if args.products < 1 or args.users < 1 or args.categories < 1:
+        parser.error("--products, --users ve --categories en az 1 olmalıdır.")
+    args.carts = min(args.carts, args.users)
+    if args.drop and args.db_name == settings.DB_NAME:
+        parser.error(f"--drop uygulama veritabanında ({settings.DB_NAME}) kullanılamaz; --db-name ile ayrı bir veritabanı verin.")
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    print(f"Hedef: {args.db_name} | {args.products} ürün, {args.users} kullanıcı, {args.orders} sipariş, {args.carts} sepet, {args.workers} işlem")
+    if args.drop:
+        for collection_name in ("categories", *GENERATORS):
+            db[collection_name].drop()
+    elif db["products"].estimated_document_count():
+        print("UYARI: Koleksiyonlar boş değil; aynı seed ile tekrar çalıştırmak ID çakışmalarına yol açar (--drop kullanın).")
+
+    started = time.perf_counter()
+    # Tüm zaman alanları bu andan geriye doğru üretilir (parçalar arasında tutarlı)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    db["categories"].insert_many(generate_categories(args.categories, now), ordered=False)
+
+    # bcrypt bir kez hesaplanır (uygulamanın BCRYPT_ROUNDS ayarıyla), tüm kullanıcılar paylaşır
+    from utils.security import get_password_hash
+    leaves = leaf_category_ids(args.categories)
+    options = {
+        "seed": args.seed,
+        "now": now,
+        "hashed_password": get_password_hash(args.password),
+        "leaf_categories": leaves,
+        "leaf_count": len(leaves),
+        "products": args.products,
+        "users": args.users,
+    }
+
+    tasks = [task for name in GENERATORS for task in _chunks(name, getattr(args, name), args.chunk_size)]
+    totals = {name: 0 for name in GENERATORS}
+    with multiprocessing.get_context("spawn").Pool(
+        processes=max(1, args.workers), initializer=_init_worker, initargs=(args.mongo_uri, args.db_name, options)
+    ) as pool:
+        last_report = time.perf_counter()
+        for collection_name, inserted in pool.imap_unordered(_insert_chunk, tasks):
+            totals[collection_name] += inserted
+            if time.perf_counter() - last_report >= 5:
+                last_report = time.perf_counter()
+                progress = ", ".join(f"{name} {count}/{getattr(args, name)}" for name, count in totals.items())
+                print(f"  {time.perf_counter() - started:6.0f} sn: {progress}")
+
+    update_category_counts(db)
+    load_seconds = time.perf_counter() - started
+    document_count = sum(totals.values()) + args.categories
+    print(f"Yükleme tamamlandı: {document_count} belge, {load_seconds:.1f} sn ({document_count / load_seconds:,.0f} belge/sn)")
+
+    if not args.skip_indexes:
+        index_started = time.perf_counter()
+        asyncio.run(_ensure_indexes(args.mongo_uri, args.db_name))
+        print(f"Index'ler {time.perf_counter() - index_started:.1f} sn'de hazırlandı.")
+
+
+if __name__ == "__main__":
+    main()
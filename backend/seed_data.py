@@ -8,12 +8,14 @@ from passlib.context import CryptContext
 import json
 from slugify import slugify
 
+from config import settings
+
 # Şifre hash fonksiyonu
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Veritabanı bağlantısı
-client = MongoClient("mongodb://localhost:27017/")
-db = client["dovl_db_py"]  # Veritabanı adınızı kullanın
+client = MongoClient(settings.MONGO_URI)
+db = client[settings.DB_NAME]
 
 # Koleksiyonlar
 users_collection = db["users"]
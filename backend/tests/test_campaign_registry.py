@@ -0,0 +1,62 @@
+# backend/tests/test_campaign_registry.py
+import pytest
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.campaign_registry import CampaignRegistry, CampaignSnapshot, CompiledCampaign
+
+NOW = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+def _campaign(**overrides) -> dict:
+    campaign = {
+        "_id": ObjectId(), "code": "YAZ20", "isActive": True,
+        "discountType": "percentage", "discountValue": 20,
+        # Mongo'dan tz bilgisi olmadan gelen tarihler
+        "startDate": datetime(2024, 5, 1), "endDate": datetime(2024, 7, 1),
+        "applicableTo": "all_products", "usageCount": 0,
+    }
+    campaign.update(overrides)
+    return campaign
+
+def test_compiled_campaign_checks_dates_limits_and_minimum():
+    """Tarih (tz'siz), kullanım limiti ve minimum tutar kontrolleri."""
+    assert CompiledCampaign(_campaign()).eligibility_error(NOW, subtotal=100) is None
+    assert "süresi doldu" in CompiledCampaign(_campaign()).eligibility_error(NOW + timedelta(days=60))
+    assert "limitine" in CompiledCampaign(_campaign(maxUses=5, usageCount=5)).eligibility_error(NOW)
+    assert "minimum sepet" in CompiledCampaign(_campaign(minPurchaseAmount=200)).eligibility_error(NOW, subtotal=150)
+
+def test_compiled_campaign_category_and_exclusion_sets():
+    """Kategori kapsamı ve hariç tutulan ürünler küme üyeliğiyle kontrol edilir."""
+    dresses, shoes = ObjectId(), ObjectId()
+    dress = {"_id": ObjectId(), "category": dresses}
+    shoe = {"_id": ObjectId(), "category": shoes}
+
+    by_category = CompiledCampaign(_campaign(applicableTo="specific_categories", categories=[str(dresses)]))
+    assert by_category.applies_to_product(dress) and not by_category.applies_to_product(shoe)
+    assert by_category.eligibility_error(NOW, products=[dress, shoe]) is None
+    assert "kategorilerdeki" in by_category.eligibility_error(NOW, products=[shoe])
+
+    excluding = CompiledCampaign(_campaign(excludedProducts=[dress["_id"]]))
+    assert excluding.eligibility_error(NOW, products=[dress]) is not None
+    assert excluding.eligibility_error(NOW, products=[dress, shoe]) is None
+
+def test_campaign_snapshot_lookup_by_code_and_id():
+    campaign = _campaign()
+    snapshot = CampaignSnapshot([campaign])
+    assert snapshot.get_by_code(" yaz20 ").id == campaign["_id"]
+    assert snapshot.get(str(campaign["_id"])).code == "YAZ20"
+    assert snapshot.get_by_code("YOK") is None
+
+@pytest.mark.asyncio
+async def test_registry_counts_sharded_usage_toward_limit(test_db: AsyncIOMotorDatabase):
+    """Parçalı sayaçta usageCount 0 kalır; kayıt parçaları toplayarak limiti uygular."""
+    campaign = _campaign(maxUses=4, usageShards=2, startDate=None, endDate=None)
+    await test_db["campaigns"].insert_one(campaign)
+    await test_db["campaign_usage_shards"].insert_many([
+        {"_id": f"{campaign['_id']}:{index}", "campaign": campaign["_id"], "shard": index, "count": 2, "limit": 2}
+        for index in range(2)
+    ])
+
+    compiled = (await CampaignRegistry(ttl_seconds=60).get(test_db)).get(campaign["_id"])
+    assert "limitine" in compiled.eligibility_error(NOW)
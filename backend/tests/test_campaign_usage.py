@@ -0,0 +1,89 @@
+# backend/tests/test_campaign_usage.py
+import asyncio
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.campaign_usage import (
+    reserve_campaign_usage, release_campaign_usage, ensure_usage_shards, apply_usage_totals,
+    split_evenly, CampaignUsageError
+)
+
+def test_split_evenly_distributes_remainder_to_first_shards():
+    assert split_evenly(10, 4) == [3, 3, 2, 2]
+    assert sum(split_evenly(7, 3)) == 7
+
+@pytest.mark.asyncio
+async def test_concurrent_reservations_never_exceed_max_uses(test_db: AsyncIOMotorDatabase):
+    """Eşzamanlı kullanımlarda toplam limit aşılmaz, artışlar kaybolmaz."""
+    campaign = {"_id": ObjectId(), "maxUses": 5, "usageCount": 0, "usagePerCustomer": 0}
+    await test_db["campaigns"].insert_one(campaign)
+
+    results = await asyncio.gather(
+        *(reserve_campaign_usage(test_db, campaign, f"user:{i}") for i in range(20)),
+        return_exceptions=True,
+    )
+    assert sum(not isinstance(result, Exception) for result in results) == 5
+    assert all(isinstance(result, CampaignUsageError) for result in results if isinstance(result, Exception))
+    assert (await test_db["campaigns"].find_one({"_id": campaign["_id"]}))["usageCount"] == 5
+
+@pytest.mark.asyncio
+async def test_per_customer_limit_and_release(test_db: AsyncIOMotorDatabase):
+    """Müşteri limiti dolunca reddedilir; geri verilen kullanım tekrar kullanılabilir."""
+    campaign = {"_id": ObjectId(), "maxUses": None, "usageCount": 0, "usagePerCustomer": 1}
+    await test_db["campaigns"].insert_one(campaign)
+
+    reservation = await reserve_campaign_usage(test_db, campaign, "email:guest@example.com")
+    with pytest.raises(CampaignUsageError):
+        await reserve_campaign_usage(test_db, campaign, "email:guest@example.com")
+    assert (await test_db["campaigns"].find_one({"_id": campaign["_id"]}))["usageCount"] == 1
+
+    await release_campaign_usage(test_db, reservation)
+    await reserve_campaign_usage(test_db, campaign, "email:guest@example.com")
+    assert (await test_db["campaigns"].find_one({"_id": campaign["_id"]}))["usageCount"] == 1
+
+@pytest.mark.asyncio
+async def test_sharded_counter_enforces_total_limit(test_db: AsyncIOMotorDatabase):
+    """Parçalı sayaçta toplam kullanım maxUses'u geçmez ve yanıtlarda toplanır."""
+    campaign = {"_id": ObjectId(), "maxUses": 10, "usageCount": 0, "usagePerCustomer": 0, "usageShards": 4}
+    await test_db["campaigns"].insert_one(campaign)
+    await ensure_usage_shards(test_db, campaign)
+
+    results = await asyncio.gather(
+        *(reserve_campaign_usage(test_db, campaign, None) for _ in range(15)),
+        return_exceptions=True,
+    )
+    assert sum(not isinstance(result, Exception) for result in results) == 10
+
+    campaign_doc = await test_db["campaigns"].find_one({"_id": campaign["_id"]})
+    await apply_usage_totals(test_db, [campaign_doc])
+    assert campaign_doc["usageCount"] == 10
+
+@pytest.mark.asyncio
+async def test_sharded_counter_uses_stored_shard_limits(test_db: AsyncIOMotorDatabase):
+    """Önbellekteki kampanya eski maxUses taşısa da parçalarda saklanan limit uygulanır."""
+    campaign = {"_id": ObjectId(), "maxUses": 4, "usageCount": 0, "usagePerCustomer": 0, "usageShards": 2}
+    await test_db["campaigns"].insert_one(campaign)
+    await ensure_usage_shards(test_db, campaign)
+
+    stale_campaign = {**campaign, "maxUses": None}
+    results = await asyncio.gather(
+        *(reserve_campaign_usage(test_db, stale_campaign, None) for _ in range(6)),
+        return_exceptions=True,
+    )
+    assert sum(not isinstance(result, Exception) for result in results) == 4
+
+@pytest.mark.asyncio
+async def test_limits_come_from_stored_campaign_not_cached_copy(test_db: AsyncIOMotorDatabase):
+    """Admin limitleri düşürdüğünde önbellekteki eski kopya limit aşımına izin vermez."""
+    campaign = {"_id": ObjectId(), "maxUses": 2, "usageCount": 0, "usagePerCustomer": 1}
+    await test_db["campaigns"].insert_one(campaign)
+    stale_campaign = {**campaign, "maxUses": None, "usagePerCustomer": 0}
+
+    await reserve_campaign_usage(test_db, stale_campaign, "user:a")
+    with pytest.raises(CampaignUsageError, match="1 kez"):
+        await reserve_campaign_usage(test_db, stale_campaign, "user:a")
+    await reserve_campaign_usage(test_db, stale_campaign, "user:b")
+    with pytest.raises(CampaignUsageError, match=r"\(2\)"):
+        await reserve_campaign_usage(test_db, stale_campaign, "user:c")
+    assert (await test_db["campaigns"].find_one({"_id": campaign["_id"]}))["usageCount"] == 2
@@ -0,0 +1,42 @@
+# backend/tests/test_cart_merge.py
+import pytest
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from routers.cart import merge_guest_cart
+from utils.cart_sweeper import CartSweeper
+
+@pytest.mark.asyncio
+async def test_merge_guest_cart_into_user_cart(test_db: AsyncIOMotorDatabase):
+    """Aynı varyantın adetleri toplanır, misafir sepeti silinir."""
+    user_id, product_id = ObjectId(), ObjectId()
+    await test_db["carts"].insert_many([
+        {"user": user_id, "version": 2, "campaign": None,
+         "items": [{"_id": ObjectId(), "product": product_id, "variantSku": "A", "quantity": 1}]},
+        {"sessionId": "guest-1", "version": 1, "campaign": None,
+         "items": [{"_id": ObjectId(), "product": product_id, "variantSku": "A", "quantity": 2},
+                   {"_id": ObjectId(), "product": product_id, "variantSku": "B", "quantity": 1}]},
+    ])
+
+    assert await merge_guest_cart(test_db, "guest-1", user_id) is True
+    user_cart = await test_db["carts"].find_one({"user": user_id})
+    quantities = {item["variantSku"]: item["quantity"] for item in user_cart["items"]}
+    assert quantities == {"A": 3, "B": 1}
+    assert user_cart["version"] == 3
+    assert await test_db["carts"].find_one({"sessionId": "guest-1"}) is None
+
+@pytest.mark.asyncio
+async def test_cart_sweeper_reports_deleted_guest_carts(test_db: AsyncIOMotorDatabase):
+    """Boş ve terk edilmiş misafir sepetleri silinir, kullanıcı sepetleri korunur."""
+    now = datetime.now(timezone.utc)
+    await test_db["carts"].insert_many([
+        {"sessionId": "empty-old", "items": [], "updatedAt": now - timedelta(hours=30)},
+        {"sessionId": "empty-new", "items": [], "updatedAt": now - timedelta(hours=1)},
+        {"sessionId": "abandoned", "items": [{"quantity": 1}], "updatedAt": now - timedelta(days=40)},
+        {"user": ObjectId(), "items": [], "updatedAt": now - timedelta(days=40)},
+    ])
+
+    sweeper = CartSweeper(interval_seconds=0, empty_ttl=timedelta(hours=24), abandoned_ttl=timedelta(days=30))
+    assert await sweeper.sweep(test_db, now=now) == {"empty": 1, "abandoned": 1}
+    assert await test_db["carts"].count_documents({}) == 2
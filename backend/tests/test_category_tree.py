@@ -0,0 +1,36 @@
+# backend/tests/test_category_tree.py
+from bson import ObjectId
+from datetime import datetime, timezone
+
+from utils.category_cache import CategorySnapshot
+from utils.category_tree import compute_ancestors
+
+def _category(slug: str, parent=None, ancestors=None, is_active: bool = True) -> dict:
+    now = datetime.now(timezone.utc)
+    doc = {"_id": ObjectId(), "name": slug.title(), "slug": slug, "parentCategory": parent,
+           "isActive": is_active, "order": 0, "createdAt": now, "updatedAt": now}
+    if ancestors is not None:
+        doc["ancestors"] = ancestors
+    return doc
+
+def test_compute_ancestors_follows_parent_chain():
+    """Yol kökten üst kategoriye doğru sıralanır, döngüler sonsuza gitmez."""
+    root, child, leaf = ObjectId(), ObjectId(), ObjectId()
+    parents = {root: None, child: root, leaf: child}
+    assert compute_ancestors(leaf, parents) == [root, child]
+    assert compute_ancestors(root, parents) == []
+    looped = {root: child, child: root}
+    assert compute_ancestors(root, looped) == [child]
+
+def test_snapshot_subtree_skips_inactive_branches():
+    """Alt ağaç tüm aktif torunları içerir; pasif kategori ve altı dahil edilmez."""
+    women = _category("kadin", ancestors=[])
+    dresses = _category("elbise", women["_id"], ancestors=[women["_id"]])
+    midi = _category("midi", dresses["_id"])  # Yol hesaplanmamış eski veri
+    hidden = _category("gizli", women["_id"], ancestors=[women["_id"]], is_active=False)
+    hidden_child = _category("gizli-alt", hidden["_id"], ancestors=[women["_id"], hidden["_id"]])
+
+    snapshot = CategorySnapshot([women, dresses, midi, hidden, hidden_child])
+    assert snapshot.subtree_ids(women["_id"]) == [women["_id"], dresses["_id"], midi["_id"]]
+    assert len(snapshot.subtree_ids(women["_id"], active_only=False)) == 5
+    assert snapshot.subtree_ids(midi["_id"]) == [midi["_id"]]
@@ -0,0 +1,49 @@
+# backend/tests/test_checkout.py
+import pytest
+from bson import ObjectId
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.checkout import place_order, validate_stock, StockReservationError
+
+def _product(sku: str, stock: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "name": f"Ürün {sku}",
+        "variants": [{"sku": sku, "stock": stock}],
+        "totalStock": stock,
+        "salesCount": 0,
+    }
+
+@pytest.mark.asyncio
+async def test_place_order_reserves_stock(test_db: AsyncIOMotorDatabase):
+    """Stok tek seferde düşülür ve sipariş kaydedilir."""
+    product = _product("SKU-A", 5)
+    await test_db["products"].insert_one(product)
+    requirements = {(product["_id"], "SKU-A"): 2}
+
+    await validate_stock(test_db, requirements, {})
+    order_id = await place_order(test_db, {"orderNumber": "T-1", "createdAt": datetime.now(timezone.utc)}, requirements)
+
+    assert await test_db["orders"].find_one({"_id": order_id})
+    updated = await test_db["products"].find_one({"_id": product["_id"]})
+    assert updated["variants"][0]["stock"] == 3
+    assert updated["totalStock"] == 3
+    assert updated["salesCount"] == 2
+    assert not updated.get("stockReservations")
+
+@pytest.mark.asyncio
+async def test_place_order_rolls_back_partial_reservation(test_db: AsyncIOMotorDatabase):
+    """Bir kalem ayrılamazsa diğer kalemlerin stoğu geri verilir ve sipariş kaydedilmez."""
+    enough = _product("SKU-B", 5)
+    short = _product("SKU-C", 1)
+    await test_db["products"].insert_many([enough, short])
+    requirements = {(enough["_id"], "SKU-B"): 2, (short["_id"], "SKU-C"): 3}
+
+    with pytest.raises(StockReservationError):
+        await place_order(test_db, {"orderNumber": "T-2"}, requirements)
+
+    assert await test_db["orders"].count_documents({}) == 0
+    restored = await test_db["products"].find_one({"_id": enough["_id"]})
+    assert restored["variants"][0]["stock"] == 5
+    assert restored["totalStock"] == 5
@@ -0,0 +1,27 @@
+# backend/tests/test_indexes.py
+import pytest
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.indexes import ensure_indexes, INDEX_REGISTRY
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_registry(test_db: AsyncIOMotorDatabase):
+    """Kayıttaki tüm index'lerin oluşturulduğunu ve ikinci çalıştırmada eksik kalmadığını test eder."""
+    await ensure_indexes(test_db)
+    report = await ensure_indexes(test_db, create=False)
+
+    assert report["missing"] == []
+    assert report["drifted"] == []
+    total_specs = sum(len(specs) for specs in INDEX_REGISTRY.values())
+    assert len(report["ok"]) == total_specs
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_reports_drift(test_db: AsyncIOMotorDatabase):
+    """Aynı isimle farklı tanımlanmış bir index'in raporlandığını test eder."""
+    await test_db["campaigns"].drop_indexes()
+    await test_db["campaigns"].create_index([("code", 1)], name="campaigns_code_unique")  # unique değil
+
+    report = await ensure_indexes(test_db)
+
+    drifted = [entry["name"] for entry in report["drifted"]]
+    assert "campaigns_code_unique" in drifted
@@ -0,0 +1,28 @@
+# backend/tests/test_loaders.py
+import asyncio
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.loaders import ProductLoader
+
+@pytest.mark.asyncio
+async def test_product_loader_batches_and_memoizes(test_db: AsyncIOMotorDatabase):
+    """Aynı turdaki yüklemeler tek sorguda toplanır, tekrar istenen ürün sorgulanmaz."""
+    product_ids = [ObjectId() for _ in range(3)]
+    await test_db["products"].insert_many([{"_id": pid, "name": f"Ürün {i}", "isActive": True} for i, pid in enumerate(product_ids)])
+    missing_id = ObjectId()
+
+    loader = ProductLoader(test_db)
+    first, products, missing = await asyncio.gather(
+        loader.load(product_ids[0]),
+        loader.load_many(product_ids),
+        loader.load(missing_id),
+    )
+    assert loader.query_count == 1
+    assert first["name"] == "Ürün 0"
+    assert set(products) == set(product_ids)
+    assert missing is None
+
+    await loader.load_many(product_ids + [missing_id])
+    assert loader.query_count == 1
@@ -0,0 +1,49 @@
+# backend/tests/test_log.py
+import json
+import logging
+import queue
+
+from utils import log
+from utils.log import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, parse_log_levels, setup_logging, shutdown_logging
+
+def _record(msg: str, *args, level: int = logging.ERROR, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("routers.orders", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_sampling_filter_limits_repeated_messages_per_window():
+    sampling = SamplingFilter(window_seconds=60, burst=2)
+    results = [sampling.filter(_record("Sepet hatası: %s", i)) for i in range(5)]
+    assert results == [True, True, False, False, False]
+    assert sampling.filter(_record("Başka hata: %s", 1))  # Farklı şablon ayrı sayılır
+    assert sampling.filter(_record("Sepet hatası: %s", 9, level=logging.INFO))  # INFO örneklenmez
+
+    sampling._windows[("routers.orders", "Sepet hatası: %s")][0] -= 60  # Pencere doldu
+    record = _record("Sepet hatası: %s", 10)
+    assert sampling.filter(record) and record.suppressed == 3
+
+def test_queue_handler_formats_json_off_thread_and_drops_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record("Sipariş hatası: %s", "boom", order_id="o1"))
+    handler.handle(_record("Sipariş hatası: %s", "ikinci"))
+    assert handler.dropped == 1
+
+    queued = handler.queue.get_nowait()
+    entry = json.loads(JsonFormatter().format(queued))
+    assert entry["message"] == "Sipariş hatası: boom"
+    assert entry["level"] == "ERROR" and entry["logger"] == "routers.orders" and entry["order_id"] == "o1"
+
+def test_parse_log_levels():
+    assert parse_log_levels(" routers.products=debug, utils=WARNING,bozuk") == {"routers.products": "DEBUG", "utils": "WARNING"}
+
+def test_setup_logging_restarts_listener_after_shutdown():
+    """Uygulama aynı process'te yeniden başlatılırsa yazıcı thread'i tekrar kurulur."""
+    was_running = log._listener is not None
+    setup_logging()
+    shutdown_logging()
+    assert log._listener is None
+
+    setup_logging()
+    assert log._listener is not None and log._listener._thread is not None
+    if not was_running:
+        shutdown_logging()
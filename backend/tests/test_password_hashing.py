@@ -0,0 +1,26 @@
+# backend/tests/test_password_hashing.py
+import asyncio
+import pytest
+from passlib.context import CryptContext
+
+from utils.password_hashing import PasswordHasher, PasswordHasherBusy
+
+@pytest.mark.asyncio
+async def test_verify_and_update_rehashes_when_rounds_change():
+    """Eski maliyetle üretilmiş hash doğrulanınca yeni maliyetle hash döner."""
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret1")
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=5), max_workers=1, max_pending=4)
+
+    is_valid, new_hash = await hasher.verify_and_update("secret1", old_hash)
+    assert is_valid and new_hash.startswith("$2b$05$")
+    assert await hasher.verify_and_update("wrong", old_hash) == (False, None)
+    hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_hasher_rejects_when_queue_is_full():
+    """Çalışan + bekleyen işlem sınırı aşılınca PasswordHasherBusy fırlatılır."""
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=6), max_workers=1, max_pending=2)
+    results = await asyncio.gather(*(hasher.hash("secret1") for _ in range(4)), return_exceptions=True)
+    assert sum(isinstance(result, PasswordHasherBusy) for result in results) == 2
+    assert hasher.pending == 0
+    hasher.shutdown()
@@ -0,0 +1,62 @@
+# backend/tests/test_pricing.py
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+
+from utils.pricing import PricingConfig, price_cart, price_carts, calculate_discount
+
+CONFIG = PricingConfig(tax_percent=18, free_shipping_threshold=300, shipping_cost=29.90)
+
+def _product(price, stock=10, sale_price=None):
+    return {"_id": ObjectId(), "name": "Elbise", "slug": "elbise", "price": price, "salePrice": sale_price,
+            "variants": [{"sku": "SKU-1", "size": "M", "colorName": "Siyah", "colorHex": "#000000", "stock": stock}]}
+
+def _campaign(**overrides):
+    now = datetime.now(timezone.utc)
+    campaign = {"_id": ObjectId(), "code": "YUZDE10", "isActive": True, "discountType": "percentage",
+                "discountValue": 10, "startDate": now - timedelta(days=1), "endDate": now + timedelta(days=1)}
+    campaign.update(overrides)
+    return campaign
+
+def test_price_cart_totals_use_decimal_rounding():
+    """Ara toplam, KDV ve kargo kuruş hassasiyetinde hesaplanır."""
+    product = _product(0.1, sale_price=None)
+    cart = {"items": [{"product": product["_id"], "variantSku": "SKU-1", "quantity": 3}]}
+    priced = price_cart(cart, {product["_id"]: product}, config=CONFIG)
+    assert priced["subtotal"] == 0.3  # float ile 0.30000000000000004 olurdu
+    assert priced["taxAmount"] == 0.05
+    assert priced["shippingCost"] == 29.9
+    assert priced["total"] == 30.25
+
+def test_price_cart_clamps_quantity_and_drops_unavailable_items():
+    product = _product(100, stock=2)
+    cart = {"items": [
+        {"product": product["_id"], "variantSku": "SKU-1", "quantity": 5},
+        {"product": ObjectId(), "variantSku": "SKU-X", "quantity": 1},
+    ]}
+    priced = price_cart(cart, {product["_id"]: product}, config=CONFIG)
+    assert len(priced["items"]) == 1
+    assert priced["items"][0]["quantity"] == 2
+    assert priced["subtotal"] == 200
+
+def test_price_cart_applies_open_campaign_only():
+    product = _product(500, sale_price=400)
+    cart = {"items": [{"product": product["_id"], "variantSku": "SKU-1", "quantity": 1}]}
+    priced = price_cart(cart, {product["_id"]: product}, _campaign(maxDiscount=25), config=CONFIG)
+    assert priced["discountAmount"] == 25
+    assert priced["campaign"]["code"] == "YUZDE10"
+
+    expired = _campaign(endDate=datetime.now(timezone.utc) - timedelta(hours=1))
+    priced = price_cart(cart, {product["_id"]: product}, expired, config=CONFIG)
+    assert priced["discountAmount"] == 0 and priced["campaign"] is None
+
+def test_fixed_discount_never_exceeds_subtotal():
+    assert calculate_discount({"discountType": "fixed_amount", "discountValue": 150}, 100) == 100
+
+def test_price_carts_batch():
+    product = _product(50)
+    campaign = _campaign()
+    carts = [{"items": [{"product": product["_id"], "variantSku": "SKU-1", "quantity": qty}], "campaign": {"id": campaign["_id"]}}
+             for qty in (1, 2, 3)]
+    priced = price_carts(carts, {product["_id"]: product}, {campaign["_id"]: campaign}, config=CONFIG)
+    assert [p["subtotal"] for p in priced] == [50, 100, 150]
+    assert [p["discountAmount"] for p in priced] == [5, 10, 15]
@@ -0,0 +1,72 @@
+# backend/tests/test_request_metrics.py
+from types import SimpleNamespace
+import asyncio
+import contextvars
+
+from fastapi import FastAPI
+import httpx
+
+from utils.request_metrics import DbCommandListener, MetricsRegistry, RequestMetricsMiddleware, client_in_networks
+
+def _emit(listener: DbCommandListener, request_id: int, command: dict, reply: dict, micros: int):
+    name = next(iter(command))
+    listener.started(SimpleNamespace(command=command, command_name=name, connection_id=("db", 27017), request_id=request_id))
+    listener.succeeded(SimpleNamespace(command_name=name, connection_id=("db", 27017), request_id=request_id,
+                                       reply=reply, duration_micros=micros))
+
+def _build_app(registry: MetricsRegistry, listener: DbCommandListener) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware, registry=registry)
+
+    @app.get("/products/{slug}")
+    async def product(slug: str):
+        # Motor gibi: komut olayları context kopyalanmış executor thread'inde üretilir
+        context = contextvars.copy_context()
+        for request_id in range(3):
+            await asyncio.get_running_loop().run_in_executor(
+                None, context.run, _emit, listener, request_id,
+                {"find": "products"}, {"cursor": {"firstBatch": [{}, {}]}}, 1500,
+            )
+        return {"slug": slug}
+
+    return app
+
+async def test_request_metrics_attributes_commands_to_route():
+    registry = MetricsRegistry(db_call_threshold=2)
+    listener = DbCommandListener(registry)
+    app = _build_app(registry, listener)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/products/elbise-1")
+    _emit(listener, 99, {"update": "products"}, {"n": 1}, 500)  # İstek dışı (arka plan) komutu
+
+    timing = response.headers["server-timing"]
+    assert 'db;dur=4.5;desc="3 calls, 6 docs"' in timing and 'db1;dur=1.5;desc="find products (2)"' in timing
+
+    metrics = registry.render()
+    assert 'http_request_db_calls_count{method="GET",route="/products/{slug}"} 1' in metrics
+    assert 'http_request_db_calls_bucket{method="GET",route="/products/{slug}",le="3"} 1' in metrics
+    assert 'http_requests_db_calls_exceeded_total{method="GET",route="/products/{slug}"} 1' in metrics
+    assert 'mongo_commands_total{command="find",collection="products"} 3' in metrics
+    assert 'mongo_commands_total{command="update",collection="products"} 1' in metrics
+
+async def test_request_metrics_groups_unmatched_paths():
+    registry = MetricsRegistry(db_call_threshold=0)
+    app = _build_app(registry, DbCommandListener(registry))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for path in ("/yok-1", "/yok-2"):
+            assert (await client.get(path)).status_code == 404
+
+    metrics = registry.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 2' in metrics
+    assert "http_requests_db_calls_exceeded_total{" not in metrics
+
+def test_metrics_allow_list_matches_cidr_networks():
+    networks = ["127.0.0.1/32", "::1/128", "10.20.0.0/16"]
+    assert client_in_networks("127.0.0.1", networks)
+    assert client_in_networks("::1", networks)
+    assert client_in_networks("10.20.3.4", networks)
+    assert not client_in_networks("203.0.113.7", networks)
+    assert not client_in_networks("testclient", networks)  # Adres olmayan host
+    assert not client_in_networks(None, networks)
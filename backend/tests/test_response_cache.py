@@ -0,0 +1,55 @@
+# backend/tests/test_response_cache.py
+import asyncio
+import pytest
+
+from utils.response_cache import ResponseCache, MemoryCacheBackend, CACHE_HIT, CACHE_STALE, CACHE_MISS
+
+def _counting_render(counter: dict):
+    async def render() -> bytes:
+        counter["calls"] += 1
+        return f'{{"n":{counter["calls"]}}}'.encode("utf-8")
+    return render
+
+@pytest.mark.asyncio
+async def test_response_cache_hit_and_invalidate():
+    """İkinci istek önbellekten döner, invalidate sonrası yeniden hesaplanır."""
+    cache = ResponseCache("test", MemoryCacheBackend(max_entries=10), fresh_seconds=60, stale_seconds=60)
+    counter = {"calls": 0}
+    key = cache.make_key({"page": 1})
+
+    entry, cache_status = await cache.get_or_render(key, _counting_render(counter))
+    assert cache_status == CACHE_MISS and entry.body == b'{"n":1}'
+    entry, cache_status = await cache.get_or_render(key, _counting_render(counter))
+    assert cache_status == CACHE_HIT and counter["calls"] == 1
+
+    await cache.invalidate()
+    entry, cache_status = await cache.get_or_render(key, _counting_render(counter))
+    assert cache_status == CACHE_MISS and entry.body == b'{"n":2}'
+
+@pytest.mark.asyncio
+async def test_response_cache_serves_stale_and_refreshes():
+    """Bayat girdi hemen döner ve arka planda yenilenir."""
+    cache = ResponseCache("test", MemoryCacheBackend(max_entries=10), fresh_seconds=0, stale_seconds=60)
+    counter = {"calls": 0}
+    key = cache.make_key({"page": 1})
+
+    await cache.get_or_render(key, _counting_render(counter))
+    entry, cache_status = await cache.get_or_render(key, _counting_render(counter))
+    assert cache_status == CACHE_STALE and entry.body == b'{"n":1}'
+    await asyncio.sleep(0)  # Arka plan yenilemesi tamamlansın
+    entry, _ = await cache.get_or_render(key, _counting_render(counter))
+    assert entry.body in (b'{"n":2}', b'{"n":3}')
+
+@pytest.mark.asyncio
+async def test_memory_backend_clear_only_removes_namespace():
+    """Paylaşılan bellek backend'inde invalidate sadece kendi namespace'ini siler."""
+    backend = MemoryCacheBackend(max_entries=10)
+    products = ResponseCache("products", backend, fresh_seconds=60, stale_seconds=60)
+    categories = ResponseCache("categories", backend, fresh_seconds=60, stale_seconds=60)
+    counter = {"calls": 0}
+    await products.get_or_render("k", _counting_render(counter))
+    await categories.get_or_render("k", _counting_render(counter))
+
+    await products.invalidate()
+    assert (await categories.get_or_render("k", _counting_render(counter)))[1] == CACHE_HIT
+    assert (await products.get_or_render("k", _counting_render(counter)))[1] == CACHE_MISS
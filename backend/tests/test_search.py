@@ -0,0 +1,21 @@
+# backend/tests/test_search.py
+from utils.search import fold_text, tokenize, build_search_fields, parse_search_query, build_search_filter
+
+def test_fold_text_turkish_characters():
+    """Türkçe karakterlerin sadeleştirildiğini test eder."""
+    assert fold_text("Çiçek Desenli ŞIK Gömlek ılık") == "cicek desenli sik gomlek ilik"
+
+def test_build_search_fields():
+    """İsim/etiket ve açıklama kelimelerinin ayrı ayrı saklandığını test eder."""
+    fields = build_search_fields({"name": "Kırmızı Elbise", "tags": ["yazlık"], "description": "Kırmızı, şık bir elbise"})
+    assert fields["searchNameTokens"] == ["kirmizi", "elbise", "yazlik"]
+    assert fields["searchTokens"] == ["kirmizi", "elbise", "yazlik", "sik", "bir"]
+
+def test_search_filter_escapes_user_input():
+    """Kullanıcı girdisinin regex olarak yorumlanmadığını test eder."""
+    terms = parse_search_query("elb.* (")
+    assert terms == ["elb"]
+    assert build_search_filter(terms) == {"$and": [{"searchTokens": {"$regex": "^elb"}}]}
+
+def test_tokenize_drops_short_tokens():
+    assert tokenize("a bc d") == ["bc"]
@@ -0,0 +1,53 @@
+# backend/tests/test_sequences.py
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from routers import orders
+from utils.sequences import SequenceAllocator
+
+@pytest.mark.asyncio
+async def test_concurrent_numbers_are_unique_and_sequential(test_db: AsyncIOMotorDatabase):
+    """Tek tek ayırmada eşzamanlı istekler 1..n aralığını boşluksuz paylaşır."""
+    allocator = SequenceAllocator()
+    numbers = await asyncio.gather(*(allocator.next(test_db, "test:a") for _ in range(20)))
+    assert sorted(numbers) == list(range(1, 21))
+
+@pytest.mark.asyncio
+async def test_block_mode_workers_never_overlap(test_db: AsyncIOMotorDatabase):
+    """Blok modunda her worker kendi aralığından verir; numaralar çakışmaz."""
+    worker_a, worker_b = SequenceAllocator(block_size=5), SequenceAllocator(block_size=5)
+    numbers_a = [await worker_a.next(test_db, "test:b") for _ in range(3)]
+    numbers_b = [await worker_b.next(test_db, "test:b") for _ in range(3)]
+    numbers_a += [await worker_a.next(test_db, "test:b") for _ in range(4)]
+
+    assert numbers_a == [1, 2, 3, 4, 5, 11, 12]
+    assert numbers_b == [6, 7, 8]
+    assert (await test_db["counters"].find_one({"_id": "test:b"}))["seq"] == 15
+
+@pytest.mark.asyncio
+async def test_seed_starts_after_existing_numbers(test_db: AsyncIOMotorDatabase):
+    """Seed, sayacı ilk kullanımdan önce yükseltir; sayaç öndeyse geri almaz."""
+    allocator = SequenceAllocator()
+
+    async def seed():
+        return 7
+
+    assert await allocator.next(test_db, "test:c", seed=seed) == 8
+    await test_db["counters"].update_one({"_id": "test:d"}, {"$set": {"seq": 20}}, upsert=True)
+    assert await SequenceAllocator(block_size=3).next(test_db, "test:d", seed=seed) == 21
+
+@pytest.mark.asyncio
+async def test_order_number_continues_after_same_day_orders(test_db: AsyncIOMotorDatabase, monkeypatch):
+    """Sayaçtan önce oluşturulmuş aynı günün siparişleri tekrar numaralandırılmaz."""
+    monkeypatch.setattr(orders, "order_number_sequence", SequenceAllocator())
+    date_str = datetime.now(timezone.utc).strftime('%y%m%d')
+    await test_db["orders"].insert_many([
+        {"orderNumber": f"DOVL-{date_str}-0001"},
+        {"orderNumber": f"DOVL-{date_str}-0003"},
+        {"orderNumber": "DOVL-000101-0099"},  # Başka günün numarası etkilemez
+    ])
+
+    assert await orders.generate_order_number(test_db) == f"DOVL-{date_str}-0004"
+    assert await orders.generate_order_number(test_db) == f"DOVL-{date_str}-0005"
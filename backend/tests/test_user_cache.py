@@ -0,0 +1,29 @@
+# backend/tests/test_user_cache.py
+from utils.user_cache import UserCache
+
+def test_user_cache_is_keyed_by_token_and_returns_copies():
+    cache = UserCache(ttl_seconds=60, max_entries=10)
+    cache.set("u1", 100, {"_id": "u1", "addresses": []}, cache.generation("u1"))
+
+    assert cache.get("u1", 200) is None  # Farklı token kendi girdisini kullanır
+    user = cache.get("u1", 100)
+    user["addresses"].append({"title": "Ev"})
+    assert cache.get("u1", 100)["addresses"] == []
+
+def test_user_cache_invalidate_drops_all_tokens_and_in_flight_loads():
+    cache = UserCache(ttl_seconds=60, max_entries=10)
+    cache.set("u1", 100, {"_id": "u1"}, cache.generation("u1"))
+    cache.set("u1", 200, {"_id": "u1"}, cache.generation("u1"))
+    generation = cache.generation("u1")  # Yükleme başladı
+
+    cache.invalidate("u1")
+    cache.set("u1", 300, {"_id": "u1"}, generation)  # Eski yükleme önbelleğe yazılmaz
+    assert cache.get("u1", 100) is None and cache.get("u1", 200) is None and cache.get("u1", 300) is None
+
+def test_user_cache_evicts_least_recently_used():
+    cache = UserCache(ttl_seconds=60, max_entries=2)
+    for user_id in ("a", "b"):
+        cache.set(user_id, 1, {"_id": user_id}, 0)
+    cache.get("a", 1)
+    cache.set("c", 1, {"_id": "c"}, 0)
+    assert cache.get("b", 1) is None and cache.get("a", 1) is not None
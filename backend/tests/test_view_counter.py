@@ -0,0 +1,22 @@
+# backend/tests/test_view_counter.py
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from utils.view_counter import ViewCounter
+
+@pytest.mark.asyncio
+async def test_view_counter_flushes_batched_increments(test_db: AsyncIOMotorDatabase):
+    """Biriken görüntülenmelerin tek seferde $inc ile yazıldığını test eder."""
+    product_id = ObjectId()
+    await test_db["products"].insert_one({"_id": product_id, "viewCount": 2})
+
+    counter = ViewCounter(flush_interval_seconds=60, max_buffer_size=100)
+    for _ in range(3):
+        counter.record(product_id)
+    assert counter.pending_count == 1
+
+    assert await counter.flush(test_db) == 1
+    assert counter.pending_count == 0
+    product = await test_db["products"].find_one({"_id": product_id})
+    assert product["viewCount"] == 5
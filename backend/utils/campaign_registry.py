@@ -0,0 +1,160 @@
+# backend/utils/campaign_registry.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional
+import asyncio
+import logging
+import time
+
+from config import settings
+from utils.pricing import to_decimal
+from utils.campaign_usage import apply_usage_totals
+
+logger = logging.getLogger(__name__)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Mongo'dan gelen tarihler tz bilgisi taşımayabilir (UTC kabul edilir)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _id_set(values) -> FrozenSet[ObjectId]:
+    ids = set()
+    for value in values or []:
+        if isinstance(value, ObjectId):
+            ids.add(value)
+        elif isinstance(value, str) and ObjectId.is_valid(value):
+            ids.add(ObjectId(value))
+    return frozenset(ids)
+
+
+def _compile_product_predicate(campaign: dict) -> Callable[[dict], bool]:
+    """Kampanyanın ürün kapsamını küme üyeliğine dayalı tek bir fonksiyona derler."""
+    categories = _id_set(campaign.get("categories"))
+    products = _id_set(campaign.get("products"))
+    excluded_categories = _id_set(campaign.get("excludedCategories"))
+    excluded_products = _id_set(campaign.get("excludedProducts"))
+    applicable_to = campaign.get("applicableTo", "all_products")
+
+    def is_excluded(product: dict) -> bool:
+        return product.get("_id") in excluded_products or product.get("category") in excluded_categories
+
+    if applicable_to == "specific_categories" and categories:
+        return lambda product: not is_excluded(product) and product.get("category") in categories
+    if applicable_to == "specific_products" and products:
+        return lambda product: not is_excluded(product) and product.get("_id") in products
+    if excluded_categories or excluded_products:
+        return lambda product: not is_excluded(product)
+    return lambda product: True
+
+
+class CompiledCampaign:
+    """Kampanya belgesi ve önceden hesaplanmış geçerlilik kuralları (salt okunur)."""
+
+    def __init__(self, doc: dict):
+        self.doc = doc
+        self.id: ObjectId = doc["_id"]
+        self.code: str = doc.get("code", "")
+        self.is_active = bool(doc.get("isActive"))
+        self.start_date = _as_utc(doc.get("startDate"))
+        self.end_date = _as_utc(doc.get("endDate"))
+        self.min_purchase = to_decimal(doc.get("minPurchaseAmount"))
+        self.max_uses: Optional[int] = doc.get("maxUses")
+        self.restricts_products = doc.get("applicableTo", "all_products") != "all_products" or bool(
+            doc.get("excludedCategories") or doc.get("excludedProducts")
+        )
+        self.applies_to_product = _compile_product_predicate(doc)
+
+    def eligibility_error(self, now: datetime, subtotal=None, products: Optional[Iterable[dict]] = None) -> Optional[str]:
+        """
+        Kampanya uygulanamıyorsa kullanıcıya gösterilecek nedeni, uygulanabiliyorsa None döndürür.
+        subtotal/products verilmezse ilgili kontroller atlanır.
+        """
+        if not self.is_active:
+            return "Kampanya aktif değil."
+        if self.start_date and now < self.start_date:
+            return f"Bu kampanya henüz başlamadı. Başlangıç tarihi: {self.start_date.strftime('%d.%m.%Y')}"
+        if self.end_date and now > self.end_date:
+            return f"Bu kampanya süresi doldu. Bitiş tarihi: {self.end_date.strftime('%d.%m.%Y')}"
+        if self.max_uses is not None and self.doc.get("usageCount", 0) >= self.max_uses:
+            return f"Bu kampanya maksimum kullanım limitine ({self.max_uses}) ulaştı."
+        if subtotal is not None and self.min_purchase > 0 and to_decimal(subtotal) < self.min_purchase:
+            return (
+                f"Bu kampanya için minimum sepet tutarı {float(self.min_purchase):.2f} TL olmalıdır. "
+                f"Mevcut sepet tutarınız: {float(to_decimal(subtotal)):.2f} TL"
+            )
+        if products is not None and self.restricts_products and not any(self.applies_to_product(p) for p in products):
+            if self.doc.get("applicableTo") == "specific_categories":
+                return "Bu kampanya sadece belirli kategorilerdeki ürünler için geçerlidir."
+            return "Bu kampanya sepetinizdeki ürünler için geçerli değil."
+        return None
+
+
+class CampaignSnapshot:
+    """Tüm kampanyaların kod ve ID ile erişilen bellek kopyası."""
+
+    def __init__(self, campaigns_raw: List[dict]):
+        self.by_id: Dict[ObjectId, CompiledCampaign] = {}
+        self.by_code: Dict[str, CompiledCampaign] = {}
+        for campaign_raw in campaigns_raw:
+            try:
+                compiled = CompiledCampaign(campaign_raw)
+            except Exception as e:
+                logger.error("Kampanya derlenemedi (%s): %s", campaign_raw.get("_id"), e)
+                continue
+            self.by_id[compiled.id] = compiled
+            if compiled.code:
+                self.by_code[compiled.code.upper()] = compiled
+
+    def get(self, campaign_id) -> Optional[CompiledCampaign]:
+        if isinstance(campaign_id, str) and ObjectId.is_valid(campaign_id):
+            campaign_id = ObjectId(campaign_id)
+        return self.by_id.get(campaign_id)
+
+    def get_by_code(self, code: str) -> Optional[CompiledCampaign]:
+        return self.by_code.get((code or "").upper().strip())
+
+
+class CampaignRegistry:
+    """
+    Kampanyaları TTL süresince bellekte tutar; sepet fiyatlandırması ve kupon
+    kontrolleri veritabanına gitmez. Kampanya CRUD işlemleri invalidate() ile
+    önbelleği anında geçersiz kılar, diğer worker'lar TTL sonunda yeniler.
+    Parçalı sayaçlı kampanyaların usageCount'u yüklemede parçalardan toplanır; kullanım
+    sayısı TTL kadar eski olabilir, kesin limit kontrolü sipariş kaydında yapılır.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[CampaignSnapshot] = None
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self, db: AsyncIOMotorDatabase) -> CampaignSnapshot:
+        if self._snapshot is not None and self._expires_at > time.monotonic():
+            return self._snapshot
+        async with self._lock:
+            # Kilidi beklerken başka bir istek yüklemiş olabilir
+            if self._snapshot is not None and self._expires_at > time.monotonic():
+                return self._snapshot
+            version = self._version
+            campaigns_raw = await db["campaigns"].find({}).to_list(length=None)
+            await apply_usage_totals(db, campaigns_raw)  # Limit kontrolü parçalı kullanımı da görsün
+            snapshot = CampaignSnapshot(campaigns_raw)
+            # Yükleme sırasında invalidate edildiyse bu kopyayı önbelleğe yazma
+            if version == self._version:
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return snapshot
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._snapshot = None
+        self._expires_at = 0.0
+
+
+campaign_registry = CampaignRegistry(ttl_seconds=settings.CAMPAIGN_CACHE_TTL_SECONDS)
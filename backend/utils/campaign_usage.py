@@ -0,0 +1,207 @@
+# backend/utils/campaign_usage.py
+"""
+Kampanya kullanım sayacı. Kullanım sipariş kaydı sırasında ayrılır:
+- Toplam limit: belgedeki maxUses ile koşullu $inc ($expr: usageCount < maxUses), limit aşılamaz ve artışlar kaybolmaz.
+- Müşteri başına limit: campaign_redemptions koleksiyonunda (kampanya, müşteri) başına tek belge;
+  belge $setOnInsert ile oluşturulur (eşzamanlı ilk kullanımlarda tek belgeyi
+  campaign_redemptions_campaign_customer_unique index'i sağlar), sayaç upsert'süz koşullu $inc ile artırılır.
+- usageShards > 1 olan kampanyalarda (flash indirim kodları) sayaç N parçaya bölünür;
+  her parça limitin bir kısmını (limit alanı) taşır, yoğun anlarda yazmalar tek belgede birikmez.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from typing import Dict, List, Optional
+import random
+
+
+class CampaignUsageError(Exception):
+    """Kampanya kullanım limiti dolduğunda fırlatılır (mesaj kullanıcıya gösterilebilir)."""
+    pass
+
+
+class CampaignUsageReservation:
+    """Ayrılan kullanım (sipariş kaydedilemezse release_campaign_usage ile geri verilir)."""
+
+    def __init__(self, campaign_id: ObjectId):
+        self.campaign_id = campaign_id
+        self.counted = False  # campaigns.usageCount artırıldı
+        self.shard_id: Optional[str] = None  # Parçalı sayaçta artırılan parça
+        self.customer: Optional[str] = None  # Müşteri sayacı artırıldı
+
+
+def customer_key(user_id=None, email: Optional[str] = None) -> Optional[str]:
+    """Müşteri başına limit anahtarı: kayıtlı kullanıcıda ID, misafirde e-posta."""
+    if user_id:
+        return f"user:{user_id}"
+    if email:
+        return f"email:{email.strip().lower()}"
+    return None
+
+
+def split_evenly(total: int, parts: int) -> List[int]:
+    """total'i parts parçaya böler, artan ilk parçalara dağıtılır (a <= b ise her parça için de a_i <= b_i)."""
+    base, remainder = divmod(total, parts)
+    return [base + (1 if index < remainder else 0) for index in range(parts)]
+
+
+def _shard_id(campaign_id: ObjectId, index: int) -> str:
+    return f"{campaign_id}:{index}"
+
+
+def _shard_count(campaign: dict) -> int:
+    return max(1, int(campaign.get("usageShards") or 1))
+
+
+async def ensure_usage_shards(db: AsyncIOMotorDatabase, campaign: dict) -> None:
+    """
+    Parçalı sayaç belgelerini kampanyanın güncel limit ve parça sayısına göre hazırlar.
+    Kullanım, parçalı sayaçta campaigns.usageCount yerine parçalarda tutulur; parça sayısı
+    değişince mevcut kullanım yeni parçalara limitlerle aynı oranda dağıtılır. Bu işlem
+    eşzamanlı kullanımlarla atomik değildir, kampanya yayındayken yapılmamalıdır.
+    """
+    shards_collection = db["campaign_usage_shards"]
+    campaign_id = campaign["_id"]
+    shard_count = _shard_count(campaign)
+
+    sharded_used = 0
+    async for shard in shards_collection.find({"campaign": campaign_id}, {"count": 1}):
+        sharded_used += shard.get("count", 0)
+
+    if shard_count == 1:
+        # Parçalı sayaçtan tek sayaca dönüş: kullanım campaigns.usageCount'a aktarılır
+        if sharded_used:
+            await db["campaigns"].update_one({"_id": campaign_id}, {"$inc": {"usageCount": sharded_used}})
+        await shards_collection.delete_many({"campaign": campaign_id})
+        return
+
+    used = campaign.get("usageCount", 0) + sharded_used
+    counts = split_evenly(used, shard_count)
+    max_uses = campaign.get("maxUses")
+    limits = split_evenly(max_uses, shard_count) if max_uses is not None else [None] * shard_count
+
+    operations = [
+        UpdateOne(
+            {"_id": _shard_id(campaign_id, index)},
+            {"$set": {"campaign": campaign_id, "shard": index, "count": counts[index], "limit": limits[index]}},
+            upsert=True,
+        )
+        for index in range(shard_count)
+    ]
+    await shards_collection.bulk_write(operations, ordered=False)
+    await shards_collection.delete_many({"campaign": campaign_id, "shard": {"$gte": shard_count}})
+    await db["campaigns"].update_one({"_id": campaign_id}, {"$set": {"usageCount": 0}})
+
+
+async def _reserve_shard(db: AsyncIOMotorDatabase, campaign: dict) -> Optional[str]:
+    """
+    Rastgele bir parçadan başlayarak limiti dolmamış ilk parçayı artırır. Limit, parça
+    belgesinde saklanan değerdir (ensure_usage_shards yazar); önbellekteki kampanyanın
+    maxUses'u eski olabileceği için kullanılmaz.
+    """
+    shards_collection = db["campaign_usage_shards"]
+    shard_count = _shard_count(campaign)
+    open_shard = {"$or": [{"limit": None}, {"$expr": {"$lt": ["$count", "$limit"]}}]}
+
+    start = random.randrange(shard_count)
+    for offset in range(shard_count):
+        index = (start + offset) % shard_count
+        shard = await shards_collection.find_one_and_update(
+            {"_id": _shard_id(campaign["_id"], index), **open_shard},
+            {"$inc": {"count": 1}},
+            projection={"_id": 1},
+        )
+        if shard:
+            return shard["_id"]
+    return None
+
+
+async def reserve_campaign_usage(db: AsyncIOMotorDatabase, campaign: dict, customer: Optional[str]) -> CampaignUsageReservation:
+    """
+    Kampanya için bir kullanım ayırır; toplam veya müşteri limiti doluysa CampaignUsageError fırlatır.
+    campaign: kampanya belgesi (önbellekten gelebilir; limitler veritabanındaki güncel
+    değerlerle uygulanır, admin değişikliği diğer worker'ların önbelleğini beklemez).
+    """
+    campaign = await db["campaigns"].find_one(
+        {"_id": campaign["_id"]}, {"maxUses": 1, "usagePerCustomer": 1, "usageShards": 1}
+    )
+    if campaign is None:
+        raise CampaignUsageError("Kampanya artık geçerli değil.")
+    reservation = CampaignUsageReservation(campaign["_id"])
+    per_customer = campaign.get("usagePerCustomer") or 0
+
+    # 1) Müşteri başına limit: önce (kampanya, müşteri) belgesi oluşturulur, sonra limit altındaysa artırılır
+    if customer:
+        redemptions_collection = db["campaign_redemptions"]
+        redemption_key = {"campaign": campaign["_id"], "customer": customer}
+        await redemptions_collection.update_one(redemption_key, {"$setOnInsert": {"count": 0}}, upsert=True)
+        redemption_filter = dict(redemption_key)
+        if per_customer > 0:
+            redemption_filter["count"] = {"$lt": per_customer}
+        result = await redemptions_collection.update_one(
+            redemption_filter,
+            {"$inc": {"count": 1}, "$set": {"lastUsedAt": datetime.now(timezone.utc)}},
+        )
+        if not result.modified_count:
+            raise CampaignUsageError(f"Bu kampanyayı maksimum {per_customer} kez kullanabilirsiniz.")
+        reservation.customer = customer
+
+    # 2) Toplam limit
+    try:
+        if _shard_count(campaign) > 1:
+            reservation.shard_id = await _reserve_shard(db, campaign)
+            reserved = reservation.shard_id is not None
+        else:
+            # Limit belgedeki değerle karşılaştırılır (okuma ile artırma arasında değişse de)
+            campaign_filter = {
+                "_id": campaign["_id"],
+                "$or": [{"maxUses": None}, {"$expr": {"$lt": ["$usageCount", "$maxUses"]}}],
+            }
+            reserved = await db["campaigns"].find_one_and_update(
+                campaign_filter, {"$inc": {"usageCount": 1}}, projection={"_id": 1}
+            ) is not None
+            reservation.counted = reserved
+        if not reserved:
+            raise CampaignUsageError(f"Bu kampanya maksimum kullanım limitine ({campaign.get('maxUses')}) ulaştı.")
+    except Exception:
+        await release_campaign_usage(db, reservation)
+        raise
+    return reservation
+
+
+async def release_campaign_usage(db: AsyncIOMotorDatabase, reservation: Optional[CampaignUsageReservation]) -> None:
+    """Ayrılan kullanımı geri verir (sipariş kaydedilemediğinde)."""
+    if reservation is None:
+        return
+    if reservation.shard_id:
+        await db["campaign_usage_shards"].update_one({"_id": reservation.shard_id}, {"$inc": {"count": -1}})
+    elif reservation.counted:
+        await db["campaigns"].update_one({"_id": reservation.campaign_id}, {"$inc": {"usageCount": -1}})
+    if reservation.customer:
+        await db["campaign_redemptions"].update_one(
+            {"campaign": reservation.campaign_id, "customer": reservation.customer}, {"$inc": {"count": -1}}
+        )
+
+
+async def customer_usage_count(db: AsyncIOMotorDatabase, campaign_id: ObjectId, customer: Optional[str]) -> int:
+    """Müşterinin bu kampanyayı kaç kez kullandığı."""
+    if not customer:
+        return 0
+    redemption = await db["campaign_redemptions"].find_one({"campaign": campaign_id, "customer": customer}, {"count": 1})
+    return redemption.get("count", 0) if redemption else 0
+
+
+async def apply_usage_totals(db: AsyncIOMotorDatabase, campaigns: List[dict]) -> None:
+    """Parçalı sayaçlı kampanyaların usageCount alanına parçalardaki kullanımı ekler (yanıtlar için)."""
+    campaign_ids = [campaign["_id"] for campaign in campaigns if _shard_count(campaign) > 1]
+    if not campaign_ids:
+        return
+    pipeline = [
+        {"$match": {"campaign": {"$in": campaign_ids}}},
+        {"$group": {"_id": "$campaign", "count": {"$sum": "$count"}}},
+    ]
+    totals: Dict[ObjectId, int] = {group["_id"]: group["count"] async for group in db["campaign_usage_shards"].aggregate(pipeline)}
+    for campaign in campaigns:
+        if campaign["_id"] in totals:
+            campaign["usageCount"] = campaign.get("usageCount", 0) + totals[campaign["_id"]]
@@ -0,0 +1,80 @@
+# backend/utils/cart_sweeper.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import asyncio
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CartSweeper:
+    """
+    Terk edilmiş misafir sepetlerini periyodik olarak temizler:
+    - Boş misafir sepetleri empty_ttl sonra,
+    - Diğer misafir sepetleri abandoned_ttl boyunca güncellenmezse silinir.
+    Kullanıcı sepetlerine dokunulmaz. Terk edilmiş sepetler için 'carts_guest_ttl'
+    TTL index'i de aynı işi yapar; süpürücü index yokken de çalışır ve silinen
+    belge sayılarını raporlar.
+    """
+
+    def __init__(self, interval_seconds: float, empty_ttl: timedelta, abandoned_ttl: timedelta):
+        self.interval_seconds = interval_seconds
+        self.empty_ttl = empty_ttl
+        self.abandoned_ttl = abandoned_ttl
+        self._task: Optional[asyncio.Task] = None
+        self._stop_requested = asyncio.Event()
+
+    async def sweep(self, db: AsyncIOMotorDatabase, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Tek bir temizlik turu çalıştırır ve silinen sepet sayılarını döndürür."""
+        now = now or datetime.now(timezone.utc)
+        carts_collection = db["carts"]
+        guest_filter = {"sessionId": {"$type": "string"}}
+
+        empty_result = await carts_collection.delete_many({
+            **guest_filter,
+            "items": {"$size": 0},
+            "updatedAt": {"$lt": now - self.empty_ttl},
+        })
+        abandoned_result = await carts_collection.delete_many({
+            **guest_filter,
+            "updatedAt": {"$lt": now - self.abandoned_ttl},
+        })
+        return {"empty": empty_result.deleted_count, "abandoned": abandoned_result.deleted_count}
+
+    async def _run(self, db: AsyncIOMotorDatabase) -> None:
+        while not self._stop_requested.is_set():
+            try:
+                report = await self.sweep(db)
+                if report["empty"] or report["abandoned"]:
+                    logger.info("Misafir sepetleri temizlendi: %d boş, %d terk edilmiş", report["empty"], report["abandoned"])
+            except Exception as e:
+                logger.error("Sepet temizliği sırasında hata: %s", e)
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, db: AsyncIOMotorDatabase) -> None:
+        """Arka plan temizlik görevini başlatır (lifespan içinde çağrılır)."""
+        if self.interval_seconds <= 0:
+            return  # 0 veya negatif aralık: süpürücü kapalı (sadece TTL index)
+        if self._task is None or self._task.done():
+            self._stop_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        """Arka plan görevini, devam eden silme işleminin bitmesini bekleyerek durdurur."""
+        if self._task is not None:
+            self._stop_requested.set()
+            await self._task
+            self._task = None
+
+
+cart_sweeper = CartSweeper(
+    interval_seconds=settings.CART_SWEEP_INTERVAL_MINUTES * 60,
+    empty_ttl=timedelta(hours=settings.EMPTY_GUEST_CART_TTL_HOURS),
+    abandoned_ttl=timedelta(days=settings.GUEST_CART_TTL_DAYS),
+)
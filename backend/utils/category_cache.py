@@ -0,0 +1,138 @@
+# backend/utils/category_cache.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import ReadPreference
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from config import settings
+from models.category_models import Category
+from utils.category_tree import compute_ancestors
+
+logger = logging.getLogger(__name__)
+
+
+def _to_public(category_raw: dict) -> dict:
+    """ObjectId alanlarını string'e çevrilmiş bir kopya döndürür."""
+    public = dict(category_raw)
+    public['_id'] = str(public['_id'])
+    if public.get('parentCategory') and isinstance(public['parentCategory'], ObjectId):
+        public['parentCategory'] = str(public['parentCategory'])
+    public['ancestors'] = [str(ancestor_id) for ancestor_id in public.get('ancestors') or []]
+    return public
+
+
+class CategorySnapshot:
+    """Kategori ağacının belirli bir andaki, salt okunur kopyası."""
+
+    def __init__(self, categories_raw: List[dict]):
+        self.by_id: Dict[ObjectId, dict] = {}
+        self.by_slug: Dict[str, dict] = {}
+        self.public_by_id: Dict[ObjectId, dict] = {}
+        self.all_models: List[Category] = []
+        self.active_models: List[Category] = []
+        self.descendants: Dict[ObjectId, List[ObjectId]] = {}  # kategori -> tüm alt kategoriler
+
+        parents = {cat_raw['_id']: cat_raw.get('parentCategory') for cat_raw in categories_raw if '_id' in cat_raw}
+        self.ancestors: Dict[ObjectId, List[ObjectId]] = {}
+
+        for cat_raw in categories_raw:
+            if '_id' not in cat_raw:
+                logger.warning("Hatalı kategori verisi - '_id' alanı yok", extra={"slug": cat_raw.get("slug")})
+                continue
+            public = _to_public(cat_raw)
+            try:
+                category = Category.model_validate(public)
+            except Exception as validation_error:
+                logger.warning("Kategori modeli doğrulama hatası: %s", validation_error, extra={"category_id": cat_raw.get("_id")})
+                continue
+
+            self.by_id[cat_raw['_id']] = cat_raw
+            # Yol önceden hesaplanmamışsa (eski veri) parentCategory zincirinden çıkarılır
+            ancestors = cat_raw.get('ancestors')
+            if ancestors is None:
+                ancestors = compute_ancestors(cat_raw['_id'], parents)
+            self.ancestors[cat_raw['_id']] = ancestors
+            for ancestor_id in ancestors:
+                self.descendants.setdefault(ancestor_id, []).append(cat_raw['_id'])
+            if cat_raw.get('slug'):
+                self.by_slug[cat_raw['slug']] = cat_raw
+            self.public_by_id[cat_raw['_id']] = public
+            self.all_models.append(category)
+            if cat_raw.get('isActive'):
+                self.active_models.append(category)
+
+    def resolve(self, category_id_or_slug: str, active_only: bool = True) -> Optional[dict]:
+        """ID veya slug ile kategoriyi bulur (DB'ye gitmeden)."""
+        category_doc = None
+        if ObjectId.is_valid(category_id_or_slug):
+            category_doc = self.by_id.get(ObjectId(category_id_or_slug))
+        if not category_doc:
+            category_doc = self.by_slug.get(category_id_or_slug)
+        if category_doc and active_only and not category_doc.get('isActive'):
+            return None
+        return category_doc
+
+    def subtree_ids(self, category_id: ObjectId, active_only: bool = True) -> List[ObjectId]:
+        """
+        Kategori ve tüm alt kategorilerinin ID'leri (tek bir $in sorgusu için).
+        active_only ise pasif kategoriler ve onların altındakiler dahil edilmez.
+        """
+        ids = [category_id]
+        for descendant_id in self.descendants.get(category_id, []):
+            if active_only:
+                path = self.ancestors.get(descendant_id, [])
+                below = path[path.index(category_id) + 1:] if category_id in path else []
+                if not all(self.by_id.get(cid, {}).get('isActive') for cid in below + [descendant_id]):
+                    continue
+            ids.append(descendant_id)
+        return ids
+
+    def public_details(self, category_id) -> Optional[dict]:
+        """Ürün detayındaki category_details için JSON'a uygun kategori verisi."""
+        if isinstance(category_id, str) and ObjectId.is_valid(category_id):
+            category_id = ObjectId(category_id)
+        return self.public_by_id.get(category_id)
+
+
+class CategoryCache:
+    """
+    Tüm kategori ağacını TTL süresince bellekte tutar.
+    Kategori CRUD işlemleri invalidate() ile önbelleği anında geçersiz kılar.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[CategorySnapshot] = None
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self, db: AsyncIOMotorDatabase) -> CategorySnapshot:
+        if self._snapshot is not None and self._expires_at > time.monotonic():
+            return self._snapshot
+        async with self._lock:
+            # Kilidi beklerken başka bir istek yüklemiş olabilir
+            if self._snapshot is not None and self._expires_at > time.monotonic():
+                return self._snapshot
+            version = self._version
+            # Katalog veritabanı secondaryPreferred olabilir; önbellek TTL boyunca tutulacağı
+            # için (invalidate sonrası eski kopya yüklenmesin) her zaman primary'den okunur
+            categories = db.get_collection("categories", read_preference=ReadPreference.PRIMARY)
+            cursor = categories.find({}).sort([("order", 1), ("name", 1)])
+            snapshot = CategorySnapshot(await cursor.to_list(length=None))
+            # Yükleme sırasında invalidate edildiyse bu kopyayı önbelleğe yazma
+            if version == self._version:
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return snapshot
+
+    def invalidate(self) -> None:
+        self._version += 1
+        self._snapshot = None
+        self._expires_at = 0.0
+
+
+category_cache = CategoryCache(ttl_seconds=settings.CATEGORY_CACHE_TTL_SECONDS)
@@ -0,0 +1,97 @@
+# backend/utils/category_tree.py
+"""
+Kategori ağacı için önceden hesaplanmış alanlar:
+- ancestors: kökten üst kategoriye kadar olan ID yolu (alt ağaç sorguları için)
+- productCount: kategoriye doğrudan bağlı ürün sayısı (ürün CRUD'unda artımlı güncellenir)
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import UpdateOne
+from typing import Dict, List, Optional
+
+
+class CategoryTreeError(Exception):
+    """Geçersiz üst kategori (bulunamadı veya döngü oluşturuyor). Mesaj kullanıcıya gösterilebilir."""
+    pass
+
+
+async def build_ancestors(db: AsyncIOMotorDatabase, parent_id: Optional[ObjectId], category_id: Optional[ObjectId] = None) -> List[ObjectId]:
+    """Yeni üst kategoriye göre ancestors yolunu hesaplar; kategori kendi alt ağacına taşınamaz."""
+    if parent_id is None:
+        return []
+    if category_id is not None and parent_id == category_id:
+        raise CategoryTreeError("Kategori kendi üst kategorisi olamaz.")
+    parent = await db["categories"].find_one({"_id": parent_id}, {"ancestors": 1})
+    if not parent:
+        raise CategoryTreeError("Üst kategori bulunamadı.")
+    parent_ancestors = parent.get("ancestors") or []
+    if category_id is not None and category_id in parent_ancestors:
+        raise CategoryTreeError("Kategori kendi alt kategorisinin altına taşınamaz.")
+    return parent_ancestors + [parent_id]
+
+
+async def move_subtree(db: AsyncIOMotorDatabase, category_id: ObjectId, new_ancestors: List[ObjectId]) -> int:
+    """Taşınan kategorinin alt kategorilerinin ancestors yolunu günceller. Güncellenen sayıyı döndürür."""
+    categories_collection = db["categories"]
+    operations = []
+    async for descendant in categories_collection.find({"ancestors": category_id}, {"ancestors": 1}):
+        old_ancestors = descendant["ancestors"]
+        below = old_ancestors[old_ancestors.index(category_id) + 1:]
+        operations.append(UpdateOne({"_id": descendant["_id"]}, {"$set": {"ancestors": new_ancestors + [category_id] + below}}))
+    if not operations:
+        return 0
+    result = await categories_collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+async def adjust_product_count(db: AsyncIOMotorDatabase, category_id, delta: int) -> None:
+    """Kategorinin ürün sayacını artırır/azaltır (kategori yoksa bir şey yapmaz)."""
+    if isinstance(category_id, str) and ObjectId.is_valid(category_id):
+        category_id = ObjectId(category_id)
+    if not isinstance(category_id, ObjectId) or not delta:
+        return
+    await db["categories"].update_one({"_id": category_id}, {"$inc": {"productCount": delta}})
+
+
+async def move_product_count(db: AsyncIOMotorDatabase, old_category_id, new_category_id) -> None:
+    """Ürünün kategorisi değiştiyse eski kategoriden düşüp yenisine ekler."""
+    if str(old_category_id) == str(new_category_id):
+        return
+    await adjust_product_count(db, old_category_id, -1)
+    await adjust_product_count(db, new_category_id, 1)
+
+
+def compute_ancestors(category_id: ObjectId, parents: Dict[ObjectId, Optional[ObjectId]]) -> List[ObjectId]:
+    """parentCategory zincirinden ancestors yolunu bellekte çıkarır (döngüleri yok sayar)."""
+    path: List[ObjectId] = []
+    parent_id = parents.get(category_id)
+    while parent_id is not None and parent_id in parents and parent_id not in path and parent_id != category_id:
+        path.append(parent_id)
+        parent_id = parents.get(parent_id)
+    path.reverse()
+    return path
+
+
+async def backfill_category_tree(db: AsyncIOMotorDatabase) -> int:
+    """
+    Tüm kategoriler için ancestors ve productCount alanlarını parentCategory ve
+    ürünlerden yeniden hesaplar; sadece farklı olanları yazar. Güncellenen kategori sayısını döndürür.
+    """
+    categories_collection = db["categories"]
+    categories = await categories_collection.find({}, {"parentCategory": 1, "ancestors": 1, "productCount": 1}).to_list(length=None)
+    parents = {category["_id"]: category.get("parentCategory") for category in categories}
+
+    counts: Dict[ObjectId, int] = {}
+    async for group in db["products"].aggregate([{"$group": {"_id": "$category", "count": {"$sum": 1}}}]):
+        if isinstance(group["_id"], ObjectId):
+            counts[group["_id"]] = group["count"]
+
+    operations = []
+    for category in categories:
+        expected = {"ancestors": compute_ancestors(category["_id"], parents), "productCount": counts.get(category["_id"], 0)}
+        if any(category.get(field) != value for field, value in expected.items()):
+            operations.append(UpdateOne({"_id": category["_id"]}, {"$set": expected}))
+    if not operations:
+        return 0
+    result = await categories_collection.bulk_write(operations, ordered=False)
+    return result.modified_count
@@ -0,0 +1,142 @@
+# backend/utils/checkout.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import UpdateOne
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from database import supports_transactions
+from utils.loaders import ProductLoader
+
+logger = logging.getLogger(__name__)
+
+# (ürün ID, varyant SKU) -> adet
+StockRequirements = Dict[Tuple[ObjectId, str], int]
+
+
+class StockReservationError(Exception):
+    """Stok doğrulama/ayırma başarısız olduğunda fırlatılır (mesaj kullanıcıya gösterilebilir)."""
+    pass
+
+
+def build_stock_requirements(items) -> Tuple[StockRequirements, Dict[Tuple[ObjectId, str], str]]:
+    """Sepet kalemlerini (ürün, SKU) bazında toplar; aynı varyant iki kez geçerse adetler birleşir."""
+    requirements: StockRequirements = {}
+    names: Dict[Tuple[ObjectId, str], str] = {}
+    for item in items:
+        key = (ObjectId(item.product), item.variantSku)
+        requirements[key] = requirements.get(key, 0) + item.quantity
+        names[key] = item.productName
+    return requirements, names
+
+
+async def validate_stock(
+    db: AsyncIOMotorDatabase,
+    requirements: StockRequirements,
+    names: Dict[Tuple[ObjectId, str], str],
+    loader: Optional[ProductLoader] = None,
+) -> None:
+    """
+    Tüm kalemlerin stoğunu tek bir $in sorgusuyla kontrol eder. loader verilirse
+    bu istekte zaten yüklenmiş ürünler tekrar okunmaz (kesin kontrol, stok
+    ayırmadaki koşullu güncellemededir).
+    """
+    product_ids = list({product_id for product_id, _ in requirements})
+    products = await (loader or ProductLoader(db)).load_many(product_ids)
+
+    for (product_id, sku), quantity in requirements.items():
+        name = names.get((product_id, sku), "Ürün")
+        product = products.get(product_id)
+        if not product:
+            raise StockReservationError(f"'{name}' ürünü artık mevcut değil. Lütfen sepetinizi güncelleyin.")
+        variant = next((v for v in product.get("variants", []) if v.get("sku") == sku), None)
+        if not variant:
+            raise StockReservationError(f"'{name}' ürününün seçili varyantı artık mevcut değil. Lütfen sepetinizi güncelleyin.")
+        if variant.get("stock", 0) < quantity:
+            raise StockReservationError(
+                f"'{name}' ürünü için stok yetersiz (Mevcut: {variant.get('stock', 0)}). Lütfen sepetinizi güncelleyin."
+            )
+
+
+def _stock_operations(requirements: StockRequirements, token: Optional[str] = None) -> List[UpdateOne]:
+    """
+    Her varyant için koşullu stok düşme işlemi: sadece stok >= adet ise eşleşir.
+    token verilirse işlem ürün belgesine işaretlenir (transaction yokken geri alma için).
+    """
+    operations = []
+    for (product_id, sku), quantity in requirements.items():
+        update = {"$inc": {"variants.$[v].stock": -quantity, "totalStock": -quantity, "salesCount": quantity}}
+        if token:
+            update["$addToSet"] = {"stockReservations": f"{token}:{sku}"}
+        operations.append(UpdateOne(
+            {"_id": product_id, "variants": {"$elemMatch": {"sku": sku, "stock": {"$gte": quantity}}}},
+            update,
+            array_filters=[{"v.sku": sku}],
+        ))
+    return operations
+
+
+async def _release_reserved(db: AsyncIOMotorDatabase, requirements: StockRequirements, token: str) -> None:
+    """Bu token ile ayrılmış stokları geri verir (sadece gerçekten düşülmüş olanlar eşleşir)."""
+    operations = []
+    for (product_id, sku), quantity in requirements.items():
+        operations.append(UpdateOne(
+            {"_id": product_id, "stockReservations": f"{token}:{sku}"},
+            {
+                "$inc": {"variants.$[v].stock": quantity, "totalStock": quantity, "salesCount": -quantity},
+                "$pull": {"stockReservations": f"{token}:{sku}"},
+            },
+            array_filters=[{"v.sku": sku}],
+        ))
+    await db["products"].bulk_write(operations, ordered=False)
+
+
+async def _clear_reservation_marks(db: AsyncIOMotorDatabase, requirements: StockRequirements, token: str) -> None:
+    marks = [f"{token}:{sku}" for _, sku in requirements]
+    product_ids = list({product_id for product_id, _ in requirements})
+    await db["products"].update_many(
+        {"_id": {"$in": product_ids}},
+        {"$pull": {"stockReservations": {"$in": marks}}},
+    )
+
+
+async def place_order(db: AsyncIOMotorDatabase, order_doc: dict, requirements: StockRequirements) -> ObjectId:
+    """
+    Stoğu tek bir bulk_write ile ayırır ve siparişi kaydeder.
+    - Replica set varsa: stok düşme ve sipariş kaydı aynı transaction içinde yapılır.
+    - Yoksa: her ayırma bir token ile işaretlenir; eksik ayırma veya sipariş kaydı
+      hatasında sadece işaretli (gerçekten düşülmüş) stoklar geri verilir.
+    """
+    products_collection = db["products"]
+    orders_collection = db["orders"]
+    expected = len(requirements)
+
+    if supports_transactions():
+        async def _in_transaction(session):
+            result = await products_collection.bulk_write(_stock_operations(requirements), ordered=True, session=session)
+            if result.matched_count != expected:
+                raise StockReservationError("Sepetinizdeki bazı ürünlerin stoğu tükendi. Lütfen sepetinizi güncelleyin.")
+            insert_result = await orders_collection.insert_one(order_doc, session=session)
+            return insert_result.inserted_id
+
+        async with await db.client.start_session() as session:
+            return await session.with_transaction(_in_transaction)
+
+    token = str(ObjectId())
+    result = await products_collection.bulk_write(_stock_operations(requirements, token), ordered=False)
+    if result.matched_count != expected:
+        await _release_reserved(db, requirements, token)
+        raise StockReservationError("Sepetinizdeki bazı ürünlerin stoğu tükendi. Lütfen sepetinizi güncelleyin.")
+
+    try:
+        insert_result = await orders_collection.insert_one(order_doc)
+    except Exception:
+        await _release_reserved(db, requirements, token)
+        raise
+
+    try:
+        await _clear_reservation_marks(db, requirements, token)
+    except Exception as e:
+        # İşaretler kalırsa sadece gereksiz veri olur, siparişi etkilemez
+        logger.error("Stok ayırma işaretleri temizlenemedi: %s", e)
+    return insert_result.inserted_id
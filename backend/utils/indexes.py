@@ -0,0 +1,202 @@
+# backend/utils/indexes.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from typing import Dict, List, Optional, Any
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tek bir index tanımı. Her index'e açık bir isim veriyoruz ki
+# veritabanındaki index ile karşılaştırma (drift kontrolü) isim üzerinden yapılabilsin.
+class IndexSpec:
+    def __init__(self, name: str, keys: List[tuple], **options: Any):
+        self.name = name
+        self.keys = keys
+        self.options = options
+
+    def as_create_kwargs(self) -> dict:
+        return {"name": self.name, **self.options}
+
+
+# Index kaydı: koleksiyon adı -> index listesi.
+# Router'lardaki sorgu şekillerine göre (eşitlik -> sıralama -> aralık) düzenlenmiştir.
+INDEX_REGISTRY: Dict[str, List[IndexSpec]] = {
+    "products": [
+        IndexSpec("products_slug_unique", [("slug", ASCENDING)], unique=True),
+        IndexSpec(
+            "products_variant_sku_unique",
+            [("variants.sku", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"variants.sku": {"$exists": True}},
+        ),
+        # read_products: isActive + (category | isNew | isFeatured) + sıralama.
+        # Sıralamalar _id ile tamamlanır; keyset (cursor) sayfalama aynı index'i kullanır.
+        IndexSpec("products_active_created", [("isActive", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        IndexSpec("products_active_price", [("isActive", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)]),
+        IndexSpec("products_active_sales", [("isActive", ASCENDING), ("salesCount", DESCENDING), ("_id", DESCENDING)]),
+        IndexSpec("products_active_rating", [("isActive", ASCENDING), ("averageRating", DESCENDING), ("_id", DESCENDING)]),
+        IndexSpec("products_active_category_created", [("isActive", ASCENDING), ("category", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        IndexSpec("products_active_category_price", [("isActive", ASCENDING), ("category", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)]),
+        IndexSpec("products_active_featured_created", [("isActive", ASCENDING), ("isFeatured", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        IndexSpec("products_active_new_created", [("isActive", ASCENDING), ("isNew", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        # Arama: searchTokens üzerinde çapalı önek sorguları (multikey)
+        IndexSpec("products_active_search_tokens", [("isActive", ASCENDING), ("searchTokens", ASCENDING)]),
+    ],
+    "orders": [
+        IndexSpec("orders_number_unique", [("orderNumber", ASCENDING)], unique=True),
+        # read_orders: kullanıcı + durum filtresi, createdAt'e göre ters sıralı
+        IndexSpec("orders_user_status_created", [("user", ASCENDING), ("status", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        IndexSpec("orders_user_created", [("user", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        # Admin listesi: sadece durum filtresi veya filtresiz
+        IndexSpec("orders_status_created", [("status", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        IndexSpec("orders_created", [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "users": [
+        IndexSpec("users_email_unique", [("email", ASCENDING)], unique=True),
+        IndexSpec("users_password_reset_token", [("passwordResetToken", ASCENDING)], sparse=True),
+    ],
+    "categories": [
+        IndexSpec("categories_slug_unique", [("slug", ASCENDING)], unique=True),
+        IndexSpec("categories_active_order_name", [("isActive", ASCENDING), ("order", ASCENDING), ("name", ASCENDING)]),
+        IndexSpec("categories_parent", [("parentCategory", ASCENDING)]),
+        # Kategori taşındığında alt ağacı bulmak için
+        IndexSpec("categories_ancestors", [("ancestors", ASCENDING)]),
+    ],
+    "campaigns": [
+        IndexSpec("campaigns_code_unique", [("code", ASCENDING)], unique=True),
+        IndexSpec("campaigns_active_dates", [("isActive", ASCENDING), ("startDate", ASCENDING), ("endDate", ASCENDING)]),
+    ],
+    "campaign_redemptions": [
+        # (kampanya, müşteri) başına tek kullanım belgesi; limit koşullu $inc ile uygulanır (bkz. utils/campaign_usage.py).
+        # Zorunludur: eşzamanlı ilk kullanımlarda $setOnInsert upsert'ü tek belgeyi bu index'le sağlar
+        IndexSpec("campaign_redemptions_campaign_customer_unique", [("campaign", ASCENDING), ("customer", ASCENDING)], unique=True),
+    ],
+    "campaign_usage_shards": [
+        IndexSpec("campaign_usage_shards_campaign", [("campaign", ASCENDING), ("shard", ASCENDING)]),
+    ],
+    "carts": [
+        # Misafir sepetleri sessionId ile, kullanıcı sepetleri user ile tekildir. Zorunludur: sepet
+        # oluşturan upsert'ler (routers/cart.py) eşzamanlı ilk isteklerde tek sepeti bu index'lerle sağlar
+        IndexSpec(
+            "carts_session_unique",
+            [("sessionId", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"sessionId": {"$type": "string"}},
+        ),
+        IndexSpec(
+            "carts_user_unique",
+            [("user", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"user": {"$type": "objectId"}},
+        ),
+        # Terk edilmiş misafir sepetleri için TTL
+        IndexSpec(
+            "carts_guest_ttl",
+            [("updatedAt", ASCENDING)],
+            expireAfterSeconds=settings.GUEST_CART_TTL_DAYS * 24 * 60 * 60,
+            partialFilterExpression={"sessionId": {"$type": "string"}},
+        ),
+    ],
+    "favorites": [
+        IndexSpec("favorites_user_product_unique", [("userId", ASCENDING), ("productId", ASCENDING)], unique=True),
+        IndexSpec("favorites_user_created", [("userId", ASCENDING), ("createdAt", DESCENDING)]),
+    ],
+    "response_cache": [
+        # Paylaşılan yanıt önbelleği (RESPONSE_CACHE_BACKEND=mongo): süresi dolan girdiler silinir
+        IndexSpec("response_cache_expires_ttl", [("expiresAt", ASCENDING)], expireAfterSeconds=0),
+        IndexSpec("response_cache_namespace", [("namespace", ASCENDING)]),
+    ],
+}
+
+# Drift kontrolünde karşılaştırılan index seçenekleri
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _normalize_keys(keys) -> List[tuple]:
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys]
+
+
+def _diff_index(spec: IndexSpec, existing: dict) -> Optional[str]:
+    """Beklenen index ile veritabanındaki index arasındaki farkı açıklar (fark yoksa None)."""
+    if _normalize_keys(existing.get("key", [])) != _normalize_keys(spec.keys):
+        return f"anahtarlar farklı: beklenen {spec.keys}, mevcut {existing.get('key')}"
+    for option in _COMPARED_OPTIONS:
+        expected = spec.options.get(option)
+        actual = existing.get(option)
+        if option in ("unique", "sparse"):
+            expected, actual = bool(expected), bool(actual)
+        if expected != actual:
+            return f"'{option}' farklı: beklenen {expected}, mevcut {actual}"
+    return None
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase, create: bool = True) -> Dict[str, List[dict]]:
+    """
+    INDEX_REGISTRY'deki index'leri kontrol eder, eksikleri oluşturur (create=True ise)
+    ve eksik/değişmiş index'leri raporlar. Mevcut index'ler asla silinmez.
+    """
+    report: Dict[str, List[dict]] = {"ok": [], "created": [], "missing": [], "drifted": [], "failed": [], "unmanaged": []}
+
+    for collection_name, specs in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        try:
+            existing = await collection.index_information()
+        except OperationFailure:
+            existing = {}  # Koleksiyon henüz yok
+
+        expected_names = {spec.name for spec in specs}
+        for spec in specs:
+            entry = {"collection": collection_name, "name": spec.name}
+            current = existing.get(spec.name)
+
+            if current is None:
+                # Aynı anahtarlarla farklı isimde bir index var mı?
+                same_keys = next(
+                    (name for name, info in existing.items()
+                     if _normalize_keys(info.get("key", [])) == _normalize_keys(spec.keys)),
+                    None
+                )
+                if same_keys:
+                    report["drifted"].append({**entry, "reason": f"aynı anahtarlar '{same_keys}' adıyla mevcut"})
+                    continue
+                if not create:
+                    report["missing"].append(entry)
+                    continue
+                try:
+                    await collection.create_index(spec.keys, **spec.as_create_kwargs())
+                    report["created"].append(entry)
+                except OperationFailure as e:
+                    # Örn: mevcut verideki tekrar eden kayıtlar unique index'i engelleyebilir
+                    report["failed"].append({**entry, "reason": str(e)})
+                continue
+
+            reason = _diff_index(spec, current)
+            if reason:
+                report["drifted"].append({**entry, "reason": reason})
+            else:
+                report["ok"].append(entry)
+
+        for name in existing:
+            if name != "_id_" and name not in expected_names:
+                report["unmanaged"].append({"collection": collection_name, "name": name})
+
+    return report
+
+
+def log_index_report(report: Dict[str, List[dict]]) -> None:
+    """Index raporunun özetini loglar; eksik, farklı ve hatalı index'ler uyarı olarak yazılır."""
+    logger.info(
+        "Index durumu: %d hazır, %d oluşturuldu, %d eksik, %d farklı, %d hatalı",
+        len(report["ok"]), len(report["created"]), len(report["missing"]), len(report["drifted"]), len(report["failed"]),
+    )
+    if report["missing"]:
+        logger.warning("Eksik index'ler: %s", ", ".join(f"{entry['collection']}.{entry['name']}" for entry in report["missing"]))
+    if report["drifted"]:
+        logger.warning("Farklı index'ler: %s", "; ".join(
+            f"{entry['collection']}.{entry['name']} -> {entry['reason']}" for entry in report["drifted"]))
+    if report["failed"]:
+        logger.warning("Oluşturulamayan index'ler: %s", "; ".join(
+            f"{entry['collection']}.{entry['name']} -> {entry['reason']}" for entry in report["failed"]))
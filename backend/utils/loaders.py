@@ -0,0 +1,111 @@
+# backend/utils/loaders.py
+from fastapi import Depends, Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from typing import Annotated, Dict, Iterable, List, Optional
+import asyncio
+
+from database import get_db_dependency
+
+# Sepet, sipariş, favori ve kampanya kontrollerinin ihtiyaç duyduğu ürün alanlarının birleşimi
+PRODUCT_SNAPSHOT_PROJECTION = {
+    "name": 1,
+    "slug": 1,
+    "price": 1,
+    "salePrice": 1,
+    "images": {"$slice": 1},
+    "variants": 1,
+    "category": 1,
+    "totalStock": 1,
+    "isActive": 1,
+}
+
+# Favori listesinin ürün özeti için yeterli alanlar (varyantlar okunmaz)
+FAVORITE_SUMMARY_PROJECTION = {
+    "name": 1,
+    "slug": 1,
+    "price": 1,
+    "salePrice": 1,
+    "images": {"$slice": 1},
+    "totalStock": 1,
+}
+
+
+class ProductLoader:
+    """
+    İstek kapsamlı ürün yükleyici (DataLoader). Aynı istekte farklı yerlerden
+    istenen ürünleri tek bir $in sorgusunda toplar ve sonuçları istek boyunca
+    saklar; aynı ürün ikinci kez veritabanından okunmaz.
+    Pasif ürünler de döner, isActive kontrolü çağırana aittir. Dönen belgeler
+    paylaşıldığı için değiştirilmemelidir.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, projection: Optional[dict] = None):
+        self._db = db
+        self._projection = projection or PRODUCT_SNAPSHOT_PROJECTION
+        self._futures: Dict[ObjectId, asyncio.Future] = {}
+        self._queue: List[ObjectId] = []
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self.query_count = 0
+
+    def _enqueue(self, product_id: ObjectId) -> asyncio.Future:
+        future = self._futures.get(product_id)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[product_id] = future
+        if not self._queue:
+            # Aynı döngü turunda istenen diğer ürünler de bu sorguya eklenir
+            self._dispatch_task = loop.create_task(self._dispatch())
+        self._queue.append(product_id)
+        return future
+
+    async def _dispatch(self) -> None:
+        batch, self._queue = self._queue, []
+        self.query_count += 1
+        try:
+            cursor = self._db["products"].find({"_id": {"$in": batch}}, self._projection)
+            found = {product["_id"]: product async for product in cursor}
+        except Exception as e:
+            # Hatalı yüklemeler saklanmaz, bir sonraki istekte tekrar denenir
+            for product_id in batch:
+                future = self._futures.pop(product_id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for product_id in batch:
+            future = self._futures[product_id]
+            if not future.done():
+                future.set_result(found.get(product_id))
+
+    async def load(self, product_id: ObjectId) -> Optional[dict]:
+        """Tek ürünü döndürür (bulunamazsa None)."""
+        return await self._enqueue(product_id)
+
+    async def load_many(self, product_ids: Iterable[ObjectId]) -> Dict[ObjectId, dict]:
+        """Bulunan ürünleri ID -> belge olarak döndürür."""
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return {}
+        products = await asyncio.gather(*(self._enqueue(product_id) for product_id in product_ids))
+        return {product_id: product for product_id, product in zip(product_ids, products) if product is not None}
+
+    def clear(self, product_id: Optional[ObjectId] = None) -> None:
+        """Saklanan sonucu siler (ürün bu istekte güncellendiyse)."""
+        if product_id is None:
+            self._futures = {key: future for key, future in self._futures.items() if not future.done()}
+        elif product_id in self._futures and self._futures[product_id].done():
+            del self._futures[product_id]
+
+
+def get_product_loader(request: Request, db: Annotated[AsyncIOMotorDatabase, Depends(get_db_dependency)]) -> ProductLoader:
+    """İstek başına tek bir ProductLoader döndürür (request.state üzerinde saklanır)."""
+    loader = getattr(request.state, "product_loader", None)
+    if loader is None:
+        loader = ProductLoader(db)
+        request.state.product_loader = loader
+    return loader
+
+
+ProductLoaderDep = Annotated[ProductLoader, Depends(get_product_loader)]
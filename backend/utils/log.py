@@ -0,0 +1,174 @@
+# backend/utils/log.py
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from config import settings
+
+# LogRecord'un kendi alanları; bunların dışındakiler (extra=...) JSON'a alan olarak yazılır
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Her kaydı tek satır JSON olarak yazar (ts, level, logger, message + extra alanlar)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Tekrarlayan uyarı/hataları örnekler: aynı (logger, mesaj şablonu) için her
+    pencerede ilk `burst` kayıt geçer, gerisi sayılıp atılır. Pencere yenilendiğinde
+    geçen ilk kayda atılan kayıt sayısı `suppressed` alanı olarak eklenir.
+    Şablon, argümanlar uygulanmadan önceki mesajdır; bu yüzden loglar f-string yerine
+    %s argümanlarıyla yazılır.
+    """
+
+    def __init__(self, window_seconds: float, burst: int, min_level: int = logging.WARNING):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self.burst = burst
+        self.min_level = min_level
+        self._windows: Dict[Tuple[str, str], list] = {}  # anahtar -> [pencere başı, geçen, atılan]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno < self.min_level:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.window_seconds:
+                suppressed = window[2] if window else 0
+                if len(self._windows) >= 10000:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Kayıtları sınırlı bir kuyruğa koyar; yazma işini QueueListener thread'i yapar.
+    Kuyruk doluysa kayıt beklenmeden atılır (event loop stdout'u beklemez).
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mesaj ve traceback burada metne çevrilir (argümanlar başka thread'de değişebilir);
+        # JSON biçimlendirmesi listener thread'inde yapılır
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def parse_log_levels(value: str) -> Dict[str, str]:
+    """'routers.products=WARNING,utils=DEBUG' -> {'routers.products': 'WARNING', 'utils': 'DEBUG'}"""
+    levels = {}
+    for item in value.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """
+    Root logger'ı kuyruk + arka plan yazıcı ile yapılandırır. Birden fazla çağrı güvenlidir;
+    shutdown_logging sonrası çağrılırsa (uygulama yeniden başlatıldı) yazıcı yeniden kurulur.
+    LOG_LEVEL genel seviye, LOG_LEVELS modül bazında seviyelerdir; LOG_FORMAT=text
+    geliştirme için okunabilir çıktı verir.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "text":
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_WINDOW_SECONDS, settings.LOG_SAMPLE_BURST))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in parse_log_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _queue_handler = queue_handler
+    _listener = QueueListener(queue_handler.queue, stream_handler)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Kuyrukta kalan kayıtları yazar ve arka plan thread'ini durdurur."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork() -> None:
+    """
+    Fork edilen process'te (gunicorn preload_app) yazıcı thread'i yoktur ve kuyruğun
+    kilidi fork anındaki durumda kalmış olabilir; yeni kuyruk ve thread ile başlatılır.
+    """
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = QueueListener(_queue_handler.queue, *_listener.handlers)
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
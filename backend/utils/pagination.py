@@ -0,0 +1,82 @@
+# backend/utils/pagination.py
+from motor.motor_asyncio import AsyncIOMotorCollection
+from bson import json_util
+from pymongo import ReadPreference
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import binascii
+
+from config import settings
+from utils.cache import TTLCache
+
+# Sayım sonuçları kısa süreliğine önbelleğe alınır (her sayfa isteğinde count_documents çalışmasın)
+_count_cache = TTLCache(ttl_seconds=settings.COUNT_CACHE_TTL_SECONDS, max_size=2048)
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(sort_list: List[Tuple[str, int]], document: dict) -> str:
+    """Son belgenin sıralama anahtarlarını (ve _id'sini) opak bir cursor'a çevirir."""
+    payload = {"s": [[field, direction] for field, direction in sort_list],
+               "v": [document.get(field) for field, _ in sort_list]}
+    raw = json_util.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_list: List[Tuple[str, int]]) -> List[Any]:
+    """Cursor'ı çözer ve mevcut sıralama ile uyumlu olduğunu doğrular."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        cursor_sort = [tuple(item) for item in payload["s"]]
+        values = payload["v"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Geçersiz cursor: {e}")
+    if cursor_sort != [tuple(item) for item in sort_list] or len(values) != len(sort_list):
+        raise InvalidCursorError("Cursor farklı bir sıralama için oluşturulmuş.")
+    return values
+
+
+def _after_value(field: str, direction: int, value: Any) -> Optional[dict]:
+    """Sıralamada 'value' değerinden sonra gelen belgeler için koşul (null değerler en küçük sayılır)."""
+    if direction == 1:
+        return {field: {"$ne": None}} if value is None else {field: {"$gt": value}}
+    if value is None:
+        return None  # Azalan sıralamada null'dan sonra gelen değer yok
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+
+def build_keyset_filter(sort_list: List[Tuple[str, int]], values: List[Any]) -> dict:
+    """
+    (a, b, _id) gibi çok alanlı bir sıralama için 'son görülen belgeden sonrası' koşulunu üretir:
+    a > va  VEYA  (a = va VE b > vb)  VEYA  (a = va VE b = vb VE _id > vid)
+    """
+    branches = []
+    equals: Dict[str, Any] = {}
+    for (field, direction), value in zip(sort_list, values):
+        condition = _after_value(field, direction, value)
+        if condition is not None:
+            branches.append({**equals, **condition} if equals else condition)
+        equals[field] = value
+    if not branches:
+        return {"_id": {"$exists": False}}  # Hiçbir belge eşleşmesin
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+
+async def count_with_cache(collection: AsyncIOMotorCollection, filter_query: dict) -> int:
+    """
+    Toplam kayıt sayısını döndürür. Filtresiz sorgularda metadata'dan tahmini sayı kullanılır,
+    filtreli sorgularda sonuç COUNT_CACHE_TTL_SECONDS boyunca önbellekte tutulur. Önbelleğe
+    yazılan sayım, katalog okuma tercihinden bağımsız olarak primary'den yapılır.
+    """
+    if not filter_query:
+        return await collection.estimated_document_count()
+    key = (collection.name, json_util.dumps(filter_query, sort_keys=True))
+    total = _count_cache.get(key)
+    if total is None:
+        primary = collection.database.get_collection(collection.name, read_preference=ReadPreference.PRIMARY)
+        total = await primary.count_documents(filter_query)
+        _count_cache.set(key, total)
+    return total
@@ -0,0 +1,68 @@
+# backend/utils/password_hashing.py
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from typing import Callable, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Bekleyen hash işlemi sayısı sınıra ulaştığında fırlatılır (istek reddedilmeli)."""
+    pass
+
+
+class PasswordHasher:
+    """
+    bcrypt işlemlerini event loop dışında, boyutu sınırlı bir thread havuzunda çalıştırır.
+    bcrypt C uzantısı GIL'i bıraktığı için thread havuzu yeterlidir; her işlem ~200ms
+    sürdüğünden loop'ta çalıştırmak diğer tüm istekleri bekletir.
+    Çalışan + kuyruktaki işlem sayısı max_pending'i aşarsa PasswordHasherBusy fırlatılır.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_pending: int):
+        self.context = context
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _run(self, func: Callable, *args):
+        if self._pending >= self.max_pending:
+            raise PasswordHasherBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Şifreyi yapılandırılmış maliyetle hashler."""
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Şifreyi doğrular. Hash eski bir maliyetle (rounds) üretilmişse ikinci değer
+        yeni ayarlarla üretilmiş hash'tir, değilse None.
+        """
+        return await self._run(self._verify_and_update, plain_password, hashed_password)
+
+    def _verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        try:
+            return self.context.verify_and_update(plain_password, hashed_password)
+        except ValueError as e:
+            # Tanınmayan/bozuk hash: doğrulama başarısız sayılır
+            logger.warning("Password verification error: %s", e)
+            return False, None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,219 @@
+# backend/utils/pricing.py
+"""
+Sepet fiyatlandırma motoru. Veritabanına erişmez, await içermez:
+sepet + ürün (fiyat/stok) anlık görüntüsü + kampanya kuralı alır ve
+fiyatlandırılmış sepeti döndürür. Tutarlar Decimal ile hesaplanır ve
+kuruşa yuvarlanarak float olarak döner (MongoDB'de float saklanıyor).
+"""
+from bson import ObjectId
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import settings
+
+KURUS = Decimal("0.01")
+ZERO = Decimal("0")
+
+
+class PricingConfig:
+    """Vergi ve kargo kuralları (varsayılanlar ayarlardan gelir)."""
+
+    def __init__(self, tax_percent: Any = None, free_shipping_threshold: Any = None, shipping_cost: Any = None):
+        self.tax_rate = to_decimal(settings.TAX if tax_percent is None else tax_percent) / 100
+        self.free_shipping_threshold = to_decimal(
+            settings.FREE_SHIPPING_THRESHOLD if free_shipping_threshold is None else free_shipping_threshold
+        )
+        self.shipping_cost = to_decimal(settings.SHIPPING_COST if shipping_cost is None else shipping_cost)
+
+
+def to_decimal(value: Any) -> Decimal:
+    if value is None:
+        return ZERO
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def to_money(value: Decimal) -> float:
+    """Decimal tutarı kuruşa yuvarlayıp float'a çevirir."""
+    return float(value.quantize(KURUS, rounding=ROUND_HALF_UP))
+
+
+def unit_price(product: dict) -> Decimal:
+    """İndirimli fiyat varsa onu, yoksa liste fiyatını döndürür."""
+    if product.get("salePrice") is not None:
+        return to_decimal(product["salePrice"])
+    return to_decimal(product.get("price", 0))
+
+
+def campaign_is_open(campaign: Optional[dict], now: datetime) -> bool:
+    """Kampanya aktif ve tarih aralığında mı?"""
+    if not campaign or not campaign.get("isActive"):
+        return False
+    start, end = campaign.get("startDate"), campaign.get("endDate")
+    if start is None or end is None:
+        return False
+    # Mongo'dan gelen tarihler tz bilgisi taşımayabilir (UTC kabul edilir)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    return start <= now <= end
+
+
+def calculate_discount(campaign: dict, subtotal: Any) -> Decimal:
+    """Kampanya indirim tutarı (ara toplamı aşamaz)."""
+    subtotal = to_decimal(subtotal)
+    discount_value = to_decimal(campaign.get("discountValue", 0))
+    if campaign.get("discountType") == "percentage":
+        discount = subtotal * discount_value / 100
+        if campaign.get("maxDiscount") is not None:
+            discount = min(discount, to_decimal(campaign["maxDiscount"]))
+    elif campaign.get("discountType") == "fixed_amount":
+        discount = discount_value
+    else:
+        discount = ZERO
+    return min(discount, subtotal).quantize(KURUS, rounding=ROUND_HALF_UP)
+
+
+def _item_sku(item: dict) -> Optional[str]:
+    sku = item.get("variantSku")
+    if not sku and isinstance(item.get("variant"), dict):
+        sku = item["variant"].get("sku")
+    return sku
+
+
+def _item_product_id(item: dict) -> Optional[ObjectId]:
+    product_id = item.get("product")
+    if isinstance(product_id, str) and ObjectId.is_valid(product_id):
+        return ObjectId(product_id)
+    if isinstance(product_id, ObjectId):
+        return product_id
+    return None
+
+
+def cart_product_ids(cart_doc: dict) -> List[ObjectId]:
+    """Sepetteki geçerli ürün ID'leri (ürün anlık görüntüsünü çekmek için)."""
+    return list({pid for pid in (_item_product_id(item) for item in cart_doc.get("items", [])) if pid})
+
+
+def cart_campaign_id(cart_doc: dict) -> Optional[ObjectId]:
+    campaign = cart_doc.get("campaign")
+    if not isinstance(campaign, dict):
+        return None
+    campaign_id = campaign.get("id")
+    if isinstance(campaign_id, str) and ObjectId.is_valid(campaign_id):
+        return ObjectId(campaign_id)
+    return campaign_id if isinstance(campaign_id, ObjectId) else None
+
+
+def price_cart(
+    cart_doc: dict,
+    products: Dict[ObjectId, dict],
+    campaign: Optional[dict] = None,
+    now: Optional[datetime] = None,
+    config: Optional[PricingConfig] = None,
+) -> dict:
+    """
+    Sepeti fiyatlandırır ve fiyatlandırılmış alanları döndürür:
+    items, subtotal, discountAmount, campaign, taxAmount, shippingCost, total.
+    - products: aktif ürünler (ID -> belge). Listede olmayan ürünler sepetten düşer.
+    - Miktar stoğu aşıyorsa stoğa indirilir, stok yoksa kalem düşer.
+    - campaign: sepete uygulanmış kampanyanın güncel belgesi (yoksa None).
+    """
+    now = now or datetime.now(timezone.utc)
+    config = config or PricingConfig()
+
+    subtotal = ZERO
+    priced_items = []
+    for item in cart_doc.get("items", []):
+        product_id = _item_product_id(item)
+        sku = _item_sku(item)
+        if not product_id or not sku:
+            continue  # Geçersiz kalem
+        product = products.get(product_id)
+        if not product:
+            continue  # Ürün bulunamadı veya aktif değil
+        variant = next((v for v in product.get("variants", []) if v.get("sku") == sku), None)
+        if not variant:
+            continue  # Varyant bulunamadı
+
+        stock = variant.get("stock", 0)
+        quantity = min(max(1, item.get("quantity", 1)), stock)  # En az 1 adet, en fazla stok kadar
+        if quantity <= 0:
+            continue  # Stok yoksa kalemi düşür
+
+        price = unit_price(product)
+        line_total = price * quantity
+        subtotal += line_total
+
+        priced_item = dict(item)
+        variant_info = dict(item["variant"]) if isinstance(item.get("variant"), dict) else {}
+        variant_info.update({
+            "size": variant.get("size", ""),
+            "colorName": variant.get("colorName", ""),
+            "colorHex": variant.get("colorHex", ""),
+            "sku": sku,
+        })
+        priced_item.update({
+            "productName": product.get("name", "Ürün"),
+            "productSlug": product.get("slug", ""),
+            "productImage": product["images"][0].get("url", "") if product.get("images") else "",
+            "variantSku": sku,
+            "variant": variant_info,
+            "price": to_money(price),
+            "originalPrice": product.get("price"),
+            "quantity": quantity,
+            "subtotal": to_money(line_total),
+        })
+        priced_items.append(priced_item)
+
+    # Kampanya: aktif, tarih aralığında ve minimum tutar sağlanıyorsa uygulanır
+    discount = ZERO
+    campaign_applied = None
+    if campaign and campaign_is_open(campaign, now) and subtotal >= to_decimal(campaign.get("minPurchaseAmount")):
+        discount = calculate_discount(campaign, subtotal)
+        campaign_applied = {
+            "id": str(campaign["_id"]),
+            "code": campaign.get("code", ""),
+            "discountType": campaign.get("discountType", ""),
+            "discountValue": campaign.get("discountValue", 0),
+            "discountAmount": to_money(discount),
+        }
+
+    # Vergi ve kargo
+    tax_base = subtotal - discount
+    tax_amount = max(ZERO, tax_base * config.tax_rate).quantize(KURUS, rounding=ROUND_HALF_UP)
+    shipping_cost = ZERO if tax_base >= config.free_shipping_threshold else config.shipping_cost
+    total = max(ZERO, tax_base + tax_amount + shipping_cost)
+
+    return {
+        "items": priced_items,
+        "subtotal": to_money(subtotal),
+        "discountAmount": to_money(discount),
+        "campaign": campaign_applied,
+        "taxAmount": to_money(tax_amount),
+        "shippingCost": to_money(shipping_cost),
+        "total": to_money(total),
+    }
+
+
+def price_carts(
+    cart_docs: Iterable[dict],
+    products: Dict[ObjectId, dict],
+    campaigns: Optional[Dict[ObjectId, dict]] = None,
+    now: Optional[datetime] = None,
+    config: Optional[PricingConfig] = None,
+) -> List[dict]:
+    """
+    Toplu fiyatlandırma (kampanya simülasyonu vb. için). Tüm sepetler aynı
+    ürün/kampanya anlık görüntüsü ve aynı zaman ile fiyatlandırılır.
+    """
+    now = now or datetime.now(timezone.utc)
+    config = config or PricingConfig()
+    campaigns = campaigns or {}
+    return [
+        price_cart(cart_doc, products, campaigns.get(cart_campaign_id(cart_doc)), now=now, config=config)
+        for cart_doc in cart_docs
+    ]
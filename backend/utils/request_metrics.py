@@ -0,0 +1,277 @@
+# backend/utils/request_metrics.py
+from contextvars import ContextVar
+from pymongo import monitoring
+from typing import Dict, List, Optional, Tuple
+import bisect
+import ipaddress
+import logging
+import threading
+import time
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# İstek süresi (sn) ve istek başına veritabanı çağrısı histogram sınırları
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Server-Timing'de gösterilen en fazla komut sayısı (başlık boyutu sınırlı kalsın)
+MAX_TIMED_COMMANDS = 10
+
+
+class RequestStats:
+    """Tek bir HTTP isteği sırasında çalışan Mongo komutları."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self.docs_returned = 0
+        self.commands: List[Tuple[str, str, float, int]] = []  # (komut, koleksiyon, süre sn, belge)
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def record(self, command: str, collection: str, seconds: float, docs: int) -> None:
+        # Motor komutları executor thread'lerinde çalışır; eşzamanlı (gather) sorgular için kilit
+        with self._lock:
+            if self.closed:
+                return
+            self.db_calls += 1
+            self.db_seconds += seconds
+            self.docs_returned += docs
+            self.commands.append((command, collection, seconds, docs))
+
+    def close(self) -> None:
+        """Yanıt gönderildikten sonraki (background task) komutları isteğe yazma."""
+        with self._lock:
+            self.closed = True
+
+    def server_timing(self, total_seconds: float) -> str:
+        parts = [
+            f"app;dur={(total_seconds - self.db_seconds) * 1000:.1f}",
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_calls} calls, {self.docs_returned} docs"',
+        ]
+        slowest = sorted(enumerate(self.commands), key=lambda item: item[1][2], reverse=True)[:MAX_TIMED_COMMANDS]
+        for index, (command, collection, seconds, docs) in sorted(slowest):
+            parts.append(f'db{index + 1};dur={seconds * 1000:.1f};desc="{command} {collection} ({docs})"')
+        return ", ".join(parts)
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _current_request.get()
+
+
+class Histogram:
+    """Prometheus uyumlu kümülatif histogram (label kombinasyonu başına)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts: Dict[tuple, List[int]] = {}
+        self.sums: Dict[tuple, float] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        counts = self.counts.setdefault(labels, [0] * (len(self.buckets) + 1))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[labels] = self.sums.get(labels, 0.0) + value
+
+    def render(self, name: str, label_names: tuple) -> List[str]:
+        lines = []
+        for labels, counts in sorted(self.counts.items()):
+            label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound:g}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label_text}}} {self.sums[labels]:.6f}")
+            lines.append(f"{name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Route bazında istek süresi, veritabanı çağrısı ve veritabanı süresi histogramları.
+    Route etiketi path şablonudur (/products/{slug}); eşleşmeyen istekler tek
+    etikette toplanır, böylece etiket sayısı route sayısıyla sınırlı kalır.
+    """
+
+    def __init__(self, db_call_threshold: int):
+        self.db_call_threshold = db_call_threshold
+        self.request_duration = Histogram(DURATION_BUCKETS)
+        self.request_db_calls = Histogram(DB_CALL_BUCKETS)
+        self.request_db_duration = Histogram(DURATION_BUCKETS)
+        self.requests_over_threshold: Dict[tuple, int] = {}
+        self.mongo_commands: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float, stats: RequestStats) -> bool:
+        """İsteği kaydeder; veritabanı çağrısı eşiği aşıldıysa True döner."""
+        route_labels = (method, route)
+        over_threshold = 0 < self.db_call_threshold < stats.db_calls
+        with self._lock:
+            self.request_duration.observe((method, route, str(status_code)), seconds)
+            self.request_db_calls.observe(route_labels, stats.db_calls)
+            self.request_db_duration.observe(route_labels, stats.db_seconds)
+            if over_threshold:
+                self.requests_over_threshold[route_labels] = self.requests_over_threshold.get(route_labels, 0) + 1
+        return over_threshold
+
+    def observe_command(self, command: str, collection: str) -> None:
+        with self._lock:
+            key = (command, collection)
+            self.mongo_commands[key] = self.mongo_commands.get(key, 0) + 1
+
+    def render(self) -> str:
+        """Prometheus text exposition formatı (0.0.4)."""
+        with self._lock:
+            lines = [
+                "# HELP http_request_duration_seconds İstek süresi (route şablonu bazında).",
+                "# TYPE http_request_duration_seconds histogram",
+                *self.request_duration.render("http_request_duration_seconds", ("method", "route", "status")),
+                "# HELP http_request_db_calls İstek başına Mongo komut sayısı.",
+                "# TYPE http_request_db_calls histogram",
+                *self.request_db_calls.render("http_request_db_calls", ("method", "route")),
+                "# HELP http_request_db_duration_seconds İstek başına toplam Mongo süresi.",
+                "# TYPE http_request_db_duration_seconds histogram",
+                *self.request_db_duration.render("http_request_db_duration_seconds", ("method", "route")),
+                f"# HELP http_requests_db_calls_exceeded_total Mongo komut sayısı {self.db_call_threshold} eşiğini aşan istekler.",
+                "# TYPE http_requests_db_calls_exceeded_total counter",
+            ]
+            for (method, route), count in sorted(self.requests_over_threshold.items()):
+                lines.append(f'http_requests_db_calls_exceeded_total{{method="{method}",route="{_escape(route)}"}} {count}')
+            lines += [
+                "# HELP mongo_commands_total Çalıştırılan Mongo komutları (arka plan işleri dahil).",
+                "# TYPE mongo_commands_total counter",
+            ]
+            for (command, collection), count in sorted(self.mongo_commands.items()):
+                lines.append(f'mongo_commands_total{{command="{command}",collection="{_escape(collection)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            for histogram in (self.request_duration, self.request_db_calls, self.request_db_duration):
+                histogram.counts.clear()
+                histogram.sums.clear()
+            self.requests_over_threshold.clear()
+            self.mongo_commands.clear()
+
+
+def _returned_docs(reply) -> int:
+    cursor = reply.get("cursor") if isinstance(reply, dict) else None
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if isinstance(reply, dict) and isinstance(reply.get("value"), dict):
+        return 1  # findAndModify
+    return 0
+
+
+class DbCommandListener(monitoring.CommandListener):
+    """
+    Her Mongo komutunu o anki isteğe (contextvar) yazar. Motor, pymongo çağrılarını
+    context kopyalanmış executor thread'lerinde çalıştırdığı için started/succeeded
+    olayları isteğin context'ini görür.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._in_flight: Dict[tuple, Tuple[Optional[RequestStats], str]] = {}
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = command.get("collection") if isinstance(command.get("collection"), str) else ""
+        self._in_flight[(event.connection_id, event.request_id)] = (_current_request.get(), collection)
+
+    def succeeded(self, event):
+        self._finish(event, _returned_docs(event.reply))
+
+    def failed(self, event):
+        self._finish(event, 0)
+
+    def _finish(self, event, docs: int) -> None:
+        stats, collection = self._in_flight.pop((event.connection_id, event.request_id), (None, ""))
+        self.registry.observe_command(event.command_name, collection)
+        if stats is not None:
+            stats.record(event.command_name, collection, event.duration_micros / 1_000_000, docs)
+
+
+class RequestMetricsMiddleware:
+    """
+    Saf ASGI middleware: her isteğe RequestStats bağlar, yanıta Server-Timing başlığı
+    ekler ve süreyi route şablonu bazında histogramlara yazar. Mongo komut sayısı
+    REQUEST_DB_CALL_WARNING_THRESHOLD'u aşan istekler loglanır (N+1 tespiti).
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, excluded_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.registry = registry
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+        finished_at: Optional[float] = None
+
+        async def send_with_timing(message):
+            nonlocal status_code, finished_at
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing(time.perf_counter() - stats.started_at).encode("latin-1", "replace")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished_at = time.perf_counter()
+                stats.close()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            stats.close()
+            seconds = (finished_at or time.perf_counter()) - stats.started_at
+            # Router, eşleşen route'u scope'a yazar; eşleşmeyen istekler tek etikette toplanır
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            if self.registry.observe_request(method, route, status_code, seconds, stats):
+                logger.warning(
+                    "%s %s %d Mongo komutu çalıştırdı (eşik %d)", method, route, stats.db_calls, self.registry.db_call_threshold,
+                    extra={"db_ms": round(stats.db_seconds * 1000, 1),
+                           "commands": [f"{command} {collection}" for command, collection, _, _ in stats.commands[:20]]},
+                )
+
+
+def client_in_networks(host: Optional[str], networks: List[str]) -> bool:
+    """İstemci adresi verilen CIDR ağlarından birindeyse True (geçersiz adres/ağ eşleşmez)."""
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    for network in networks:
+        try:
+            if address in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            logger.warning("Geçersiz METRICS_ALLOWED_NETWORKS girdisi: %s", network)
+    return False
+
+
+metrics_registry = MetricsRegistry(db_call_threshold=settings.REQUEST_DB_CALL_WARNING_THRESHOLD)
+db_command_listener = DbCommandListener(metrics_registry)
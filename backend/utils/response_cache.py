@@ -0,0 +1,198 @@
+# backend/utils/response_cache.py
+from fastapi import Request, Response
+from bson import json_util
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+
+from config import settings
+from database import get_database
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Önbellek durumları (X-Cache başlığında döner)
+CACHE_HIT = "HIT"
+CACHE_STALE = "STALE"
+CACHE_MISS = "MISS"
+
+
+class CachedResponse:
+    """JSON'a önceden çevrilmiş yanıt gövdesi ve geçerlilik süreleri (duvar saati, saniye)."""
+
+    def __init__(self, body: bytes, etag: str, fresh_until: float, stale_until: float):
+        self.body = body
+        self.etag = etag
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class MemoryCacheBackend:
+    """Süreç içi backend. Her worker kendi kopyasını tutar."""
+
+    def __init__(self, max_entries: int):
+        self._cache = TTLCache(ttl_seconds=0, max_size=max_entries)
+
+    async def get(self, namespace: str, key: str) -> Optional[CachedResponse]:
+        return self._cache.get((namespace, key))
+
+    async def set(self, namespace: str, key: str, entry: CachedResponse, ttl_seconds: float) -> None:
+        self._cache.set((namespace, key), entry, ttl_seconds=ttl_seconds)
+
+    async def clear(self, namespace: str) -> None:
+        # Aynı backend'i paylaşan diğer önbelleklerin girdileri silinmez
+        for key in self._cache.keys():
+            if key[0] == namespace:
+                self._cache.delete(key)
+
+
+class MongoCacheBackend:
+    """
+    Worker'lar arasında paylaşılan backend. Girdiler bir koleksiyonda tutulur,
+    süresi dolanları 'expiresAt' üzerindeki TTL index'i temizler.
+    """
+
+    def __init__(self, collection_name: str = "response_cache"):
+        self.collection_name = collection_name
+
+    async def get(self, namespace: str, key: str) -> Optional[CachedResponse]:
+        doc = await get_database()[self.collection_name].find_one({"_id": f"{namespace}:{key}"})
+        if not doc or doc["staleUntil"] < time.time():
+            return None
+        return CachedResponse(bytes(doc["body"]), doc["etag"], doc["freshUntil"], doc["staleUntil"])
+
+    async def set(self, namespace: str, key: str, entry: CachedResponse, ttl_seconds: float) -> None:
+        await get_database()[self.collection_name].replace_one(
+            {"_id": f"{namespace}:{key}"},
+            {
+                "namespace": namespace,
+                "body": entry.body,
+                "etag": entry.etag,
+                "freshUntil": entry.fresh_until,
+                "staleUntil": entry.stale_until,
+                "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+            },
+            upsert=True,
+        )
+
+    async def clear(self, namespace: str) -> None:
+        await get_database()[self.collection_name].delete_many({"namespace": namespace})
+
+
+def create_backend():
+    """RESPONSE_CACHE_BACKEND ayarına göre backend seçer ('memory' veya 'mongo')."""
+    if settings.RESPONSE_CACHE_BACKEND == "mongo":
+        return MongoCacheBackend()
+    if settings.RESPONSE_CACHE_BACKEND != "memory":
+        logger.warning("Bilinmeyen RESPONSE_CACHE_BACKEND '%s', bellek kullanılacak.", settings.RESPONSE_CACHE_BACKEND)
+    return MemoryCacheBackend(max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+class ResponseCache:
+    """
+    Önceden serileştirilmiş yanıtlar için stale-while-revalidate önbelleği.
+    - Taze girdi doğrudan döner.
+    - Bayat (ama stale süresi içinde) girdi hemen döner, arka planda yenilenir.
+    - Aynı anahtar için eşzamanlı hesaplamalar tek bir render'da birleştirilir.
+    """
+
+    def __init__(self, namespace: str, backend, fresh_seconds: float, stale_seconds: float):
+        self.namespace = namespace
+        self.backend = backend
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._version = 0
+
+    @staticmethod
+    def make_key(params: dict) -> str:
+        """Normalize edilmiş sorgu parametrelerinden kararlı bir anahtar üretir."""
+        raw = json_util.dumps(params, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[bytes]]) -> Tuple[CachedResponse, str]:
+        try:
+            entry = await self.backend.get(self.namespace, key)
+        except Exception as e:
+            # Paylaşılan backend erişilemezse önbelleksiz devam et
+            logger.warning("Yanıt önbelleği okunamadı (%s): %s", self.namespace, e)
+            entry = None
+
+        now = time.time()
+        if entry is not None and entry.fresh_until > now:
+            return entry, CACHE_HIT
+        if entry is not None and entry.stale_until > now:
+            self._start_render(key, render, background=True)
+            return entry, CACHE_STALE
+
+        task = self._start_render(key, render, background=False)
+        return await asyncio.shield(task), CACHE_MISS
+
+    def _start_render(self, key: str, render: Callable[[], Awaitable[bytes]], background: bool) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render_and_store(key, render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None) if self._inflight.get(key) is t else None)
+            if background:
+                task.add_done_callback(self._report_background_error)
+        return task
+
+    def _report_background_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Yanıt önbelleği arka planda yenilenemedi (%s): %s", self.namespace, task.exception())
+
+    async def _render_and_store(self, key: str, render: Callable[[], Awaitable[bytes]]) -> CachedResponse:
+        version = self._version
+        body = await render()
+        now = time.time()
+        entry = CachedResponse(
+            body=body,
+            etag='"' + hashlib.sha1(body).hexdigest() + '"',
+            fresh_until=now + self.fresh_seconds,
+            stale_until=now + self.fresh_seconds + self.stale_seconds,
+        )
+        # Render sırasında invalidate edildiyse eski veriyi önbelleğe yazma
+        if version == self._version:
+            try:
+                await self.backend.set(self.namespace, key, entry, self.fresh_seconds + self.stale_seconds)
+            except Exception as e:
+                logger.warning("Yanıt önbelleğe yazılamadı (%s): %s", self.namespace, e)
+        return entry
+
+    async def invalidate(self) -> None:
+        self._version += 1
+        try:
+            await self.backend.clear(self.namespace)
+        except Exception as e:
+            logger.warning("Yanıt önbelleği temizlenemedi (%s): %s", self.namespace, e)
+
+    def build_response(self, request: Request, entry: CachedResponse, cache_status: str) -> Response:
+        """Önbellek girdisinden yanıt üretir; If-None-Match eşleşirse 304 döner."""
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": f"public, max-age={int(self.fresh_seconds)}, stale-while-revalidate={int(self.stale_seconds)}",
+            "X-Cache": cache_status,
+        }
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Anonim ürün listeleme yanıtları için önbellek
+product_list_cache = ResponseCache(
+    namespace="products:list",
+    backend=create_backend(),
+    fresh_seconds=settings.PRODUCT_LIST_CACHE_TTL_SECONDS,
+    stale_seconds=settings.PRODUCT_LIST_CACHE_STALE_SECONDS,
+)
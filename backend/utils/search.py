@@ -0,0 +1,96 @@
+# backend/utils/search.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from slugify import slugify
+from typing import List, Optional
+import re
+
+# Slug ve arama için ortak Türkçe karakter kuralları (ş, ğ, ü, ö, ç slugify tarafından çevrilir)
+TURKISH_REPLACEMENTS = [('ı', 'i')]
+
+MIN_TOKEN_LENGTH = 2
+MAX_QUERY_TERMS = 8
+MAX_DESCRIPTION_CHARS = 2000
+
+# Alan ağırlıkları (relevance sıralaması için)
+NAME_EXACT_WEIGHT = 3
+NAME_PREFIX_WEIGHT = 2
+TOKEN_EXACT_WEIGHT = 1
+
+
+def fold_text(text: Optional[str]) -> str:
+    """Metni küçük harfe çevirir ve Türkçe karakterleri sadeleştirir (Çiçek -> cicek)."""
+    if not text:
+        return ""
+    return slugify(text, separator=" ", replacements=TURKISH_REPLACEMENTS)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Sadeleştirilmiş metni sırası korunmuş, tekrarsız kelimelere böler."""
+    seen = set()
+    tokens = []
+    for token in fold_text(text).split():
+        if len(token) >= MIN_TOKEN_LENGTH and token not in seen:
+            seen.add(token)
+            tokens.append(token)
+    return tokens
+
+
+def build_search_fields(product: dict) -> dict:
+    """Ürün için saklanacak arama alanlarını (searchTokens, searchNameTokens) üretir."""
+    name_tokens = tokenize(" ".join([product.get("name") or "", *(product.get("tags") or [])]))
+    description_tokens = tokenize((product.get("description") or "")[:MAX_DESCRIPTION_CHARS])
+    all_tokens = list(dict.fromkeys(name_tokens + description_tokens))
+    return {"searchTokens": all_tokens, "searchNameTokens": name_tokens}
+
+
+def parse_search_query(q: Optional[str]) -> List[str]:
+    """Arama sorgusunu terimlere böler. Her terim önek (prefix) olarak eşleşir."""
+    return tokenize(q)[:MAX_QUERY_TERMS]
+
+
+def build_search_filter(terms: List[str]) -> dict:
+    """
+    Her terim için searchTokens üzerinde çapalı (^) bir önek sorgusu üretir.
+    Kullanıcı girdisi regex olarak yorumlanmaz; terimler sadeleştirilip escape edilir.
+    """
+    return {"$and": [{"searchTokens": {"$regex": f"^{re.escape(term)}"}} for term in terms]}
+
+
+def build_relevance_score(terms: List[str]) -> dict:
+    """Aggregation için relevance skoru: isim/etiket eşleşmeleri açıklamadan daha değerlidir."""
+    parts = []
+    for term in terms:
+        prefix = f"^{re.escape(term)}"
+        parts.append({"$cond": [{"$in": [term, {"$ifNull": ["$searchNameTokens", []]}]}, NAME_EXACT_WEIGHT, 0]})
+        parts.append({"$cond": [
+            {"$gt": [{"$size": {"$filter": {
+                "input": {"$ifNull": ["$searchNameTokens", []]},
+                "as": "token",
+                "cond": {"$regexMatch": {"input": "$$token", "regex": prefix}}
+            }}}, 0]},
+            NAME_PREFIX_WEIGHT, 0
+        ]})
+        parts.append({"$cond": [{"$in": [term, {"$ifNull": ["$searchTokens", []]}]}, TOKEN_EXACT_WEIGHT, 0]})
+    return {"$add": parts} if parts else {"$literal": 0}
+
+
+async def backfill_search_tokens(db: AsyncIOMotorDatabase, batch_size: int = 1000) -> int:
+    """Arama alanları olmayan ürünleri toplu olarak günceller. Güncellenen ürün sayısını döndürür."""
+    products_collection = db["products"]
+    cursor = products_collection.find(
+        {"searchTokens": {"$exists": False}},
+        {"name": 1, "description": 1, "tags": 1}
+    )
+    updated = 0
+    operations = []
+    async for product in cursor:
+        operations.append(UpdateOne({"_id": product["_id"]}, {"$set": build_search_fields(product)}))
+        if len(operations) >= batch_size:
+            result = await products_collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations = []
+    if operations:
+        result = await products_collection.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+    return updated
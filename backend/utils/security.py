@@ -1,9 +1,10 @@
 # backend/utils/security.py
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Annotated # Annotated import et
+from typing import Optional, Annotated, Tuple # Annotated import et
 import jwt # python-jose kütüphanesinden
-from fastapi import Depends, HTTPException, status
+import logging
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId # ObjectId import et
@@ -12,9 +13,20 @@ from config import settings # Ayarları config dosyasından al
 from database import get_db_dependency # Veritabanı dependency'si
 from models.token_models import TokenData # Token payload modeli
 from models.user_models import UserPublic # Kullanıcı response modeli (opsiyonel)
+from utils.user_cache import user_cache
+from utils.password_hashing import PasswordHasher, PasswordHasherBusy
+
+logger = logging.getLogger(__name__)
 
 # Şifreleme context'i (bcrypt kullanıyoruz)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# İstek işleyen kod şifre işlemlerini bu havuz üzerinden yapar (event loop bloklanmaz)
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
 
 ALGORITHM = settings.ALGORITHM
 JWT_SECRET = settings.JWT_SECRET
@@ -34,7 +46,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
     except Exception as e:
         # Hata durumunda logla ve false dön
-        print(f"Password verification error: {e}")
+        logger.warning("Password verification error: %s", e)
         return False
 
 
@@ -42,18 +54,64 @@ def get_password_hash(password: str) -> str:
     """Girilen şifreyi hashler."""
     return pwd_context.hash(password)
 
+
+def _password_hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Şu anda çok fazla istek işleniyor. Lütfen birkaç saniye sonra tekrar deneyin.",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def hash_password(password: str) -> str:
+    """get_password_hash'in event loop'u bloklamayan hali (route'lar bunu kullanır)."""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise _password_hasher_busy()
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    verify_password'un event loop'u bloklamayan hali. Şifre doğruysa ve hash eski
+    bir maliyetle (BCRYPT_ROUNDS değişmeden önce) üretilmişse yeni hash'i de döndürür.
+    """
+    if not hashed_password:
+        return False, None
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise _password_hasher_busy()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """JWT access token oluşturur."""
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
-    to_encode.update({"exp": expire})
+    # iat: kullanıcı önbelleği anahtarının parçası (her token kendi girdisini kullanır)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=ALGORITHM)
     return encoded_jwt
 
+def get_optional_user_id(request: Request) -> Optional[str]:
+    """
+    Authorization başlığında geçerli bir Bearer token varsa kullanıcı ID'sini döndürür.
+    Token yoksa, geçersizse veya süresi dolmuşsa None döner (misafir kabul edilir).
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    user_id = payload.get("sub") or payload.get("id")
+    return user_id if isinstance(user_id, str) and ObjectId.is_valid(user_id) else None
+
 # --- YENİ FONKSİYONLAR ---
 
 async def get_current_user_payload(
@@ -72,22 +130,22 @@ async def get_current_user_payload(
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub") or payload.get("id") # 'sub' veya 'id' alanını al
         if user_id is None:
-            print("Token payload içinde 'sub' veya 'id' bulunamadı:", payload)
+            logger.warning("Token payload içinde 'sub' veya 'id' bulunamadı", extra={"claims": sorted(payload)})
             raise credentials_exception
         # TokenData modeli ile payload'u doğrula (opsiyonel ama iyi pratik)
-        token_data = TokenData(id=user_id, email=payload.get("email"), role=payload.get("role"))
+        token_data = TokenData(id=user_id, email=payload.get("email"), role=payload.get("role"), iat=payload.get("iat"))
     except jwt.ExpiredSignatureError:
-         print("Token süresi dolmuş.")
+         logger.debug("Token süresi dolmuş.")
          raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Oturum süresi dolmuş, lütfen tekrar giriş yapın.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except jwt.JWTError as e:
-        print(f"JWT Hatası: {e}")
+    except jwt.PyJWTError as e:
+        logger.info("JWT hatası: %s", e)
         raise credentials_exception
     except Exception as e: # Beklenmedik hatalar için
-        print(f"Token doğrulama sırasında beklenmedik hata: {e}")
+        logger.exception("Token doğrulama sırasında beklenmedik hata: %s", e)
         raise credentials_exception
 
     return token_data
@@ -100,6 +158,7 @@ async def get_current_active_user(
     """
     Doğrulanmış token payload'undan kullanıcıyı veritabanından bulur
     ve aktif olup olmadığını kontrol eder. Kullanıcı verisini dict olarak döndürür.
+    Aynı token ile gelen istekler kısa süre user_cache'ten karşılanır.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -107,18 +166,23 @@ async def get_current_active_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     if not token_data.id or not ObjectId.is_valid(token_data.id):
-         print(f"Geçersiz kullanıcı ID: {token_data.id}")
+         logger.warning("Geçersiz kullanıcı ID: %s", token_data.id)
          raise credentials_exception
 
+    cached_user = user_cache.get(token_data.id, token_data.iat)
+    if cached_user is not None:
+        return cached_user
+    cache_generation = user_cache.generation(token_data.id)
+
     users_collection = db["users"]
     user = await users_collection.find_one({"_id": ObjectId(token_data.id)})
 
     if user is None:
-        print(f"Kullanıcı bulunamadı: ID {token_data.id}")
+        logger.warning("Kullanıcı bulunamadı: ID %s", token_data.id)
         raise credentials_exception
 
     if not user.get("isActive", False):
-         print(f"Kullanıcı aktif değil: {user.get('email')}")
+         logger.info("Kullanıcı aktif değil: ID %s", token_data.id)
          raise HTTPException(
              status_code=status.HTTP_400_BAD_REQUEST,
              detail="Aktif olmayan kullanıcı."
@@ -136,9 +200,10 @@ async def get_current_active_user(
             if "_id" in address and isinstance(address["_id"], ObjectId):
                 address["_id"] = str(address["_id"])
 
-
+    user_cache.set(token_data.id, token_data.iat, user, cache_generation)
     return user # Ham dictionary döndür
 
+
 # Sadece admin yetkisi olan endpointler için dependency
 async def get_current_admin_user(
     current_user: Annotated[dict, Depends(get_current_active_user)]
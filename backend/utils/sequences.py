@@ -0,0 +1,70 @@
+# backend/utils/sequences.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+import asyncio
+
+from config import settings
+
+# Sayacın başlangıç değerini (mevcut en büyük numara) veren fonksiyon
+SeedFunc = Callable[[], Awaitable[int]]
+
+
+class SequenceAllocator:
+    """
+    'counters' koleksiyonundaki atomik sayaçlardan sıra numarası üretir.
+    block_size > 1 ise her worker tek bir $inc ile bir numara aralığı ayırır
+    ve aralık bitene kadar numaraları bellekten verir (numaralar çakışmaz,
+    ancak worker'lar arasında sıralı olmayabilir ve kullanılmayan numaralar atlanır).
+    seed verilirse sayaç ilk kullanımdan önce $max ile mevcut en büyük numaraya
+    çekilir; böylece sayaçtan önce oluşturulmuş kayıtlarla çakışma olmaz.
+    """
+
+    def __init__(self, block_size: int = 1):
+        self.block_size = max(1, block_size)
+        self._blocks: Dict[str, Tuple[int, int]] = {}  # sayaç -> (sıradaki, aralık sonu)
+        self._seeded: Set[str] = set()
+        self._lock = asyncio.Lock()
+
+    async def _increment(self, db: AsyncIOMotorDatabase, counter_id: str, amount: int) -> int:
+        counter = await db["counters"].find_one_and_update(
+            {"_id": counter_id},
+            {"$inc": {"seq": amount}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter["seq"]
+
+    async def _ensure_seeded(self, db: AsyncIOMotorDatabase, counter_id: str, seed: Optional[SeedFunc]) -> None:
+        # Process başına sayaç için bir kez; $max eşzamanlı worker'larda ve tekrarlarda etkisizdir
+        if seed is None or counter_id in self._seeded:
+            return
+        floor = await seed()
+        if floor > 0:
+            await db["counters"].update_one({"_id": counter_id}, {"$max": {"seq": floor}}, upsert=True)
+        self._forget_stale(counter_id)
+        self._seeded.add(counter_id)
+
+    def _forget_stale(self, counter_id: str) -> None:
+        """Aynı önekli eski sayaçları (ör. önceki günler) bellekte tutma."""
+        prefix = counter_id.split(":")[0]
+        for stale_id in [key for key in self._blocks if key != counter_id and key.split(":")[0] == prefix]:
+            del self._blocks[stale_id]
+        self._seeded = {key for key in self._seeded if key == counter_id or key.split(":")[0] != prefix}
+
+    async def next(self, db: AsyncIOMotorDatabase, counter_id: str, seed: Optional[SeedFunc] = None) -> int:
+        if self.block_size == 1:
+            await self._ensure_seeded(db, counter_id, seed)
+            return await self._increment(db, counter_id, 1)
+        async with self._lock:
+            await self._ensure_seeded(db, counter_id, seed)
+            current, end = self._blocks.get(counter_id, (1, 0))
+            if current > end:
+                end = await self._increment(db, counter_id, self.block_size)
+                current = end - self.block_size + 1
+            self._forget_stale(counter_id)
+            self._blocks[counter_id] = (current + 1, end)
+            return current
+
+
+order_number_sequence = SequenceAllocator(block_size=settings.ORDER_NUMBER_BLOCK_SIZE)
@@ -0,0 +1,65 @@
+# backend/utils/user_cache.py
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import copy
+import time
+
+from config import settings
+
+
+class UserCache:
+    """
+    Doğrulanmış kullanıcı belgelerini (şifre alanları temizlenmiş) kısa süreli bellekte tutar.
+    Anahtar (kullanıcı ID, token iat) ikilisidir; aynı token ile gelen istekler users
+    koleksiyonuna gitmez. Şifre/adres değişikliği ve hesap kapatma invalidate() çağırır;
+    diğer worker'larda değişiklik en geç TTL sonunda görünür.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Optional[int]], Tuple[float, dict]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    def get(self, user_id: str, issued_at: Optional[int]) -> Optional[dict]:
+        """Önbellekteki kullanıcının kopyasını döndürür (yoksa veya süresi dolduysa None)."""
+        if self.ttl_seconds <= 0:
+            return None
+        key = (user_id, issued_at)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        # Çağıranlar belgeyi değiştirebilir, önbellekteki kopya korunur
+        return copy.deepcopy(user)
+
+    def generation(self, user_id: str) -> int:
+        """Yüklemeye başlamadan önce alınır; yükleme sırasında invalidate edildiyse set() yazmaz."""
+        return self._generations.get(user_id, 0)
+
+    def set(self, user_id: str, issued_at: Optional[int], user: dict, generation: int) -> None:
+        if self.ttl_seconds <= 0 or generation != self.generation(user_id):
+            return
+        key = (user_id, issued_at)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(user))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        """Kullanıcının tüm token'larına ait girdileri siler."""
+        user_id = str(user_id)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+
+
+user_cache = UserCache(ttl_seconds=settings.USER_CACHE_TTL_SECONDS, max_entries=settings.USER_CACHE_MAX_ENTRIES)
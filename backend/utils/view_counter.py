@@ -0,0 +1,86 @@
+# backend/utils/view_counter.py
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import UpdateOne
+from typing import Dict, Optional
+import asyncio
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Ürün görüntülenmelerini bellekte biriktirir ve periyodik olarak tek bir
+    bulk_write ($inc) ile veritabanına yazar. Böylece ürün detayı okuması
+    her istekte ayrı bir yazma işlemi yapmaz.
+    """
+
+    def __init__(self, flush_interval_seconds: float, max_buffer_size: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffer_size = max_buffer_size
+        self._pending: Dict[ObjectId, int] = {}
+        self._flush_requested = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def record(self, product_id: ObjectId, count: int = 1) -> None:
+        self._pending[product_id] = self._pending.get(product_id, 0) + count
+        # Tampon dolduysa periyodu beklemeden yaz
+        if len(self._pending) >= self.max_buffer_size:
+            self._flush_requested.set()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def flush(self, db: AsyncIOMotorDatabase) -> int:
+        """Bekleyen sayaçları yazar ve güncellenen ürün sayısını döndürür."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        operations = [UpdateOne({"_id": product_id}, {"$inc": {"viewCount": count}}) for product_id, count in pending.items()]
+        try:
+            await db["products"].bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error("Görüntülenme sayaçları yazılamadı (%d ürün): %s", len(pending), e)
+            # Yazılamayan sayaçları bir sonraki denemeye geri koy (tampon sınırını aşmadan)
+            for product_id, count in pending.items():
+                if product_id in self._pending or len(self._pending) < self.max_buffer_size:
+                    self._pending[product_id] = self._pending.get(product_id, 0) + count
+            return 0
+        return len(pending)
+
+    async def _run(self, db: AsyncIOMotorDatabase) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush(db)
+
+    def start(self, db: AsyncIOMotorDatabase) -> None:
+        """Arka plan yazma görevini başlatır (lifespan içinde çağrılır)."""
+        if self._task is None or self._task.done():
+            self._flush_requested = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self, db: AsyncIOMotorDatabase) -> None:
+        """Arka plan görevini durdurur ve bekleyen sayaçları son kez yazar."""
+        if self._task is not None:
+            # Yazma ortasında iptal etmek yerine döngünün kendiliğinden bitmesini bekle
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+        await self.flush(db)
+
+
+view_counter = ViewCounter(
+    flush_interval_seconds=settings.VIEW_COUNT_FLUSH_INTERVAL_SECONDS,
+    max_buffer_size=settings.VIEW_COUNT_MAX_BUFFER_SIZE,
+)